@@ -0,0 +1,158 @@
+'''
+Author: Michael Shaw
+
+Background:
+    Throughput of the ball drawing methods of ball_draw_simulation.py in
+    experiments per second. The three list methods (draw_ball_by_index,
+    draw_ball_by_element_del and draw_ball_by_element_remove) run
+    run_experiments in Python, one experiment and one draw at a time, so they
+    are timed on --python_experiments experiments. run_experiments_numpy draws
+    for a chunk of experiments at once and is timed on --num_experiments.
+    All of them estimate the same probability, which is printed with its
+    standard error sqrt(p(1 - p)/n) and its distance z in standard errors from
+    the exact probability of ball_draw_exact.py.
+
+    scaling: run_parallel of the NumPy engine on 1, 2, ..., --workers worker
+    processes, with the speedup and parallel efficiency (speedup / workers)
+    against one worker. The blocks and their SeedSequence streams do not
+    depend on the worker count, so the probability must be the same on every
+    line, which the last column checks. Worker start-up is included in the
+    time, as it is in a real run.
+
+    urn: the list hat of draw_ball_by_index against the counts urn of
+    urn_model.py, for every --num_colors and --urn_balls_per_color. The list
+    hat builds and shrinks a list of all C * balls_per_color balls in every
+    experiment, so its experiments per second fall with the size of the hat,
+    while Urn.draw (Python) and Urn.sample (NumPy) cost O(k log C) per
+    experiment whatever the number of balls. The list hat is timed on at
+    most --python_experiments experiments and at most 10^7 balls in total.
+
+Usage:
+    python ball_draw_benchmarks.py --num_experiments 10000000 --python_experiments 100000
+    python ball_draw_benchmarks.py --benchmark scaling --num_experiments 100000000 --workers 8
+    python ball_draw_benchmarks.py --benchmark urn --num_colors 3 30 100 --urn_balls_per_color 4 1000 10000
+    Spyder:
+        runfile('ball_draw_benchmarks.py', args='--num_experiments 10000000')
+'''
+
+import argparse
+import os
+import time
+
+from ball_draw_exact import probability_at_least
+from ball_draw_simulation import (COLORS, draw_ball_by_index, draw_ball_by_element_del,
+                                  draw_ball_by_element_remove, run_experiments, run_experiments_numpy,
+                                  run_parallel, standard_error, z_score)
+from urn_model import (Urn, at_least, probability_at_least as urn_probability_at_least, run_experiments_urn,
+                       run_experiments_urn_python)
+
+def benchmark_methods(num_balls_drawn, num_experiments, python_experiments, balls_per_color, success_color,
+                      num_successes, chunk_size=None):
+    """Time every method and print experiments per second and the estimated probability."""
+    problem = (num_balls_drawn, balls_per_color, success_color, num_successes)
+    methods = [('by index', python_experiments,
+                lambda n: run_experiments(draw_ball_by_index, problem[0], n, *problem[1:])),
+               ('by element with del', python_experiments,
+                lambda n: run_experiments(draw_ball_by_element_del, problem[0], n, *problem[1:])),
+               ('by element with remove', python_experiments,
+                lambda n: run_experiments(draw_ball_by_element_remove, problem[0], n, *problem[1:])),
+               ('NumPy', num_experiments,
+                lambda n: run_experiments_numpy(problem[0], n, *problem[1:], chunk_size=chunk_size))]
+
+    exact = probability_at_least(num_balls_drawn, balls_per_color, num_successes, len(COLORS))
+    print(f"Exact probability: {exact:.6f}")
+    print(f"{'Method':<24}{'experiments':>13}{'time (s)':>10}{'exp/s':>12}{'speedup':>9}"
+          f"{'probability':>13}{'std error':>11}{'z':>7}")
+    base_rate = None
+    for name, n, run in methods:
+        start = time.perf_counter()
+        probability = run(n)
+        elapsed = time.perf_counter() - start
+        rate = n / elapsed
+        base_rate = rate if base_rate is None else base_rate
+        error = standard_error(probability, n)
+        print(f"{name:<24}{n:>13}{elapsed:>10.3g}{rate:>12.4g}{rate / base_rate:>9.1f}"
+              f"{probability:>13.6f}{error:>11.2e}{z_score(probability, exact, n):>7.2f}")
+
+def benchmark_scaling(num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes,
+                      max_workers, seed=0, block_size=2**20):
+    """Time run_parallel on 1 to max_workers processes and check that the results are identical."""
+    problem = (num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes)
+    print(f"{num_experiments} experiments in blocks of {block_size}, seed {seed}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'time (s)':>10}{'exp/s':>12}{'speedup':>9}{'efficiency':>12}{'probability':>13}"
+          f"{'identical':>11}")
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        probability = run_parallel(*problem, method='numpy', seed=seed, workers=workers, block_size=block_size)
+        elapsed = time.perf_counter() - start
+        if workers == 1:
+            serial_time, serial_probability = elapsed, probability
+        speedup = serial_time / elapsed
+        print(f"{workers:>8}{elapsed:>10.3g}{num_experiments / elapsed:>12.4g}{speedup:>9.2f}"
+              f"{speedup / workers:>12.2f}{probability:>13.8f}{str(probability == serial_probability):>11}")
+
+def benchmark_urn(num_balls_drawn, num_experiments, python_experiments, num_colors, urn_balls_per_color,
+                  num_successes, seed=0):
+    """Time the list hat and the counts urn for hats of every size, the success color is the first color."""
+    print(f"{'colors':>7}{'balls':>10}  {'method':<14}{'experiments':>13}{'time (s)':>10}{'exp/s':>12}"
+          f"{'probability':>13}{'z':>7}")
+    for size in num_colors:
+        colors = [f'color{i}' for i in range(size)]
+        for balls_per_color in urn_balls_per_color:
+            urn = Urn([balls_per_color] * size, colors)
+            predicate = at_least(urn, [0], num_successes)
+            exact = urn_probability_at_least(urn, num_balls_drawn, [0], num_successes)
+            list_experiments = max(1, min(python_experiments, 10**7 // urn.total))
+            methods = [('list hat', list_experiments,
+                        lambda n: run_experiments(draw_ball_by_index, num_balls_drawn, n, balls_per_color,
+                                                  colors[0], num_successes, seed, colors)),
+                       ('urn, Python', python_experiments,
+                        lambda n: run_experiments_urn_python(urn, num_balls_drawn, n, predicate, seed=seed)),
+                       ('urn, NumPy', num_experiments,
+                        lambda n: run_experiments_urn(urn, num_balls_drawn, n, predicate, seed=seed))]
+            for name, n, run in methods:
+                start = time.perf_counter()
+                probability = run(n)
+                elapsed = time.perf_counter() - start
+                print(f"{size:>7}{urn.total:>10}  {name:<14}{n:>13}{elapsed:>10.3g}{n / elapsed:>12.4g}"
+                      f"{probability:>13.6f}{z_score(probability, exact, n):>7.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ball drawing methods in experiments per second.')
+    parser.add_argument('--benchmark', default='methods', choices=['methods', 'scaling', 'urn'],
+                        help='Which benchmark to run (default: methods)')
+    parser.add_argument('--num_balls_drawn', type=int, default=5, help='Number of balls drawn per experiment.')
+    parser.add_argument('--num_experiments', type=int, default=10000000,
+                        help='Number of experiments for the NumPy engine.')
+    parser.add_argument('--python_experiments', type=int, default=100000,
+                        help='Number of experiments for each of the list methods.')
+    parser.add_argument('--balls_per_color', type=int, default=4, help='Number of balls of each color in the hat.')
+    parser.add_argument('--success_color', default='black', choices=COLORS,
+                        help='The ball color considered as a success.')
+    parser.add_argument('--num_successes', type=int, default=2,
+                        help='Number of successful color draws required for a successful experiment.')
+    parser.add_argument('--chunk_size', type=int, default=None,
+                        help='Experiments per chunk of the NumPy engine, about 2 MB of keys by default.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Largest number of worker processes for scaling (default: number of CPUs)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random streams for scaling and urn (default: 0)')
+    parser.add_argument('--block_size', type=int, default=2**20,
+                        help='Experiments per block of run_parallel for scaling (default: 1048576)')
+    parser.add_argument('--num_colors', type=int, nargs='+', default=[3, 30, 100],
+                        help='Numbers of colors of the hats for urn (default: 3 30 100)')
+    parser.add_argument('--urn_balls_per_color', type=int, nargs='+', default=[4, 1000, 10000],
+                        help='Balls of each color of the hats for urn (default: 4 1000 10000)')
+    args = parser.parse_args()
+
+    if args.benchmark == 'methods':
+        benchmark_methods(args.num_balls_drawn, args.num_experiments, args.python_experiments, args.balls_per_color,
+                          args.success_color, args.num_successes, args.chunk_size)
+    elif args.benchmark == 'scaling':
+        benchmark_scaling(args.num_balls_drawn, args.num_experiments, args.balls_per_color, args.success_color,
+                          args.num_successes, args.workers, args.seed, args.block_size)
+    elif args.benchmark == 'urn':
+        benchmark_urn(args.num_balls_drawn, args.num_experiments, args.python_experiments, args.num_colors,
+                      args.urn_balls_per_color, args.num_successes, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+Author: Michael Shaw
+
+Background:
+    Exact probabilities for ball_draw_simulation.py. Drawing n balls without
+    replacement from a hat with K_i balls of color i (N in total) gives the
+    multivariate hypergeometric distribution
+
+        P(k_1, ..., k_c) = C(K_1, k_1) ... C(K_c, k_c) / C(N, n)
+
+    and the number k of balls of one color with K balls follows the
+    hypergeometric distribution C(K, k) C(N - K, n - k) / C(N, n). The
+    binomial coefficients are evaluated as exp of sums of log factorials,
+    log C(n, k) = log n! - log k! - log (n - k)!, from a table of
+    log m! = gammaln(m + 1) that is computed once and only extended when a
+    larger m is needed, so hats with millions of balls cost one table lookup
+    per term and never overflow.
+
+Usage:
+    from ball_draw_exact import probability_at_least
+    probability_at_least(num_balls_drawn=5, balls_per_color=4, num_successes=2)
+    python ball_draw_exact.py --num_balls_drawn 5 --balls_per_color 4 --num_successes 2
+    Spyder:
+        runfile('ball_draw_exact.py', args='--num_balls_drawn 5 --balls_per_color 4')
+'''
+
+import argparse
+import numpy as np
+from scipy.special import gammaln
+
+# log m! for m = 0, 1, ..., extended on demand
+log_factorial_table = np.zeros(1)
+
+def log_factorial(m):
+    """log m! for integers m >= 0 (arrays too), from the memoized table."""
+    global log_factorial_table
+    m = np.asarray(m)
+    largest = int(np.max(m, initial=0))
+    if largest >= log_factorial_table.size:
+        size = max(largest + 1, 2 * log_factorial_table.size)
+        log_factorial_table = gammaln(np.arange(size) + 1.0)
+    return log_factorial_table[m]
+
+def log_binomial(n, k):
+    """log C(n, k), -inf where k < 0 or k > n."""
+    n, k = np.broadcast_arrays(np.asarray(n), np.asarray(k))
+    valid = (k >= 0) & (k <= n)
+    result = np.full(n.shape, -np.inf)
+    result[valid] = log_factorial(n[valid]) - log_factorial(k[valid]) - log_factorial(n[valid] - k[valid])
+    return result[()]
+
+def hypergeometric_pmf(k, num_balls, num_color, num_balls_drawn):
+    """P(k balls of a color with num_color of the num_balls in the hat among num_balls_drawn drawn)."""
+    return np.exp(log_binomial(num_color, k) + log_binomial(num_balls - num_color, num_balls_drawn - k)
+                  - log_binomial(num_balls, num_balls_drawn))
+
+def multivariate_hypergeometric_pmf(drawn, hat):
+    """P(drawn[i] balls of color i for every i) when sum(drawn) balls are drawn from a hat with hat[i] of color i."""
+    drawn, hat = np.asarray(drawn), np.asarray(hat)
+    return float(np.exp(np.sum(log_binomial(hat, drawn)) - log_binomial(hat.sum(), drawn.sum())))
+
+def probability_at_least(num_balls_drawn, balls_per_color, num_successes, num_colors=3):
+    """Exact probability of at least num_successes balls of one color, as estimated by run_experiments."""
+    num_balls = num_colors * balls_per_color
+    if not 0 <= num_balls_drawn <= num_balls:
+        raise ValueError(f"num_balls_drawn must be between 0 and {num_balls}, the balls in the hat")
+    # Only the tail k >= num_successes is summed, all terms are positive
+    k = np.arange(max(num_successes, 0), min(balls_per_color, num_balls_drawn) + 1)
+    return min(1.0, float(np.sum(hypergeometric_pmf(k, num_balls, balls_per_color, num_balls_drawn))))
+
+def main():
+    parser = argparse.ArgumentParser(description='Exact probabilities of the ball drawing experiment.')
+    parser.add_argument('--num_balls_drawn', type=int, default=5, help='Number of balls drawn per experiment.')
+    parser.add_argument('--balls_per_color', type=int, default=4, help='Number of balls of each color in the hat.')
+    parser.add_argument('--num_successes', type=int, default=2,
+                        help='Number of successful color draws required for a successful experiment.')
+    args = parser.parse_args()
+
+    num_balls = 3 * args.balls_per_color
+    print(f"{'k':>6}{'P(k)':>14}{'P(>= k)':>14}")
+    for k in range(min(args.balls_per_color, args.num_balls_drawn) + 1):
+        pmf = hypergeometric_pmf(k, num_balls, args.balls_per_color, args.num_balls_drawn)
+        tail = probability_at_least(args.num_balls_drawn, args.balls_per_color, k)
+        print(f"{k:>6}{pmf:>14.6e}{tail:>14.10f}")
+    probability = probability_at_least(args.num_balls_drawn, args.balls_per_color, args.num_successes)
+    print(f"P(at least {args.num_successes} of the success color) = {probability:.12f}")
+
+if __name__ == '__main__':
+    main()
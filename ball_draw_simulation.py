@@ -6,11 +6,40 @@ Background:
     of black, red, and blue balls to calculate the probability of drawing a 
     specified number of a particular color. It compares three different methods 
     for ball selection: by index, by element with 'del', and by element with 'remove'.
+    Each experiment draws without replacement from one hat.
+
+    run_experiments_numpy does the same for all experiments at once with NumPy: 
+    every row of a chunk of experiments gets one random key per ball, and the 
+    balls with the num_balls_drawn smallest keys are a draw without replacement. 
+    np.partition finds the largest drawn key of every row, and the hat is ordered 
+    black, red, blue, so the balls of the success color drawn are the keys in its 
+    columns up to that threshold. Chunks of chunk_size experiments bound the 
+    memory to chunk_size * 3 * balls_per_color keys.
+
+    The exact probability from ball_draw_exact.py validates every estimate: 
+    each is printed with its standard error sqrt(p(1 - p)/n) and its distance 
+    z from the exact value in standard errors. With --tolerance the NumPy 
+    engine stops as soon as the Wilson confidence interval of the estimate 
+    is narrower than +-tolerance, instead of running all num_experiments.
+
+    run_parallel splits num_experiments into blocks of block_size experiments 
+    and runs them on a process pool. Every block draws with its own generator, 
+    spawned for the block number from numpy.random.SeedSequence(seed), so the 
+    blocks are independent streams and the result for a seed is the same for 
+    any number of workers. Each method gets its own SeedSequence for the seed, 
+    and the list methods draw with a random.Random of their block instead of 
+    the global random module.
+
+    The list hat holds one string per ball, which is fine for three colors of 
+    a few balls. For many colors with thousands of balls each, urn_model.py 
+    keeps one count per color and draws k balls in O(k log C).
 
 Usage:
     Run the script with optional command-line arguments:
     python ball_draw_simulation.py --num_balls_drawn 5 --num_experiments 10000 
         --balls_per_color 4 --success_color black --num_successes 2
+    python ball_draw_simulation.py --num_experiments 100000000 --tolerance 1e-4
+    python ball_draw_simulation.py --num_experiments 1000000 --seed 42 --workers 4
     Spyder: 
         runfile('ball_draw_simulation.py', args='--num_balls_drawn 5 --num_experiments 10000 
             --balls_per_color 4 --success_color black --num_successes 2')
@@ -18,55 +47,215 @@ Usage:
 
 import random
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
+
+from ball_draw_exact import probability_at_least
+
+COLORS = ['black', 'red', 'blue']
 
-def new_hat(balls_per_color):
+def new_hat(balls_per_color, colors=COLORS):
     """Create a new hat filled with the specified number of balls of each color."""
-    return ['black']*balls_per_color + ['red']*balls_per_color + ['blue']*balls_per_color
+    return [color for color in colors for _ in range(balls_per_color)]
 
-def draw_ball_by_index(hat):
+def draw_ball_by_index(hat, rng=random):
     """Draw a ball using list index and pop."""
-    index = random.randint(0, len(hat) - 1)
+    index = rng.randint(0, len(hat) - 1)
     return hat.pop(index)
 
-def draw_ball_by_element_del(hat):
+def draw_ball_by_element_del(hat, rng=random):
     """Draw a ball using list index and delete."""
-    index = random.randint(0, len(hat) - 1)
+    index = rng.randint(0, len(hat) - 1)
     color = hat[index]
     del hat[index]
     return color
 
-def draw_ball_by_element_remove(hat):
+def draw_ball_by_element_remove(hat, rng=random):
     """Draw a ball using list element and remove."""
-    color = random.choice(hat)
+    color = rng.choice(hat)
     hat.remove(color)
     return color
 
-def run_experiments(draw_function, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes):
-    """Run simulation experiments and calculate the probability."""
-    successes = sum(
-        1 for _ in range(num_experiments)
-        if [draw_function(new_hat(balls_per_color)) for _ in range(num_balls_drawn)].count(success_color) >= num_successes
-    )
+def count_successes(draw_function, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes,
+                    rng=random, colors=COLORS):
+    """Number of successful experiments, drawing with the random number generator rng."""
+    successes = 0
+    for _ in range(num_experiments):
+        # One hat per experiment, the draws are without replacement
+        hat = new_hat(balls_per_color, colors)
+        if [draw_function(hat, rng) for _ in range(num_balls_drawn)].count(success_color) >= num_successes:
+            successes += 1
+    return successes
+
+def run_experiments(draw_function, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes,
+                    seed=None, colors=COLORS):
+    """Run simulation experiments and calculate the probability, with the global random module when seed is None."""
+    rng = random if seed is None else random.Random(seed)
+    return count_successes(draw_function, num_balls_drawn, num_experiments, balls_per_color, success_color,
+                           num_successes, rng, colors) / num_experiments
+
+def count_successes_numpy(rng, num_balls_drawn, num_experiments, balls_per_color, success_color):
+    """Number of balls of the success color drawn in each of num_experiments experiments."""
+    num_balls = len(COLORS) * balls_per_color
+    keys = rng.random((num_experiments, num_balls))
+    threshold = np.partition(keys, num_balls_drawn - 1, axis=1)[:, num_balls_drawn - 1:num_balls_drawn]
+    first = COLORS.index(success_color) * balls_per_color
+    return np.count_nonzero(keys[:, first:first + balls_per_color] <= threshold, axis=1)
+
+def chunk_successes(num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes,
+                    chunk_size=None, seed=None):
+    """Yield the number of experiments and of successful experiments of every chunk."""
+    num_balls = len(COLORS) * balls_per_color
+    if not 0 < num_balls_drawn <= num_balls:
+        raise ValueError(f"num_balls_drawn must be between 1 and {num_balls}, the balls in the hat")
+    if chunk_size is None:
+        # About 2 MB of keys per chunk, which stay in the CPU cache
+        chunk_size = max(1, 2**18 // num_balls)
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_experiments, chunk_size):
+        size = min(chunk_size, num_experiments - start)
+        count = count_successes_numpy(rng, num_balls_drawn, size, balls_per_color, success_color)
+        yield size, np.count_nonzero(count >= num_successes)
+
+def run_experiments_numpy(num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes,
+                          chunk_size=None, seed=None):
+    """Run the experiments in chunks with NumPy and calculate the probability."""
+    successes = sum(chunk[1] for chunk in chunk_successes(num_balls_drawn, num_experiments, balls_per_color,
+                                                          success_color, num_successes, chunk_size, seed))
+    return successes / num_experiments
+
+METHODS = {'index': draw_ball_by_index, 'del': draw_ball_by_element_del, 'remove': draw_ball_by_element_remove,
+           'numpy': None}
+
+def run_block(block):
+    """Successful experiments of one block, drawn with the generator of its SeedSequence."""
+    method, seed_sequence, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes = block
+    if method == 'numpy':
+        return sum(chunk[1] for chunk in chunk_successes(num_balls_drawn, num_experiments, balls_per_color,
+                                                         success_color, num_successes, seed=seed_sequence))
+    rng = random.Random(int.from_bytes(seed_sequence.generate_state(4).tobytes(), 'little'))
+    return count_successes(METHODS[method], num_balls_drawn, num_experiments, balls_per_color, success_color,
+                           num_successes, rng)
+
+def run_parallel(num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes, method='numpy',
+                 seed=None, workers=1, block_size=2**20):
+    """
+    Run the experiments in blocks with independent random streams on a process pool.
+
+    The blocks and their streams only depend on seed, method and block_size, so
+    the probability is the same for any number of workers. workers=None uses
+    all CPUs, workers=1 runs the blocks in this process.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}, not {method}")
+    # One SeedSequence per method for the same seed, spawning one child per block
+    root = np.random.SeedSequence(seed, spawn_key=(list(METHODS).index(method),))
+    starts = range(0, num_experiments, block_size)
+    blocks = [(method, child, num_balls_drawn, min(block_size, num_experiments - start), balls_per_color,
+               success_color, num_successes) for start, child in zip(starts, root.spawn(len(starts)))]
+    if workers == 1:
+        successes = sum(map(run_block, blocks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            successes = sum(pool.map(run_block, blocks))
     return successes / num_experiments
 
-def main(num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes):
+def standard_error(probability, num_experiments):
+    """Standard error sqrt(p(1 - p)/n) of an estimated probability."""
+    return np.sqrt(probability * (1 - probability) / num_experiments)
+
+def z_score(probability, exact, num_experiments):
+    """
+    Distance of an estimate from the exact probability in standard errors of
+    the exact one. At exact = 0 or 1 the standard error is 0, and z is 0 for
+    an estimate equal to it and +-inf otherwise.
+    """
+    error = standard_error(exact, num_experiments)
+    if error == 0:
+        return 0.0 if probability == exact else np.copysign(np.inf, probability - exact)
+    return (probability - exact) / error
+
+def wilson_half_width(successes, num_experiments, z):
+    """Half width of the Wilson score interval, which stays positive for p = 0 or 1."""
+    p = successes / num_experiments
+    return z * np.sqrt(p * (1 - p) / num_experiments + z**2 / (4 * num_experiments**2)) \
+        / (1 + z**2 / num_experiments)
+
+def run_until_tolerance(num_balls_drawn, balls_per_color, success_color, num_successes, tolerance,
+                        confidence=0.95, max_experiments=10**9, chunk_size=None, seed=None):
+    """
+    Run NumPy chunks until the confidence interval of the probability is within +-tolerance.
+
+    Returns a dict with the probability, std_error, half_width, num_experiments,
+    whether the tolerance was met (converged) and the history of
+    (num_experiments, probability, half_width) after every chunk.
+    """
+    if max_experiments < 1:
+        raise ValueError(f"max_experiments must be at least 1, got {max_experiments}")
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    experiments = successes = 0
+    half_width = np.inf
+    history = []
+    for size, chunk in chunk_successes(num_balls_drawn, max_experiments, balls_per_color, success_color,
+                                       num_successes, chunk_size, seed):
+        experiments += size
+        successes += chunk
+        half_width = wilson_half_width(successes, experiments, z)
+        history.append((experiments, successes / experiments, half_width))
+        if half_width <= tolerance:
+            break
+    probability = successes / experiments
+    return {'probability': probability, 'std_error': standard_error(probability, experiments),
+            'half_width': half_width, 'num_experiments': experiments, 'converged': half_width <= tolerance,
+            'history': history}
+
+def main(num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes, tolerance=None,
+         confidence=0.95, seed=None, workers=1):
     """Run simulations with different ball drawing methods and print results."""
-    prob_by_index = run_experiments(draw_ball_by_index, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes)
-    prob_by_element_del = run_experiments(draw_ball_by_element_del, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes)
-    prob_by_element_remove = run_experiments(draw_ball_by_element_remove, num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes)
+    exact = probability_at_least(num_balls_drawn, balls_per_color, num_successes, len(COLORS))
+    print(f"Exact probability: {exact:.6f}")
+
+    if tolerance is not None:
+        # Only the NumPy engine, stopped when the estimate is good enough
+        result = run_until_tolerance(num_balls_drawn, balls_per_color, success_color, num_successes, tolerance,
+                                     confidence, num_experiments, seed=seed)
+        for experiments, probability, half_width in result['history'][::max(1, len(result['history']) // 10)]:
+            print(f"    {experiments:>12} experiments: {probability:.6f} +- {half_width:.2e}")
+        print(f"Probability with NumPy: {result['probability']:.6f} +- {result['half_width']:.2e} "
+              f"({confidence:.0%}) after {result['num_experiments']} experiments, "
+              f"z = {z_score(result['probability'], exact, result['num_experiments']):.2f}")
+        if not result['converged']:
+            print(f"Tolerance {tolerance:g} not met within {num_experiments} experiments")
+        return
+
+    problem = (num_balls_drawn, num_experiments, balls_per_color, success_color, num_successes)
+    prob_by_index = run_parallel(*problem, method='index', seed=seed, workers=workers)
+    prob_by_element_del = run_parallel(*problem, method='del', seed=seed, workers=workers)
+    prob_by_element_remove = run_parallel(*problem, method='remove', seed=seed, workers=workers)
+    prob_numpy = run_parallel(*problem, method='numpy', seed=seed, workers=workers)
 
-    print(f"Probability by index: {prob_by_index:.4f}")
-    print(f"Probability by element with del: {prob_by_element_del:.4f}")
-    print(f"Probability by element with remove: {prob_by_element_remove:.4f}")
+    # Distance from the exact probability in standard errors
+    error = standard_error(exact, num_experiments)
+    print(f"Probability by index: {prob_by_index:.4f} (z = {z_score(prob_by_index, exact, num_experiments):.2f})")
+    print(f"Probability by element with del: {prob_by_element_del:.4f} (z = {z_score(prob_by_element_del, exact, num_experiments):.2f})")
+    print(f"Probability by element with remove: {prob_by_element_remove:.4f} (z = {z_score(prob_by_element_remove, exact, num_experiments):.2f})")
+    print(f"Probability with NumPy: {prob_numpy:.4f} (z = {z_score(prob_numpy, exact, num_experiments):.2f})")
+    print(f"Standard error: {error:.2e}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run a ball drawing probability simulation.')
     parser.add_argument('--num_balls_drawn', type=int, default=5, help='Number of balls drawn per experiment.')
     parser.add_argument('--num_experiments', type=int, default=10000, help='Number of experiments to run.')
     parser.add_argument('--balls_per_color', type=int, default=4, help='Number of balls of each color in the hat.')
-    parser.add_argument('--success_color', default='black', choices=['black', 'red', 'blue'], help='The ball color considered as a success.')
+    parser.add_argument('--success_color', default='black', choices=COLORS, help='The ball color considered as a success.')
     parser.add_argument('--num_successes', type=int, default=2, help='Number of successful color draws required for a successful experiment.')
+    parser.add_argument('--tolerance', type=float, default=None, help='Stop the NumPy engine once the confidence interval is within +-tolerance, num_experiments is then the limit.')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the interval for --tolerance.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the random streams, the results are reproducible with it.')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes, the results do not depend on it.')
     
     args = parser.parse_args()
     
-    main(args.num_balls_drawn, args.num_experiments, args.balls_per_color, args.success_color, args.num_successes)
+    main(args.num_balls_drawn, args.num_experiments, args.balls_per_color, args.success_color, args.num_successes,
+         args.tolerance, args.confidence, args.seed, args.workers)
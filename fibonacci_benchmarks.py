@@ -0,0 +1,155 @@
+"""
+Author:
+    Michael Shaw
+
+Background:
+    Benchmarks for the Fibonacci engine in fibonacci_engine.py. Each benchmark
+    prints a small table so the different code paths can be compared on the
+    same machine.
+
+    single: wall time of one term F(N) for every --N, with
+        fast doubling: fibonacci(N), O(log N) big integer multiplications
+        linear: N additions of Python integers, the loop of compute_fibonacci
+            without the array, up to --linear_max as it is O(N^2) in digits
+        int64 array: the old compute_fibonacci, an np.int64 array of all N + 1
+            terms filled by a Python loop, up to --array_max
+    The last columns check the result against fast doubling: the linear loop
+    must agree, the int64 array wraps around past F(92).
+
+    batch: F(n) mod m of fibonacci_modular.py for --queries random indices
+    below --max_index and every --moduli, in queries per second, with
+        Python loop: fast doubling mod m one index at a time, on
+            --python_queries of the indices
+        doubling: fibonacci_mod(..., method='doubling') on the whole array
+        Pisano (cold / cached): the Pisano table lookup, first with the table
+            computed in the call and then from the cache, for m up to
+            --pisano_max
+        recurrence k=2: recurrence_mod with coefficients (1, 1)
+    Every result is checked against doubling on the same indices.
+
+Usage:
+    terminal/cmd: python fibonacci_benchmarks.py --benchmark single --N 1000 1000000
+    terminal/cmd: python fibonacci_benchmarks.py --linear_max 1000000
+    terminal/cmd: python fibonacci_benchmarks.py --benchmark batch --queries 1000000 --moduli 1000 1000000007
+    Spyder: runfile('fibonacci_benchmarks.py', args='--benchmark single')
+"""
+# Import Libraries
+import argparse
+import time
+import numpy as np
+
+from fibonacci_engine import decimal_digits, fibonacci
+from fibonacci_modular import fibonacci_mod, pisano_tables, recurrence_mod
+
+def linear_fibonacci(N):
+    # F(N) by N additions, keeping only the last two terms
+    a, b = 0, 1
+    for _ in range(N):
+        a, b = b, a + b
+    return a
+
+def array_fibonacci(N):
+    # F(N) from an np.int64 array of the whole sequence, as compute_fibonacci did
+    sequence = np.zeros(N + 1, dtype=np.int64)
+    if N > 0:
+        sequence[1] = 1
+    with np.errstate(over='ignore'):
+        for n in range(2, N + 1):
+            sequence[n] = sequence[n - 1] + sequence[n - 2]
+    return int(sequence[N])
+
+def python_fibonacci_mod(n, m):
+    # F(n) mod m by fast doubling on Python integers for one index
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        c = a * (2 * b - a) % m
+        d = (a * a + b * b) % m
+        a, b = (d, (c + d) % m) if bit == '1' else (c, d)
+    return a
+
+def time_call(function, N, min_time=0.2):
+    # Result and mean wall time of function(N), repeated for at least min_time seconds
+    repeat, elapsed = 0, 0.0
+    start = time.perf_counter()
+    while elapsed < min_time:
+        result = function(N)
+        repeat += 1
+        elapsed = time.perf_counter() - start
+    return result, elapsed / repeat
+
+def benchmark_single(values, linear_max=10**5, array_max=10**6):
+    print(f"{'N':>9}{'digits':>9}{'doubling (s)':>14}{'linear (s)':>12}{'speedup':>9}{'int64 array (s)':>17}"
+          f"{'linear':>8}{'int64':>7}")
+    for N in values:
+        value, doubling_time = time_call(fibonacci, N)
+        line = f"{N:>9}{decimal_digits(value):>9}{doubling_time:>14.3g}"
+        checks = ''
+        if N <= linear_max:
+            linear, linear_time = time_call(linear_fibonacci, N)
+            line += f"{linear_time:>12.3g}{linear_time / doubling_time:>9.1f}"
+            checks += f"{str(linear == value):>8}"
+        else:
+            line += f"{'-':>12}{'-':>9}"
+            checks += f"{'-':>8}"
+        if N <= array_max:
+            array, array_time = time_call(array_fibonacci, N)
+            line += f"{array_time:>17.3g}"
+            checks += f"{str(array == value):>7}"
+        else:
+            line += f"{'-':>17}"
+            checks += f"{'-':>7}"
+        print(line + checks)
+
+def benchmark_batch(queries, python_queries, max_index, moduli, pisano_max=10**7, seed=0):
+    n = np.random.default_rng(seed).integers(0, max_index, queries)
+    print(f"{queries} indices below {max_index}")
+    print(f"{'modulus':>12}  {'method':<22}{'queries':>10}{'time (s)':>10}{'queries/s':>12}{'correct':>9}")
+    for m in moduli:
+        start = time.perf_counter()
+        reference = fibonacci_mod(n, m, method='doubling')
+        elapsed = time.perf_counter() - start
+        sample = n[:python_queries].tolist()
+        methods = [('Python loop', python_queries,
+                    lambda: np.array([python_fibonacci_mod(index, m) for index in sample], dtype=reference.dtype))]
+        if m <= pisano_max:
+            pisano_tables.pop(m, None)
+            methods += [('Pisano (cold)', queries, lambda: fibonacci_mod(n, m, method='pisano')),
+                        ('Pisano (cached)', queries, lambda: fibonacci_mod(n, m, method='pisano'))]
+        methods += [('recurrence k=2', queries, lambda: recurrence_mod(n, m, (1, 1), (0, 1)))]
+        print(f"{m:>12}  {'doubling':<22}{queries:>10}{elapsed:>10.3g}{queries / elapsed:>12.4g}{'-':>9}")
+        for name, count, run in methods:
+            start = time.perf_counter()
+            values = run()
+            elapsed = time.perf_counter() - start
+            correct = np.array_equal(values, reference[:count])
+            print(f"{m:>12}  {name:<22}{count:>10}{elapsed:>10.3g}{count / elapsed:>12.4g}{str(correct):>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Fibonacci engine.')
+    parser.add_argument('--benchmark', default='single', choices=['single', 'batch'],
+                        help='Which benchmark to run (default: single)')
+    parser.add_argument('--N', type=int, nargs='+', default=[90, 1000, 10**4, 10**5, 10**6],
+                        help='Positions of the single terms (default: 90 1000 10000 100000 1000000)')
+    parser.add_argument('--linear_max', type=int, default=10**5,
+                        help='Largest N for the linear loop (default: 100000)')
+    parser.add_argument('--array_max', type=int, default=10**6,
+                        help='Largest N for the int64 array (default: 1000000)')
+    parser.add_argument('--queries', type=int, default=10**6, help='Number of indices for batch (default: 1000000)')
+    parser.add_argument('--python_queries', type=int, default=10**4,
+                        help='Number of indices for the Python loop of batch (default: 10000)')
+    parser.add_argument('--max_index', type=int, default=10**18,
+                        help='Indices of batch are below this (default: 10^18)')
+    parser.add_argument('--moduli', type=int, nargs='+', default=[1000, 10**6, 10**9 + 7],
+                        help='Moduli of batch (default: 1000 1000000 1000000007)')
+    parser.add_argument('--pisano_max', type=int, default=10**7,
+                        help='Largest modulus with a Pisano table in batch (default: 10000000)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random indices (default: 0)')
+    args = parser.parse_args()
+
+    if args.benchmark == 'single':
+        benchmark_single(args.N, args.linear_max, args.array_max)
+    elif args.benchmark == 'batch':
+        benchmark_batch(args.queries, args.python_queries, args.max_index, args.moduli, args.pisano_max, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Author:
+    Michael Shaw
+
+Background:
+    Fibonacci engine for unified_fibonacci.py and fibonacci_nth.py, with
+    F(0) = 0, F(1) = 1, F(n) = F(n - 1) + F(n - 2) as in unified_fibonacci.py
+    (fibonacci_nth.py starts 1, 1, so its sequence[n] is F(n + 1)).
+
+    fibonacci(n): a single term by fast doubling with Python integers,
+
+        F(2k)     = F(k) (2 F(k + 1) - F(k))
+        F(2k + 1) = F(k)^2 + F(k + 1)^2
+
+    going through the bits of n from the top, so F(n) takes O(log n)
+    multiplications instead of n additions and no array of all the terms.
+    Python integers never overflow, F(10^6) has 208988 digits.
+
+    fibonacci_range(start, stop, step): a generator of F(start), F(start +
+    step), ... below stop. Only the current pair (F(n), F(n + 1)) is kept, so
+    a range of terms can be streamed in constant memory.
+
+    fibonacci_sequence(N, dtype): the array F(0), ..., F(N). F(n) grows with
+    n, so the sequence fits a fixed-width dtype if F(N) does, which is
+    checked before the array is filled: int64 holds up to F(92), uint64 up
+    to F(93), float64 up to F(1476) (and is exact only up to F(78)). When
+    F(N) does not fit, the array is promoted to dtype object holding Python
+    integers, or OverflowError is raised with promote=False, instead of
+    wrapping around silently.
+
+Usage:
+    terminal/cmd: python fibonacci_engine.py 1000000
+    terminal/cmd: python fibonacci_engine.py 100 --sequence --dtype int64
+    terminal/cmd: python fibonacci_engine.py 1000 --start 990 --sequence
+    Spyder: runfile('fibonacci_engine.py', args='1000000')
+"""
+# Import Libraries
+import argparse
+import math
+import sys
+import numpy as np
+
+def fibonacci_pair(n):
+    """(F(n), F(n + 1)) by fast doubling."""
+    if n < 0:
+        raise ValueError(f"fibonacci: n must be non-negative, got {n}")
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        # (F(k), F(k + 1)) -> (F(2k), F(2k + 1)), then one step for a 1 bit
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        a, b = (d, c + d) if bit == '1' else (c, d)
+    return a, b
+
+def fibonacci(n):
+    """F(n) as a Python integer, in O(log n) multiplications."""
+    return fibonacci_pair(n)[0]
+
+def fibonacci_range(start, stop, step=1):
+    """Generate F(n) for n in range(start, stop, step), keeping only the current pair."""
+    if step < 1:
+        raise ValueError(f"fibonacci_range: step must be positive, got {step}")
+    a, b = fibonacci_pair(start)
+    if step == 1:
+        for _ in range(start, stop):
+            yield a
+            a, b = b, a + b
+        return
+    # F(n + s) = F(n) F(s - 1) + F(n + 1) F(s), F(n + s + 1) = F(n) F(s) + F(n + 1) F(s + 1)
+    previous, current = fibonacci_pair(step - 1)
+    following = previous + current
+    for _ in range(start, stop, step):
+        yield a
+        a, b = a * previous + b * current, a * current + b * following
+
+def decimal_digits(value):
+    """Number of decimal digits of the non-negative integer value, without converting it to a string."""
+    if value < 10:
+        return 1
+    # floor(log10(value)) is this estimate or one more
+    estimate = int((value.bit_length() - 1) * math.log10(2))
+    return estimate + 1 if value < 10**(estimate + 1) else estimate + 2
+
+def format_number(value, digits=None):
+    """
+    A term as a string, integers longer than digits shortened to their first
+    and last digits. By default digits is the longest integer Python converts
+    to a string (sys.get_int_max_str_digits(), 4300 unless changed).
+    """
+    # Only the first and last digits are converted to a string, so this
+    # works past the limit of str()
+    value = int(value) if np.dtype(type(value)).kind in 'iu' else value
+    if not isinstance(value, int):
+        return str(value)
+    if digits is None:
+        digits = sys.get_int_max_str_digits() or math.inf
+    count = decimal_digits(value)
+    if count <= digits:
+        return str(value)
+    half = min(digits, 60) // 2
+    return f"{value // 10**(count - half)}...{value % 10**half:0{half}d} ({count} digits)"
+
+def fits(value, dtype):
+    """True if the non-negative integer value can be stored in dtype without overflow."""
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu':
+        return value <= np.iinfo(dtype).max
+    if dtype.kind == 'f':
+        return value <= int(np.finfo(dtype).max)
+    return dtype.kind == 'O'
+
+def fibonacci_sequence(N, dtype=np.int64, promote=True):
+    """
+    Compute the Fibonacci sequence F(0), ..., F(N) as an array.
+
+    Parameters:
+    - N (int): Last position in the Fibonacci sequence
+    - dtype (data-type, optional): The desired data-type for the array. Default is np.int64.
+    - promote (bool, optional): Use dtype object when F(N) overflows dtype, else raise OverflowError.
+
+    Returns:
+    - sequence (ndarray): Numpy array of Fibonacci sequence numbers up to the Nth number.
+    """
+    if not fits(fibonacci(N), dtype):
+        if not promote:
+            raise OverflowError(f"fibonacci_sequence: F({N}) does not fit in {np.dtype(dtype)}")
+        dtype = object
+    if np.dtype(dtype).kind == 'O':
+        sequence = np.empty(N + 1, dtype=object)
+        sequence[:] = list(fibonacci_range(0, N + 1))
+        return sequence
+    return np.fromiter(fibonacci_range(0, N + 1), dtype=dtype, count=N + 1)
+
+def main():
+    # Set up argument parser for command line options
+    parser = argparse.ArgumentParser(description='Compute Fibonacci numbers of any size.')
+    parser.add_argument('N', type=int, help='The position in the Fibonacci sequence.')
+    parser.add_argument('--sequence', action='store_true', help='Print the sequence up to N instead of F(N) only.')
+    parser.add_argument('--start', type=int, default=0, help='First position of the printed sequence (default: 0)')
+    parser.add_argument('--dtype', default='object', help='dtype of the sequence array, promoted on overflow '
+                        '(default: object)')
+    parser.add_argument('--digits', type=int, default=60,
+                        help='Longest number printed in full, longer ones show their first and last digits.')
+    args = parser.parse_args()
+
+    if not args.sequence:
+        print(f'Fibonacci number {args.N}: {format_number(fibonacci(args.N), args.digits)}')
+    elif args.start == 0:
+        sequence = fibonacci_sequence(args.N, args.dtype)
+        print(f'dtype: {sequence.dtype}')
+        for n in range(args.N + 1):
+            print(f'Fibonacci number {n}: {format_number(sequence[n], args.digits)}')
+    else:
+        # A range of terms is streamed without the terms before it
+        for n, value in zip(range(args.start, args.N + 1), fibonacci_range(args.start, args.N + 1)):
+            print(f'Fibonacci number {n}: {format_number(value, args.digits)}')
+
+if __name__ == '__main__':
+    main()
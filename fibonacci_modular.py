@@ -0,0 +1,218 @@
+"""
+Author:
+    Michael Shaw
+
+Background:
+    F(n) mod m for whole arrays of indices n at once, and the same for any
+    linear recurrence of order k, returned as NumPy arrays. F(0) = 0, F(1) = 1
+    as in fibonacci_engine.py.
+
+    fibonacci_mod(n, m): two methods, chosen by method='auto'
+        doubling: the fast doubling of fibonacci_engine.py on arrays, all the
+            indices go through the bits together from the top bit of the
+            largest one, so an array of indices below 2^b costs b NumPy steps.
+            An index with fewer bits stays at (F(0), F(1)) = (0, 1) until its
+            own top bit, which doubling leaves unchanged.
+        pisano: F(n) mod m repeats with the Pisano period pi(m) <= 6m, so one
+            table of F(0), ..., F(pi(m) - 1) mod m answers every n as
+            table[n % pi(m)]. The table is computed once per m, doubling its
+            length with F(L + j) = F(L) F(j + 1) + F(L - 1) F(j) until the
+            period is found, and cached in pisano_tables. auto uses it when
+            it is cached or when its up to 6m entries cost no more than
+            doubling every index, 6m <= bits * len(n), up to max_period.
+
+    recurrence_mod(n, m, coefficients, initial): x(n) = c_1 x(n - 1) + ...
+        + c_k x(n - k) mod m with x(0), ..., x(k - 1) = initial. The state
+        s(n) = (x(n), ..., x(n + k - 1)) moves on by the companion matrix C,
+        s(n) = C^n s(0). The powers C^(2^j) mod m are computed once and shared
+        by all indices, and every index applies those of its 1 bits to its own
+        state vector, O(k^2 log n) per index instead of the O(k^3 log n) of a
+        matrix power per index. Fibonacci is coefficients (1, 1), initial (0, 1).
+
+    The arithmetic is in np.int64 while the products of two residues fit,
+    m <= 2^31 for doubling and m - 1 <= sqrt(2^63 - 1) for recurrences (the
+    sums are reduced after every product). Larger moduli use dtype object
+    arrays of Python integers, which are exact but much slower.
+
+Usage:
+    terminal/cmd: python fibonacci_modular.py --modulus 1000000007 --indices 10 100 1000000000000000000
+    terminal/cmd: python fibonacci_modular.py --coefficients 1 1 1 --initial 0 0 1 --indices 10 100
+    Spyder: runfile('fibonacci_modular.py', args='--modulus 1000 --indices 10 100')
+"""
+# Import Libraries
+import argparse
+import numpy as np
+
+# Largest int64 and moduli whose residues can be multiplied in int64
+INT64_MAX = np.iinfo(np.int64).max
+DOUBLING_MODULUS_MAX = 2**31
+
+# F(0), ..., F(pi(m) - 1) mod m for every m used with the Pisano method
+pisano_tables = {}
+
+def check_indices(n, m):
+    # Indices as an int64 array (object when they exceed int64) and the modulus as an int
+    n = np.asarray(n)
+    if n.size == 0:
+        n = n.astype(np.int64)
+    if n.dtype.kind not in 'iuO':
+        raise ValueError("fibonacci_mod: the indices must be integers")
+    if n.dtype.kind in 'iu' and n.dtype != np.uint64:
+        n = n.astype(np.int64)
+    if n.size and np.min(n) < 0:
+        raise ValueError("fibonacci_mod: the indices must be non-negative")
+    m = int(m)
+    if m < 1:
+        raise ValueError(f"fibonacci_mod: the modulus must be positive, got {m}")
+    return n, m
+
+def index_bits(n):
+    # Bits of the largest index, the number of doubling or squaring steps
+    return int(np.max(n, initial=0)).bit_length()
+
+def bit_set(n, j):
+    # Boolean array: bit j of every index
+    if n.dtype.kind == 'O':
+        return np.array([(int(value) >> j) & 1 for value in n.flat], dtype=bool).reshape(n.shape)
+    return ((n >> j) & 1).astype(bool)
+
+def fibonacci_mod_doubling(n, m):
+    """F(n) mod m for an array of indices n by fast doubling on arrays."""
+    n, m = check_indices(n, m)
+    dtype = np.int64 if m <= DOUBLING_MODULUS_MAX else object
+    a = np.zeros(n.shape, dtype=dtype)
+    b = np.full(n.shape, 1 % m, dtype=dtype)
+    for j in reversed(range(index_bits(n))):
+        # (F(k), F(k + 1)) -> (F(2k), F(2k + 1)), all residues below m
+        c = a * ((2 * b - a) % m) % m
+        d = (a * a + b * b) % m
+        one = bit_set(n, j)
+        a = np.where(one, d, c)
+        b = np.where(one, (c + d) % m, d)
+    return a
+
+def pisano_table(m):
+    """F(0), ..., F(pi(m) - 1) mod m over one Pisano period, cached per m."""
+    if m not in pisano_tables:
+        if m > DOUBLING_MODULUS_MAX:
+            raise ValueError(f"pisano_table: the table for m = {m} would have up to {6 * m} entries")
+        # The table doubles in length, F(L + j) = F(L) F(j + 1) + F(L - 1) F(j),
+        # until (F(i), F(i + 1)) = (0, 1) again, at the latest for i = pi(m) <= 6m
+        values = np.array([0, 1 % m], dtype=np.int64)
+        period = 1 if m == 1 else None
+        while period is None:
+            last = (values[-1] + values[-2]) % m
+            following = np.append(values[1:], last)
+            values = np.concatenate([values, (last * following + values[-1] * values) % m])
+            restart = np.flatnonzero((values[1:-1] == 0) & (values[2:] == 1))
+            period = int(restart[0]) + 1 if restart.size else None
+        pisano_tables[m] = values[:period].copy()
+    return pisano_tables[m]
+
+def pisano_period(m):
+    """The Pisano period pi(m), the period of F(n) mod m."""
+    return pisano_table(int(m)).size
+
+def fibonacci_mod(n, m, method='auto', max_period=2**24, chunk_size=2**16):
+    """
+    F(n) mod m for every index in the array n.
+
+    Parameters:
+    - n (array_like of int): Positions in the Fibonacci sequence, any shape
+    - m (int): The modulus
+    - method (str, optional): 'doubling', 'pisano' or 'auto' to pick between them
+    - max_period (int, optional): Largest Pisano table (6m entries before the period is known) for 'auto'
+    - chunk_size (int, optional): Indices per chunk of the doubling method
+
+    Returns:
+    - values (ndarray): F(n) mod m with the shape of n, np.int64 when m <= 2^31
+    """
+    n, m = check_indices(n, m)
+    if method == 'auto':
+        cost = index_bits(n) * n.size
+        method = 'pisano' if m in pisano_tables or 6 * m <= min(max_period, cost) else 'doubling'
+    if method == 'doubling':
+        # Chunks keep the temporaries of the doubling steps in the CPU cache
+        flat = n.reshape(-1)
+        values = [fibonacci_mod_doubling(flat[start:start + chunk_size], m)
+                  for start in range(0, flat.size, chunk_size)]
+        return np.concatenate(values).reshape(n.shape) if values else fibonacci_mod_doubling(n, m)
+    if method == 'pisano':
+        table = pisano_table(m)
+        return table[(n % table.size).astype(np.int64)]
+    raise ValueError(f"fibonacci_mod: unknown method {method}, use 'auto', 'doubling' or 'pisano'")
+
+def companion_matrix(coefficients, m, dtype):
+    # C with s(n + 1) = C s(n) for the state s(n) = (x(n), ..., x(n + k - 1))
+    k = len(coefficients)
+    matrix = np.zeros((k, k), dtype=dtype)
+    for i in range(k - 1):
+        matrix[i, i + 1] = 1 % m
+    for i, c in enumerate(coefficients):
+        matrix[k - 1, k - 1 - i] = int(c) % m
+    return matrix
+
+def multiply_mod(A, B, m):
+    # A @ B mod m, reducing after every product so only products of two residues must fit
+    result = np.zeros((A.shape[0], B.shape[1]), dtype=A.dtype)
+    for i in range(A.shape[1]):
+        result = (result + np.outer(A[:, i], B[i, :]) % m) % m
+    return result
+
+def recurrence_mod(n, m, coefficients, initial):
+    """
+    x(n) mod m of the linear recurrence x(n) = c_1 x(n - 1) + ... + c_k x(n - k).
+
+    Parameters:
+    - n (array_like of int): Positions in the sequence, any shape
+    - m (int): The modulus
+    - coefficients (sequence of int): c_1, ..., c_k
+    - initial (sequence of int): x(0), ..., x(k - 1)
+
+    Returns:
+    - values (ndarray): x(n) mod m with the shape of n
+    """
+    n, m = check_indices(n, m)
+    k = len(coefficients)
+    if k < 1 or len(initial) != k:
+        raise ValueError("recurrence_mod: there must be one initial value per coefficient, and at least one")
+    dtype = np.int64 if (m - 1)**2 <= INT64_MAX else object
+    flat = n.reshape(-1)
+    state = np.empty((flat.size, k), dtype=dtype)
+    state[:] = [int(x) % m for x in initial]
+    power = companion_matrix(coefficients, m, dtype)
+    for j in range(index_bits(flat)):
+        # Indices with bit j move on by C^(2^j): s <- s C^T, one row per index
+        one = np.flatnonzero(bit_set(flat, j))
+        if one.size:
+            state[one] = multiply_mod(state[one], power.T, m)
+        power = multiply_mod(power, power, m)
+    return state[:, 0].reshape(n.shape)
+
+def main():
+    # Set up argument parser for command line options
+    parser = argparse.ArgumentParser(description='Fibonacci numbers and linear recurrences modulo m for many indices.')
+    parser.add_argument('--indices', type=int, nargs='+', default=[10, 100, 10**18],
+                        help='Positions in the sequence (default: 10 100 10^18)')
+    parser.add_argument('--modulus', type=int, default=10**9 + 7, help='The modulus m (default: 1000000007)')
+    parser.add_argument('--method', default='auto', choices=['auto', 'doubling', 'pisano'],
+                        help='Method for Fibonacci numbers (default: auto)')
+    parser.add_argument('--coefficients', type=int, nargs='+', default=None,
+                        help='c_1 ... c_k of a linear recurrence instead of Fibonacci, e.g. 1 1 1 for Tribonacci')
+    parser.add_argument('--initial', type=int, nargs='+', default=None,
+                        help='x(0) ... x(k - 1) of the recurrence (default: 0 ... 0 1)')
+    args = parser.parse_args()
+
+    n = np.array(args.indices, dtype=object if max(args.indices) > INT64_MAX else np.int64)
+    if args.coefficients is None:
+        values = fibonacci_mod(n, args.modulus, args.method)
+        name = 'F'
+    else:
+        initial = args.initial or [0] * (len(args.coefficients) - 1) + [1]
+        values = recurrence_mod(n, args.modulus, args.coefficients, initial)
+        name = 'x'
+    for index, value in zip(args.indices, values):
+        print(f'{name}({index}) mod {args.modulus} = {value}')
+
+if __name__ == '__main__':
+    main()
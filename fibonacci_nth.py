@@ -19,13 +19,13 @@ To compute using floating-point numbers:
 import argparse
 import numpy as np
 
+from fibonacci_engine import fibonacci_sequence, format_number
+
 def compute_fibonacci(N, data_type):
     '''Compute the Fibonacci sequence up to the Nth number with the given data type.'''
-    sequence = np.zeros(N + 1, dtype=data_type)
-    sequence[0], sequence[1] = 1, 1
-    for n in range(2, N + 1):
-        sequence[n] = sequence[n - 1] + sequence[n - 2]
-    return sequence
+    # The sequence starts 1, 1, ..., F(1) to F(N + 1) of fibonacci_engine.py,
+    # promoted to dtype object when it does not fit data_type
+    return fibonacci_sequence(N + 1, data_type)[1:]
 
 def main():
     # Set up argument parser
@@ -40,9 +40,9 @@ def main():
     # Compute the Fibonacci sequence
     fibonacci_sequence = compute_fibonacci(args.N, data_type)
 
-    # Print the sequence
+    # Print the sequence, numbers too long for str() shortened
     for n in range(args.N + 1):
-        print(f'Fibonacci number {n} is {fibonacci_sequence[n]}')
+        print(f'Fibonacci number {n} is {format_number(fibonacci_sequence[n])}')
 
 if __name__ == '__main__':
     main()
@@ -6,6 +6,9 @@ for finding the root of a function,
 with a specific test function and its derivative. 
 The _test function also provides a simple command-line interface 
 and visualization of the function and the root-finding process.
+Newton_array runs the same iteration on a whole array of initial guesses 
+at once, and Newton_multistart also collects the distinct roots it found.
+Inside a solver_trace.tracing() block each Newton call is recorded.
 
 Usage and Test Case: 
     Terminal: python Tutorial_ACP_Newton.py arg
@@ -17,6 +20,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import argparse
 
+import solver_trace
+
 def Newton(f, x, dfdx, epsilon=1.0E-7, N=100, store=False):
     """
     Perform the Newton-Raphson method for finding the root of a function.
@@ -29,12 +34,19 @@ def Newton(f, x, dfdx, epsilon=1.0E-7, N=100, store=False):
     :param store: Boolean indicating whether to store the intermediate results.
     :return: The root of the function, and optionally the intermediate results.
     """
+    trace = solver_trace.current
+    if trace is not None:
+        call = trace.begin('Newton', x)
     f_value = f(x)
     n = 0
     info = [(x, f_value)] if store else None
+    if trace is not None:
+        trace.record(call, abs(f_value))
     while abs(f_value) > epsilon and n <= N:
         dfdx_value = float(dfdx(x))
         if abs(dfdx_value) < 1E-14:
+            if trace is not None:
+                trace.end(call, n, False, n + 1)
             raise ValueError(f"Newton: f'({x:g}) is too close to zero")
 
         x = x - f_value / dfdx_value
@@ -42,9 +54,98 @@ def Newton(f, x, dfdx, epsilon=1.0E-7, N=100, store=False):
         n += 1
         if store:
             info.append((x, f_value))
+        if trace is not None:
+            trace.record(call, abs(f_value))
 
+    if trace is not None:
+        trace.end(call, n, abs(f_value) <= epsilon, n)
     return (x, info) if store else (x, n, f_value)
 
+def Newton_array(f, x, dfdx, epsilon=1.0E-7, N=100):
+    """
+    Newton-Raphson method for an array of initial guesses, iterated together.
+
+    Each element follows the same iteration and stopping rule as Newton. Only 
+    the elements that have not converged are updated, so f and dfdx are called 
+    on a shrinking array. Elements where dfdx is too close to zero, or that 
+    have not converged after N iterations, are returned as nan. Complex 
+    initial guesses are iterated in the complex plane.
+
+    :param f: The function for which the roots are to be found, vectorized over arrays.
+    :param x: Array of initial guesses.
+    :param dfdx: The derivative of the function f, vectorized over arrays.
+    :param epsilon: The tolerance for the roots' accuracy.
+    :param N: The maximum number of iterations to perform.
+    :return: The roots and the number of iterations for each guess.
+    """
+    x = np.array(x, dtype=np.result_type(x, float))
+    shape = x.shape
+    x = x.ravel()
+    n = np.zeros(x.size, dtype=int)
+    failed = np.zeros(x.size, dtype=bool)
+    f_value = f(x)
+    active = np.flatnonzero(np.abs(f_value) > epsilon)
+    x_active, f_value = x[active], f_value[active]
+    iteration = 0
+    while active.size > 0:
+        if iteration > N:
+            failed[active] = True
+            break
+        dfdx_value = dfdx(x_active)
+        flat = np.abs(dfdx_value) < 1E-14
+        if np.any(flat):
+            failed[active[flat]] = True
+            keep = ~flat
+            active, x_active, f_value, dfdx_value = active[keep], x_active[keep], f_value[keep], dfdx_value[keep]
+
+        x_active = x_active - f_value / dfdx_value
+        f_value = f(x_active)
+        iteration += 1
+        n[active] = iteration
+        done = np.abs(f_value) <= epsilon
+        x[active[done]] = x_active[done]
+        keep = ~done
+        active, x_active, f_value = active[keep], x_active[keep], f_value[keep]
+
+    x[failed] = np.nan
+    return x.reshape(shape), n.reshape(shape)
+
+def Newton_multistart(f, x, dfdx, epsilon=1.0E-7, N=100, tol=1.0E-6):
+    """
+    Find the real roots of f from an array of initial guesses with Newton_array.
+
+    :param f: The function for which the roots are to be found, vectorized over arrays.
+    :param x: Array of initial guesses.
+    :param dfdx: The derivative of the function f, vectorized over arrays.
+    :param epsilon: The tolerance for the roots' accuracy.
+    :param N: The maximum number of iterations to perform.
+    :param tol: Smallest distance between two unique roots. Around each root it is 
+                widened to 10*epsilon/|dfdx|, the spread the stopping rule allows.
+    :return: The roots, the number of iterations for each guess and the unique roots.
+    """
+    roots, n = Newton_array(f, x, dfdx, epsilon, N)
+    converged = roots[np.isfinite(roots)]
+    with np.errstate(divide='ignore', over='ignore'):
+        spread = 10 * epsilon / np.abs(dfdx(converged))
+    return roots, n, unique_roots(converged, np.maximum(tol, spread))
+
+def unique_roots(roots, tol=1.0E-6):
+    """
+    Sorted distinct values of an array of roots, skipping nan. Neighbouring 
+    roots closer than tol, a number or an array with one value per root, 
+    are merged and replaced by their mean.
+    """
+    roots = np.ravel(roots)
+    tol = np.broadcast_to(tol, roots.shape)
+    finite = np.isfinite(roots)
+    order = np.argsort(roots[finite])
+    roots, tol = roots[finite][order], tol[finite][order]
+    if roots.size == 0:
+        return roots
+    gap = np.diff(roots) > np.maximum(tol[:-1], tol[1:])
+    starts = np.concatenate(([0], np.flatnonzero(gap) + 1))
+    return np.add.reduceat(roots, starts) / np.diff(np.append(starts, roots.size))
+
 def test_function(x):
     return np.exp(-0.1 * x**2) * np.sin(np.pi / 2 * x)
 
@@ -70,10 +171,9 @@ def test_Newton_method(initial_guess):
     plt.legend()
     plt.show()
 
-# Set up command-line argument parsing
-parser = argparse.ArgumentParser(description="Find the root of a function using Newton's method.")
-parser.add_argument('initial_guess', type=float, help='Initial guess for the root of the function')
-args = parser.parse_args()
-
 if __name__ == '__main__':
+    # Set up command-line argument parsing
+    parser = argparse.ArgumentParser(description="Find the root of a function using Newton's method.")
+    parser.add_argument('initial_guess', type=float, help='Initial guess for the root of the function')
+    args = parser.parse_args()
     test_Newton_method(args.initial_guess)
@@ -0,0 +1,183 @@
+'''
+Author:
+    Michael Shaw
+
+Background:
+    Basins of attraction of Newton's method for a polynomial. newton_movie.py
+follows one convergence path from x0; here every point of a grid is used as
+an initial guess and the map records which root it converged to and after
+how many iterations. The grid is either a 1-D grid of real initial guesses
+or a 2-D grid in the complex plane, where the basins of polynomials such as
+z^3 - 1 form the well known Newton fractals.
+
+The grid is split into tiles (blocks of points, or blocks of rows for the
+complex grid) that run on a process pool. Each tile is solved with
+Newton_array from newton.py, which iterates all points of the tile together,
+and each worker writes its tile straight into .npy files opened as memory
+maps. Only one tile per worker is in memory at a time, so a 16384 x 16384
+complex grid fits on a laptop (the two output files take 256 MiB each).
+
+Outputs, for --output basins:
+    basins_basin.npy: index into basins_roots.npy of the root each point
+                      converged to, -1 if it did not converge (int8)
+    basins_iterations.npy: Newton iterations for each point (uint8)
+    basins_roots.npy: the roots of the polynomial from np.roots
+and optionally an image, coloured by root and darkened with the iteration count.
+
+Usage:
+    terminal/cmd: python newton_basins.py --coefficients 1 0 0 -1 --grid complex
+        --extent -2 2 -2 2 --size 4096 4096 --image basins.png
+    terminal/cmd: python newton_basins.py --coefficients 1 0 -2 --grid real
+        --extent -3 3 --size 1000000
+    Sypder: runfile('newton_basins.py', args='--coefficients 1 0 0 -1 --size 1024 1024 --image basins.png')
+'''
+
+# Import Libraries
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from numpy.lib.format import open_memmap
+
+from newton import Newton_array
+
+class Polynomial:
+    # Polynomial and its derivative from coefficients, highest power first as in np.polyval
+    def __init__(self, coefficients):
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.derivative_coefficients = np.polyder(self.coefficients)
+
+    def f(self, x):
+        return np.polyval(self.coefficients, x)
+
+    def df(self, x):
+        return np.polyval(self.derivative_coefficients, x)
+
+    def roots(self):
+        return np.roots(self.coefficients)
+
+def grid_points(extent, size, start, stop):
+    """
+    Initial guesses start:stop of the grid, counted in points for a real grid
+    (extent xmin xmax, size n) and in rows for a complex grid
+    (extent xmin xmax ymin ymax, size ny nx), where row i has imaginary part y[i].
+    """
+    if len(size) == 1:
+        return np.linspace(extent[0], extent[1], size[0])[start:stop]
+    x = np.linspace(extent[0], extent[1], size[1])
+    y = np.linspace(extent[2], extent[3], size[0])[start:stop]
+    return x[np.newaxis, :] + 1j * y[:, np.newaxis]
+
+def basin_tile(output, coefficients, extent, size, start, stop, epsilon, N, root_tol):
+    """Solve one tile of the grid and write it into the memory-mapped output files."""
+    polynomial = Polynomial(coefficients)
+    roots = np.load(output + '_roots.npy')
+    z, n = Newton_array(polynomial.f, grid_points(extent, size, start, stop), polynomial.df, epsilon, N)
+
+    # Label each point with the nearest root, -1 if it is not close to any
+    distance = np.abs(z[..., np.newaxis] - roots)
+    basin = np.argmin(distance, axis=-1).astype(np.int8)
+    with np.errstate(invalid='ignore'):
+        basin[~(np.min(distance, axis=-1) <= root_tol * np.maximum(1, np.abs(roots[basin])))] = -1
+
+    basins = np.load(output + '_basin.npy', mmap_mode='r+')
+    iterations = np.load(output + '_iterations.npy', mmap_mode='r+')
+    basins[start:stop] = basin
+    iterations[start:stop] = n
+    basins.flush()
+    iterations.flush()
+    return np.bincount(basin.ravel() + 1, minlength=roots.size + 1)
+
+def compute_basins(coefficients, extent, size, output, epsilon=1e-12, N=100, root_tol=1e-4,
+                   tile_points=2**20, workers=None):
+    """
+    Compute the basin map on a process pool and return the roots and the
+    number of points in each basin, with the non-converged points first.
+    """
+    if N > 254:
+        raise ValueError('N must be below 255, the iteration counts are stored as uint8')
+    roots = Polynomial(coefficients).roots()
+    np.save(output + '_roots.npy', roots)
+    open_memmap(output + '_basin.npy', mode='w+', dtype=np.int8, shape=tuple(size))
+    open_memmap(output + '_iterations.npy', mode='w+', dtype=np.uint8, shape=tuple(size))
+
+    # A tile is a block of points on the real grid and a block of rows on the complex grid
+    tile = max(1, tile_points // size[1]) if len(size) == 2 else tile_points
+    starts = range(0, size[0], tile)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(basin_tile, output, coefficients, extent, size, i, min(i + tile, size[0]),
+                               epsilon, N, root_tol) for i in starts]
+        counts = sum(future.result() for future in futures)
+    return roots, counts
+
+def basin_image(output, extent, filename, max_pixels=4096):
+    """Image of the basins, coloured by root and darker for more iterations, subsampled to max_pixels."""
+    basins = np.load(output + '_basin.npy', mmap_mode='r')
+    iterations = np.load(output + '_iterations.npy', mmap_mode='r')
+    stride = max(1, -(-max(basins.shape) // max_pixels))
+    if basins.ndim == 1:
+        basins, iterations = basins[np.newaxis, ::stride], iterations[np.newaxis, ::stride]
+        extent = [extent[0], extent[1], 0, 1]
+    else:
+        basins, iterations = basins[::stride, ::stride], iterations[::stride, ::stride]
+    colors = plt.get_cmap('tab10')(np.arange(10))[:, :3]
+    rgb = np.where(basins[..., np.newaxis] >= 0, colors[basins % 10], 0.0)
+    shade = 1 - 0.7 * iterations / max(1, iterations.max())
+    rgb *= shade[..., np.newaxis]
+
+    fig, ax = plt.subplots(figsize=(8, 8 if basins.shape[0] > 1 else 2))
+    ax.imshow(rgb, origin='lower', extent=extent, aspect='auto' if basins.shape[0] == 1 else 'equal',
+              interpolation='nearest')
+    ax.set_xlabel('Re(z)' if basins.shape[0] > 1 else 'x0')
+    if basins.shape[0] > 1:
+        ax.set_ylabel('Im(z)')
+    else:
+        ax.set_yticks([])
+    ax.set_title("Basins of attraction of Newton's method")
+    fig.savefig(filename, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+
+def main():
+    parser = argparse.ArgumentParser(description="Basins of attraction of Newton's method for a polynomial.")
+    parser.add_argument('--coefficients', type=float, nargs='+', default=[1.0, 0.0, 0.0, -1.0],
+                        help='Polynomial coefficients, highest power first (default: 1 0 0 -1 for z^3 - 1)')
+    parser.add_argument('--grid', choices=['real', 'complex'], default='complex',
+                        help='1-D grid of real or 2-D grid of complex initial guesses (default: complex)')
+    parser.add_argument('--extent', type=float, nargs='+', default=None,
+                        help='xmin xmax for a real grid, xmin xmax ymin ymax for a complex grid (default: -2 2 [-2 2])')
+    parser.add_argument('--size', type=int, nargs='+', default=None,
+                        help='n for a real grid, ny nx for a complex grid (default: 1000000 or 1024 1024)')
+    parser.add_argument('--epsilon', type=float, default=1e-12, help='Tolerance on |f(z)| (default: 1e-12)')
+    parser.add_argument('--max_iter', type=int, default=100, help='Maximum Newton iterations (default: 100)')
+    parser.add_argument('--tile_points', type=int, default=2**20, help='Grid points per worker task (default: 1048576)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--output', default='basins', help='Prefix of the output .npy files (default: basins)')
+    parser.add_argument('--image', default=None, help='Also save an image of the basins to this file')
+    args = parser.parse_args()
+
+    dims = 1 if args.grid == 'real' else 2
+    extent = args.extent or [-2.0, 2.0] * dims
+    size = args.size or ([1000000] if dims == 1 else [1024, 1024])
+    if len(extent) != 2 * dims or len(size) != dims:
+        parser.error(f'a {args.grid} grid needs {2 * dims} --extent values and {dims} --size values')
+
+    start = time.perf_counter()
+    roots, counts = compute_basins(args.coefficients, extent, size, args.output, args.epsilon,
+                                   args.max_iter, tile_points=args.tile_points, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{np.prod(size)} initial guesses in {elapsed:.1f} s on {args.workers or os.cpu_count()} workers, "
+          f"written to {args.output}_basin.npy and {args.output}_iterations.npy")
+    for root, count in zip(roots, counts[1:]):
+        print(f"root {root:.10g}: {count} points")
+    print(f"not converged: {counts[0]} points")
+
+    if args.image:
+        basin_image(args.output, extent, args.image)
+        print(f"image written to {args.image}")
+
+if __name__ == '__main__':
+    main()
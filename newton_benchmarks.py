@@ -0,0 +1,114 @@
+"""
+Author:
+    Michael Shaw
+
+Background:
+    Benchmarks for the Newton-Raphson routines in newton.py. Each benchmark
+prints a small table so the different code paths can be compared on the
+same machine.
+
+    multistart: wall time of a Python loop calling Newton once per initial
+    guess against a single Newton_multistart call, for initial guesses spread
+    evenly over [-7, 7] for test_function. Compares the roots and
+    iteration counts of both paths and prints the unique roots found.
+
+    expression: time per call of the eval() path newton_movie.py used, which 
+    parses the formula string on every call, against the compiled Expression 
+    of newton_expression.py, for a scalar x as in the Newton iteration and for 
+    the 400-point plot grid. The 'numeric' derivative is compared the same 
+    way: central difference with h = 1e-7 against the symbolic derivative, 
+    with the largest error of each against the exact derivative.
+
+Usage:
+    terminal/cmd: python newton_benchmarks.py --benchmark multistart --points 1000000
+    terminal/cmd: python newton_benchmarks.py --benchmark expression --repeat 10000
+    Spyder: runfile('newton_benchmarks.py', args='--benchmark multistart')
+"""
+# Import Libraries
+import argparse
+import time
+import numpy as np
+
+from newton import Newton, Newton_multistart, test_function, derivative_test_function
+from newton_expression import Expression
+
+def time_per_call(function, x, repeat):
+    # Mean wall time of one call to function(x)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(x)
+    return (time.perf_counter() - start) / repeat
+
+def benchmark_multistart(n_points=1000000, xmin=-7.0, xmax=7.0, N=100):
+    x0 = np.linspace(xmin, xmax, n_points)
+
+    start = time.perf_counter()
+    loop_roots = np.empty(n_points)
+    loop_iterations = np.empty(n_points, dtype=int)
+    for i in range(n_points):
+        try:
+            root, n, _ = Newton(test_function, x0[i], derivative_test_function, N=N)
+        except ValueError:
+            root, n = np.nan, 0
+        loop_roots[i] = root if n <= N else np.nan
+        loop_iterations[i] = n
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    roots, iterations, unique = Newton_multistart(test_function, x0, derivative_test_function, N=N)
+    batch_time = time.perf_counter() - start
+
+    # Vectorized exp and sin can round differently from the scalar calls
+    difference = np.nanmax(np.abs(roots - loop_roots))
+    print(f"{'Path':<12}{'time (s)':>10}{'guesses/s':>12}{'speedup':>10}")
+    print(f"{'loop':<12}{loop_time:>10.3g}{n_points / loop_time:>12.4g}{1:>10.1f}")
+    print(f"{'multistart':<12}{batch_time:>10.3g}{n_points / batch_time:>12.4g}{loop_time / batch_time:>10.1f}")
+    print(f"largest root difference {difference:.3g}, same iteration counts: "
+          f"{np.array_equal(iterations, loop_iterations)}")
+    print(f"mean iterations {iterations.mean():.2f}, not converged {np.count_nonzero(np.isnan(roots))}")
+    inside = unique[(unique >= xmin) & (unique <= xmax)]
+    print(f"{unique.size} unique roots, {inside.size} in [{xmin:g}, {xmax:g}]: "
+          + ', '.join(f"{root:.8g}" for root in inside))
+
+def benchmark_expression(repeat=10000):
+    problems = [('x**2 - 2', lambda x: 2 * x),
+                ('np.exp(-0.1*x**2)*np.sin(np.pi/2*x)', derivative_test_function)]
+    x_grid = np.linspace(-7, 7, 400)
+    print(f"{'Formula':<38}{'Call':<8}{'x':<8}{'eval (us)':>11}{'Expression (us)':>17}{'speedup':>9}")
+    for formula, exact_derivative in problems:
+        # The functions newton_movie.py built around eval()
+        def f_eval(x):
+            return eval(formula)
+
+        def df_numeric(x):
+            h = 1.0E-7
+            return (f_eval(x + h) - f_eval(x - h)) / (2 * h)
+
+        f = Expression(formula)
+        df = f.derivative()
+        for name, old, new in (('f', f_eval, f), ("f'", df_numeric, df)):
+            for label, x in (('scalar', 1.9), ('400', x_grid)):
+                old_time = time_per_call(old, x, repeat)
+                new_time = time_per_call(new, x, repeat)
+                print(f"{formula:<38}{name:<8}{label:<8}{old_time * 1e6:>11.3g}{new_time * 1e6:>17.3g}"
+                      f"{old_time / new_time:>9.1f}")
+        numeric_error = np.max(np.abs(df_numeric(x_grid) - exact_derivative(x_grid)))
+        symbolic_error = np.max(np.abs(df(x_grid) - exact_derivative(x_grid)))
+        print(f"  f'(x) = {df.formula}")
+        print(f"  largest derivative error: central difference {numeric_error:.3g}, symbolic {symbolic_error:.3g}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Newton-Raphson routines.')
+    parser.add_argument('--benchmark', default='multistart', choices=['multistart', 'expression'],
+                        help='Which benchmark to run (default: multistart)')
+    parser.add_argument('--points', type=int, default=1000000, help='Number of initial guesses (default: 1000000)')
+    parser.add_argument('--repeat', type=int, default=10000, help='Calls per timing in the expression benchmark (default: 10000)')
+    args = parser.parse_args()
+
+    if args.benchmark == 'multistart':
+        benchmark_multistart(args.points)
+    elif args.benchmark == 'expression':
+        benchmark_expression(args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+'''
+Author:
+    Michael Shaw
+
+Background:
+    Safe, compile-once formulas for newton_movie.py. A formula string such as
+"x**2 - 2" or "np.exp(-0.1*x**2)*np.sin(np.pi/2*x)" is parsed once with the
+ast module and checked against a whitelist: numbers, the variable x, the
+constants pi and e, the operators + - * / ** and the NumPy functions in
+FUNCTIONS (written as sin(x), np.sin(x), numpy.sin(x) or math.sin(x)).
+Anything else, such as attribute access, indexing or other names, is
+rejected with a ValueError, so no arbitrary code is run. The checked formula
+is compiled into a plain Python function of x that calls the NumPy ufuncs
+directly, so it works on numbers and arrays and costs one function call per
+evaluation instead of a parse.
+
+Expression.derivative() differentiates the formula symbolically with the
+sum, product, quotient, power and chain rules and returns a new Expression,
+which replaces the central difference newton_movie.py used for 'numeric'.
+
+Usage:
+    from newton_expression import Expression
+    f = Expression("x**2 - 2")
+    df = f.derivative()       # df.formula == '2 * x'
+    f(1.5), df(np.linspace(-2, 2, 5))
+    terminal/cmd: python newton_expression.py "np.exp(-0.1*x**2)*np.sin(np.pi/2*x)" 1.9
+    Sypder: runfile('newton_expression.py', args='"x**2 - 2" 1.5')
+'''
+
+# Import Libraries
+import argparse
+import ast
+import numpy as np
+
+FUNCTIONS = ['sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh',
+             'exp', 'log', 'log10', 'log2', 'sqrt', 'abs', 'sign']
+ALIASES = {'asin': 'arcsin', 'acos': 'arccos', 'atan': 'arctan', 'fabs': 'abs', 'absolute': 'abs'}
+CONSTANTS = {'pi': np.pi, 'e': np.e}
+MODULES = ['np', 'numpy', 'math']
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+
+# Building blocks of the derivative, folding 0 and 1 so the result stays readable
+def number(value):
+    if value < 0:
+        return ast.UnaryOp(ast.USub(), ast.Constant(-value))
+    return ast.Constant(value)
+
+def constant_value(node):
+    # The value of a number node, None for anything else
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):
+        return -node.operand.value
+    return None
+
+def add(a, b):
+    if constant_value(a) == 0:
+        return b
+    if constant_value(b) == 0:
+        return a
+    if constant_value(a) is not None and constant_value(b) is not None:
+        return number(constant_value(a) + constant_value(b))
+    return ast.BinOp(a, ast.Add(), b)
+
+def sub(a, b):
+    if constant_value(b) == 0:
+        return a
+    if constant_value(a) == 0:
+        return neg(b)
+    if constant_value(a) is not None and constant_value(b) is not None:
+        return number(constant_value(a) - constant_value(b))
+    return ast.BinOp(a, ast.Sub(), b)
+
+def mul(a, b):
+    if constant_value(a) == 0 or constant_value(b) == 0:
+        return number(0)
+    if constant_value(a) == 1:
+        return b
+    if constant_value(b) == 1:
+        return a
+    if constant_value(a) is not None and constant_value(b) is not None:
+        return number(constant_value(a) * constant_value(b))
+    return ast.BinOp(a, ast.Mult(), b)
+
+def div(a, b):
+    if constant_value(a) == 0:
+        return number(0)
+    if constant_value(b) == 1:
+        return a
+    if constant_value(a) is not None and constant_value(b) not in (None, 0):
+        return number(constant_value(a) / constant_value(b))
+    return ast.BinOp(a, ast.Div(), b)
+
+def neg(a):
+    if constant_value(a) is not None:
+        return number(-constant_value(a))
+    if isinstance(a, ast.UnaryOp):
+        return a.operand
+    return ast.UnaryOp(ast.USub(), a)
+
+def power(a, b):
+    if constant_value(b) == 0:
+        return number(1)
+    if constant_value(b) == 1:
+        return a
+    if constant_value(a) is not None and constant_value(b) is not None \
+            and (constant_value(a) > 0 or float(constant_value(b)).is_integer()):
+        return number(constant_value(a) ** constant_value(b))
+    return ast.BinOp(a, ast.Pow(), b)
+
+def call(name, arg):
+    return ast.Call(ast.Name(name, ast.Load()), [arg], [])
+
+# Derivative of each function with respect to its argument u
+FUNCTION_DERIVATIVES = {
+    'sin': lambda u: call('cos', u),
+    'cos': lambda u: neg(call('sin', u)),
+    'tan': lambda u: div(number(1), power(call('cos', u), number(2))),
+    'arcsin': lambda u: div(number(1), call('sqrt', sub(number(1), power(u, number(2))))),
+    'arccos': lambda u: neg(div(number(1), call('sqrt', sub(number(1), power(u, number(2)))))),
+    'arctan': lambda u: div(number(1), add(number(1), power(u, number(2)))),
+    'sinh': lambda u: call('cosh', u),
+    'cosh': lambda u: call('sinh', u),
+    'tanh': lambda u: sub(number(1), power(call('tanh', u), number(2))),
+    'exp': lambda u: call('exp', u),
+    'log': lambda u: div(number(1), u),
+    'log10': lambda u: div(number(1), mul(u, call('log', number(10)))),
+    'log2': lambda u: div(number(1), mul(u, call('log', number(2)))),
+    'sqrt': lambda u: div(number(1), mul(number(2), call('sqrt', u))),
+    'abs': lambda u: call('sign', u),
+    'sign': lambda u: number(0),
+}
+
+class Expression:
+    """
+    A whitelisted formula in one variable, compiled once into a vectorized function.
+
+    :param formula: The formula as a string, e.g. "x**2 - 2".
+    :param variable: The name of the variable in the formula.
+    """
+    def __init__(self, formula, variable='x'):
+        self.variable = variable
+        if isinstance(formula, ast.AST):
+            self.tree = formula
+        else:
+            try:
+                self.tree = ast.parse(formula.strip(), mode='eval').body
+            except SyntaxError as error:
+                raise ValueError(f"Expression: cannot parse {formula!r}: {error.msg}") from None
+            self.tree = self.check(self.tree, formula)
+        self.formula = ast.unparse(self.tree)
+
+        # The checked tree only uses the variable, numbers and names from the namespace
+        namespace = {'__builtins__': {}, **CONSTANTS}
+        namespace.update({name: getattr(np, name) for name in FUNCTIONS})
+        source = self.formula if self.depends_on_variable(self.tree) else f"({self.formula}) + 0 * {variable}"
+        self.function = eval(compile(f"lambda {variable}: {source}", '<expression>', 'eval'), namespace)
+
+    def __call__(self, x):
+        return self.function(x)
+
+    def __repr__(self):
+        return f"Expression({self.formula!r})"
+
+    def check(self, node, formula):
+        # Rebuild the tree from allowed nodes only, with functions and constants as bare names
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return node
+        if isinstance(node, ast.Name):
+            if node.id == self.variable or node.id in CONSTANTS:
+                return ast.Name(node.id, ast.Load())
+            raise ValueError(f"Expression: unknown name {node.id!r} in {formula!r}")
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in MODULES \
+                and node.attr in CONSTANTS:
+            return ast.Name(node.attr, ast.Load())
+        if isinstance(node, ast.BinOp) and isinstance(node.op, OPERATORS):
+            return ast.BinOp(self.check(node.left, formula), node.op, self.check(node.right, formula))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self.check(node.operand, formula)
+            return operand if isinstance(node.op, ast.UAdd) else ast.UnaryOp(ast.USub(), operand)
+        if isinstance(node, ast.Call):
+            name = self.function_name(node.func)
+            if name is None or node.keywords or len(node.args) != 1:
+                raise ValueError(f"Expression: only calls f(argument) of {', '.join(FUNCTIONS)} "
+                                 f"are allowed in {formula!r}")
+            return call(name, self.check(node.args[0], formula))
+        raise ValueError(f"Expression: {type(node).__name__} is not allowed in {formula!r}")
+
+    @staticmethod
+    def function_name(func):
+        # Whitelisted function name of sin, np.sin, numpy.sin or math.sin, otherwise None
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in MODULES:
+            name = func.attr
+        elif isinstance(func, ast.Name):
+            name = func.id
+        else:
+            return None
+        name = ALIASES.get(name, name)
+        return name if name in FUNCTIONS else None
+
+    def depends_on_variable(self, node):
+        return any(isinstance(child, ast.Name) and child.id == self.variable for child in ast.walk(node))
+
+    def derivative(self):
+        """The derivative of the formula with respect to the variable, as a new Expression."""
+        return Expression(self.differentiate(self.tree), self.variable)
+
+    def differentiate(self, node):
+        if not self.depends_on_variable(node):
+            return number(0)
+        if isinstance(node, ast.Name):
+            return number(1)
+        if isinstance(node, ast.UnaryOp):
+            return neg(self.differentiate(node.operand))
+        if isinstance(node, ast.Call):
+            u = node.args[0]
+            return mul(FUNCTION_DERIVATIVES[node.func.id](u), self.differentiate(u))
+        a, b = node.left, node.right
+        da, db = self.differentiate(a), self.differentiate(b)
+        if isinstance(node.op, ast.Add):
+            return add(da, db)
+        if isinstance(node.op, ast.Sub):
+            return sub(da, db)
+        if isinstance(node.op, ast.Mult):
+            return add(mul(da, b), mul(a, db))
+        if isinstance(node.op, ast.Div):
+            return div(sub(mul(da, b), mul(a, db)), power(b, number(2)))
+        # a**b: power rule for an exponent without the variable, otherwise a**b*(b'*log(a) + b*a'/a)
+        exponent = constant_value(b)
+        if not self.depends_on_variable(b):
+            lowered = number(exponent - 1) if exponent is not None else sub(b, number(1))
+            return mul(mul(b, power(a, lowered)), da)
+        return mul(node, add(mul(db, call('log', a)), div(mul(b, da), a)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse a formula, print its derivative and evaluate both.')
+    parser.add_argument('formula', type=str, help='Formula in x, e.g. "x**2 - 2"')
+    parser.add_argument('x', type=float, help='Point at which to evaluate the formula and its derivative')
+    args = parser.parse_args()
+
+    f = Expression(args.formula)
+    df = f.derivative()
+    print(f"f(x)  = {f.formula}")
+    print(f"f'(x) = {df.formula}")
+    print(f"f({args.x:g}) = {f(args.x):.16g}, f'({args.x:g}) = {df(args.x):.16g}")
+
+if __name__ == '__main__':
+    main()
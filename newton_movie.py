@@ -12,9 +12,20 @@ Sypder: runfile('Tutorial_ACP_Newton_Movie.py', args='f_formula df_formula x0 xm
 
 where f_formula is a string formula for f(x); df_formula is
 a string formula for the derivative f'(x), or df_formula can
-be the string 'numeric', which implies that f'(x) is computed
-numerically; x0 is the initial guess of the root; and the
-x axis in the plot has extent [xmin, xmax].
+be the string 'numeric', which implies that f'(x) is derived 
+symbolically from f_formula; x0 is the initial guess of the root; and the
+x axis in the plot has extent [xmin, xmax]. The formulas are parsed once 
+by newton_expression.Expression, which only accepts numbers, x, pi, e, 
+arithmetic and NumPy functions such as np.sin or exp.
+
+With --output the movie is rendered without a window: the curve is drawn 
+once on an offscreen Agg canvas and each frame only redraws the tangent and 
+root lines over the saved background. Frames are streamed into Pillow for 
+a .gif, or into ffmpeg (which must be installed) for an .mp4. Several x0 
+values render one movie each in parallel worker processes, named by 
+putting {x0} in --output (or appending _x0 to the file name):
+terminal/cmd: python newton_movie.py "x**2 - 2" numeric 1 -2 2 --output newton.gif
+terminal/cmd: python newton_movie.py "x**2 - 2" numeric 0.5 1 3 -2 2 --output "newton_{x0:g}.gif"
 
 A classic example to illustrate Newton's method is finding the roots 
 of the polynomial function f(x)=x^2 −2, which has the roots ±sqrt(2)
@@ -33,46 +44,155 @@ behavior of the function around the root, such as -2 and 2.
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
 import argparse
+import os
+import shutil
+import subprocess
 import sys
 
+from newton_expression import Expression
+
 def parse_arguments():
     # Define command-line argument parsing
     parser = argparse.ArgumentParser(description="Illustrate Newton's method convergence.")
     parser.add_argument('f_formula', type=str, help='String formula for f(x)')
-    parser.add_argument('df_formula', type=str, help='String formula for f\'(x) or "numeric" for numerical derivative')
-    parser.add_argument('x0', type=float, help='Initial guess for the root')
+    parser.add_argument('df_formula', type=str, help='String formula for f\'(x) or "numeric" for a derivative derived from f_formula')
+    parser.add_argument('x0', type=float, nargs='+', help='Initial guess for the root, several for a batch of movies')
     parser.add_argument('xmin', type=float, help='Minimum x-axis value')
     parser.add_argument('xmax', type=float, help='Maximum x-axis value')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Render without a window to this .gif or .mp4 file; with several x0 it may contain {x0}')
+    parser.add_argument('--frames', type=int, default=100, help='Number of frames (default: 100)')
+    parser.add_argument('--fps', type=int, default=10, help='Frames per second (default: 10)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for a batch (default: number of CPUs)')
     return parser.parse_args()
 
+def parse_functions(f_formula, df_formula):
+    # Parse the function and its derivative once
+    f = Expression(f_formula)
+    df = f.derivative() if df_formula == 'numeric' else Expression(df_formula)
+    return f, df
+
+# Implement Newton's method
+def newton_method(f, df, x0, tol=1e-7, max_iter=100):
+    x = x0
+    for i in range(max_iter):
+        x_new = x - f(x) / df(x)
+        if abs(x_new - x) < tol:
+            return x_new, i + 1  # Return the root and the number of iterations
+        x = x_new
+    return x, max_iter
+
+def tangent_data(f, df, x):
+    # Tangent line through (x, f(x)) down to the axis, and the vertical line at x
+    y = f(x)
+    dydx = df(x)
+    return ([x - y / dydx, x + y / dydx], [0, 2 * y]), ([x, x], [0, y])
+
+def render_frames(f, df, x0, root, xmin, xmax, n_frames=100, dpi=100):
+    """
+    RGB frames of the convergence movie drawn offscreen on an Agg canvas.
+    The curve, axes and legend are drawn once and saved as a background;
+    each frame restores it and draws only the tangent and root lines.
+    """
+    fig = Figure(dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    x_vals = np.linspace(xmin, xmax, 400)
+    ax.plot(x_vals, f(x_vals), label='f(x)')
+    tangent_line, = ax.plot([], [], 'b-', label='Tangent', animated=True)
+    root_line, = ax.plot([], [], 'g-', label='Approximate Root', animated=True)
+    ax.legend()
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+
+    for x in np.linspace(x0, root, n_frames):
+        canvas.restore_region(background)
+        tangent, vertical = tangent_data(f, df, x)
+        tangent_line.set_data(*tangent)
+        root_line.set_data(*vertical)
+        ax.draw_artist(tangent_line)
+        ax.draw_artist(root_line)
+        yield np.asarray(canvas.buffer_rgba())[:, :, :3]
+
+def save_gif(frames, filename, fps=10, colors=256):
+    # The palette of the first frame is reused for all frames, which skips Pillow's
+    # per-frame adaptive quantization; frames are converted as the generator yields them
+    frames = iter(frames)
+    first = Image.fromarray(next(frames)).quantize(colors, method=Image.Quantize.FASTOCTREE)
+    rest = (Image.fromarray(frame).quantize(palette=first, dither=Image.Dither.NONE) for frame in frames)
+    first.save(filename, save_all=True, append_images=rest, duration=1000 / fps, loop=0, optimize=False)
+
+def save_mp4(frames, filename, fps=10):
+    # Raw RGB frames piped into ffmpeg as they are drawn
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError('Writing .mp4 needs ffmpeg on the PATH, use a .gif file instead')
+    process = None
+    for frame in frames:
+        if process is None:
+            height, width = frame.shape[:2]
+            process = subprocess.Popen(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                                        '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+                                        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', filename],
+                                       stdin=subprocess.PIPE)
+        process.stdin.write(np.ascontiguousarray(frame).tobytes())
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f'ffmpeg failed to write {filename}')
+
+def render_movie(f_formula, df_formula, x0, xmin, xmax, filename, n_frames=100, fps=10):
+    """Run Newton's method from x0 and render the movie to a .gif or .mp4 file without a window."""
+    f, df = parse_functions(f_formula, df_formula)
+    root, iterations = newton_method(f, df, x0)
+    frames = render_frames(f, df, x0, root, xmin, xmax, n_frames)
+    if filename.lower().endswith('.mp4'):
+        save_mp4(frames, filename, fps)
+    else:
+        save_gif(frames, filename, fps)
+    return root, iterations
+
+def movie_filename(pattern, x0):
+    # Output file for one x0 of a batch, adding _x0 before the extension if the pattern has no {x0}
+    if '{x0' not in pattern:
+        base, extension = os.path.splitext(pattern)
+        pattern = base + '_{x0:g}' + extension
+    return pattern.format(x0=x0)
+
+def render_batch(f_formula, df_formula, x0_values, xmin, xmax, pattern, n_frames=100, fps=10, workers=None):
+    """Render one movie per initial guess in parallel worker processes; returns (x0, filename, root, iterations)."""
+    filenames = [movie_filename(pattern, x0) for x0 in x0_values]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_movie, f_formula, df_formula, x0, xmin, xmax, filename, n_frames, fps)
+                   for x0, filename in zip(x0_values, filenames)]
+        return [(x0, filename) + future.result() for x0, filename, future in zip(x0_values, filenames, futures)]
+
 def main():
     # Parse command line arguments
     args = parse_arguments()
-
-    # Define the function and its derivative
-    def f(x):
-        return eval(args.f_formula)
-
-    def df(x):
-        if args.df_formula == 'numeric':
-            h = 1.0E-7
-            return (f(x + h) - f(x - h)) / (2 * h)
-        else:
-            return eval(args.df_formula)
-
-    # Implement Newton's method
-    def newton_method(f, df, x0, tol=1e-7, max_iter=100):
-        x = x0
-        for i in range(max_iter):
-            x_new = x - f(x) / df(x)
-            if abs(x_new - x) < tol:
-                return x_new, i + 1  # Return the root and the number of iterations
-            x = x_new
-        return x, max_iter
+    f, df = parse_functions(args.f_formula, args.df_formula)
+    if args.df_formula == 'numeric':
+        print(f"f'(x) = {df.formula}")
+
+    # Headless rendering, one movie or a batch in parallel
+    if len(args.x0) > 1:
+        pattern = args.output or 'newton_convergence.gif'
+        for x0, filename, root, iterations in render_batch(args.f_formula, args.df_formula, args.x0, args.xmin,
+                                                           args.xmax, pattern, args.frames, args.fps, args.workers):
+            print(f"x0 = {x0:g}: root {root} found in {iterations} iterations, written to {filename}")
+        return
+    x0 = args.x0[0]
+    if args.output:
+        root, iterations = render_movie(args.f_formula, args.df_formula, x0, args.xmin, args.xmax,
+                                        args.output, args.frames, args.fps)
+        print(f"Root: {root} found in {iterations} iterations, written to {args.output}")
+        return
 
     # Perform Newton's method
-    root, iterations = newton_method(f, df, args.x0)
+    root, iterations = newton_method(f, df, x0)
     print(f"Root: {root} found in {iterations} iterations")
 
     # Visualization setup
@@ -87,20 +207,18 @@ def main():
 
     # Update function for the animation
     def update(frame):
-        x = frame
-        y = f(x)
-        dydx = df(x)
-        tangent_line.set_data([x - y / dydx, x + y / dydx], [0, 2 * y])
-        root_line.set_data([x, x], [0, y])
+        tangent, vertical = tangent_data(f, df, frame)
+        tangent_line.set_data(*tangent)
+        root_line.set_data(*vertical)
         return tangent_line, root_line
 
     # Create the animation
-    ani = FuncAnimation(fig, update, frames=np.linspace(args.x0, root, 100), blit=True)
+    ani = FuncAnimation(fig, update, frames=np.linspace(x0, root, args.frames), blit=True)
     plt.legend()
     plt.show()
 
     # Save the animation
-    ani.save('newton_convergence.gif', writer='imagemagick', fps=10)
+    ani.save('newton_convergence.gif', writer='imagemagick', fps=args.fps)
 
 if __name__ == "__main__":
     # Ensure there are command line arguments before proceeding
@@ -11,28 +11,78 @@ This script solves the differential equation dt/du=−u
 with the initial condition u(0)=1, which has an exact solution
 u(t)=e^−t. It compares the maximum error of each method against 
 the exact solution over the interval[0,5]. 
-The Newton function provided is a simple implementation for the 
-BackwardEuler class and may need to be adapted if the actual ODE 
-requires a more robust or specific approach. You would need to run this 
-script in an environment where scipy is installed to use solve_ivp. 
-The Newton function here is a placeholder; if you have a specific 
-implementation, especially for vectorized functions or more complex ODEs, 
-you should use that instead.
+You would need to run this script in an environment where scipy is 
+installed to use solve_ivp. 
+BackwardEuler solves its implicit equation with ModifiedNewton, which works 
+for scalar and vector ODEs. The Jacobian comes from jac(u, t) if given, or 
+from forward differences, and its LU factorization is reused across 
+iterations and steps until the Newton convergence degrades. When even a 
+fresh Jacobian at u[k] does not converge, as on the first step of a stiff 
+chemical system, BackwardEuler falls back to a full Newton iteration with 
+the Jacobian of every iterate. The counters 
+n_jac_evals and n_lu_decomps report how often that happened. Inside a 
+solver_trace.tracing() block every ModifiedNewton solve is recorded.
+For stiff problems there are two higher order implicit methods sharing 
+the same ModifiedNewton: RadauIIA (order 5, on the given time_points) 
+and BDF (variable order 1-5 with adaptive steps and dense output).
+
+ForwardEuler and RungeKutta4 also have a workspace mode, 
+ForwardEuler(f, workspace=True), where f(u, t, out) writes the 
+right-hand side into out. The stage buffers are allocated once per 
+solve() and the solution array is updated in place, which avoids the 
+temporary arrays created on every step for long runs of large systems.
+
+solve_ensemble(U0s, time_points) integrates many initial conditions 
+together, one vectorized step for all members, and returns an array of 
+shape (n_steps, n_ensemble, neq), optionally as a .npy memory map.
+
+For runs too long to keep in memory, iter_solve(time_points, every) is a 
+generator over every Nth state and solve_stream sends them to a sink such 
+as NpyStreamWriter. Only a RingBuffer of recent states is kept, and 
+TimeGrid(t0, T, n) replaces the array of time points.
+
+solve(time_points, checkpoint=Checkpointer('run.npz')) saves the run 
+periodically, and solve(time_points, resume='run.npz') continues it with 
+bit-identical results from the saved step on.
+
+DormandPrince is an adaptive 5(4) embedded Runge-Kutta solver with 
+step-size control from rtol/atol. It reports the solution at arbitrary 
+time_points with its dense output and counts the RHS evaluations in 
+n_f_evals.
 """
 # Import Libraries
+import io
+import os
+import time
 import numpy as np
 from scipy.integrate import solve_ivp
+from scipy.linalg import lu_factor, lu_solve
+
+import solver_trace
 
 class ODESolver:
     # Superclass for numerical methods solving scalar and vector ODEs
-    def __init__(self, f):
+    def __init__(self, f, workspace=False):
         if not callable(f):
             raise TypeError(f'f is {type(f)}, not a function')
-        self.f = lambda u, t: np.asarray(f(u, t), float)
+        self.workspace = workspace
+        if workspace:
+            # In workspace mode f(u, t, out) writes the right-hand side into out
+            self.f = f
+        else:
+            self.f = lambda u, t: np.asarray(f(u, t), float)
 
     def advance(self):
         raise NotImplementedError
 
+    def allocate_workspace(self):
+        # Stage buffers needed by advance_inplace, created once per solve()
+        pass
+
+    def advance_inplace(self, u, t, dt, out):
+        # Write the solution at t + dt into out without allocating arrays
+        raise NotImplementedError(f'{self.__class__.__name__} has no workspace mode')
+
     def set_initial_condition(self, U0):
         if isinstance(U0, (float, int)):
             self.neq = 1
@@ -42,7 +92,9 @@ class ODESolver:
             self.neq = U0.size
         self.U0 = U0
 
-    def solve(self, time_points, terminate=None):
+    def solve(self, time_points, terminate=None, checkpoint=None, resume=None):
+        # checkpoint is a Checkpointer that saves the run every few steps,
+        # resume the name of such a checkpoint file to continue from
         if terminate is None:
             terminate = lambda u, t, step_no: False
         if isinstance(time_points, (float, int)):
@@ -50,15 +102,364 @@ class ODESolver:
         
         self.t = np.asarray(time_points)
         n = self.t.size
+        self.k_start = 0
+        self.resume_state = None
+        if self.workspace:
+            u = np.zeros((n, self.neq))
+            u[0] = self.U0
+            self.u = u if self.neq > 1 else u[:, 0]
+            if resume is not None:
+                self.load_checkpoint(resume)
+            self.step_loop_inplace(u, terminate, checkpoint)
+            return self.u, self.t
+
         self.u = np.zeros((n, self.neq)) if self.neq > 1 else np.zeros(n)
         self.u[0] = self.U0
-        
-        for k in range(n-1):
+        if resume is not None:
+            self.load_checkpoint(resume)
+        self.step_loop(terminate, checkpoint)
+        return self.u, self.t
+
+    def get_state(self):
+        # Solver state beyond u and k needed to continue a run bit for bit,
+        # None when the solver is not at a point where it can be saved
+        return {}
+
+    def set_state(self, state):
+        pass
+
+    def load_checkpoint(self, filename):
+        with np.load(filename) as data:
+            k = int(data['k'])
+            if int(data['n']) != self.t.size or data['t_k'] != self.t[k]:
+                raise ValueError(f'{filename} was written for different time_points')
+            if data['history']:
+                row_shape = np.shape(self.u[0])
+                rows = np.fromfile(filename + '.rows', float, count=(k + 1) * int(np.prod(row_shape)))
+                self.u[:k+1] = rows.reshape((k + 1,) + row_shape)
+            else:
+                self.u[1:k] = np.nan  # only the state vector u[k] was saved
+                self.u[k] = data['u_k']
+            state = {name[len('state_'):]: data[name] for name in data.files
+                     if name.startswith('state_')}
+        self.k = self.k_start = k
+        self.set_state(state)
+
+    def solve_ensemble(self, U0s, time_points, terminate=None, filename=None):
+        # Integrate every row of U0s, shape (n_ensemble, neq), together.
+        # f(u, t) then receives u of shape (n_ensemble, neq) and must work
+        # along the last axis. With filename the result is a .npy memory map.
+        if terminate is None:
+            terminate = lambda u, t, step_no: False
+        if isinstance(time_points, (float, int)):
+            raise TypeError('solve_ensemble: time_points is not a sequence')
+        U0s = np.asarray(U0s, float)
+        if U0s.ndim == 1:
+            U0s = U0s[:, np.newaxis]  # ensemble of scalar ODEs
+        if U0s.ndim != 2:
+            raise ValueError(f'solve_ensemble: U0s has shape {U0s.shape}, not (n_ensemble, neq)')
+        n_ensemble, self.neq = U0s.shape
+        self.U0 = U0s
+
+        self.t = np.asarray(time_points)
+        shape = (self.t.size, n_ensemble, self.neq)
+        if filename is None:
+            self.u = np.zeros(shape)
+        else:
+            self.u = np.lib.format.open_memmap(filename, mode='w+', dtype=float, shape=shape)
+        self.u[0] = U0s
+        self.k_start = 0
+        self.resume_state = None
+        if self.workspace:
+            self.step_loop_inplace(self.u, terminate)
+        else:
+            self.step_loop(terminate)
+        if filename is not None:
+            self.u.flush()
+        return self.u, self.t
+
+    def iter_solve(self, time_points, every=1, window=2, terminate=None):
+        # Generator over (k, t[k], u[k]) for every `every`-th time point and
+        # the last one. Only a RingBuffer of `window` states is kept, and
+        # time_points may be a TimeGrid, so memory does not grow with the
+        # number of steps.
+        if terminate is None:
+            terminate = lambda u, t, step_no: False
+        if isinstance(time_points, (float, int)):
+            raise TypeError('iter_solve: time_points is not a sequence')
+        self.t = time_points if isinstance(time_points, TimeGrid) else np.asarray(time_points, float)
+        n = self.t.size
+        if self.workspace:
+            self.u = RingBuffer(n, (self.neq,), window)
+        else:
+            self.u = RingBuffer(n, (self.neq,) if self.neq > 1 else (), window)
+        self.u[0] = self.U0
+        self.k_start = 0
+        self.resume_state = None
+        steps = self.steps_inplace(self.u, terminate) if self.workspace else self.steps(terminate)
+
+        yield 0, self.t[0], np.copy(self.u[0])
+        k = 0
+        for k in steps:
+            if k % every == 0 or k == n - 1:
+                yield k, self.t[k], np.copy(self.u[k])
+        if k % every != 0 and k != n - 1:
+            yield k, self.t[k], np.copy(self.u[k])  # stopped early by terminate
+
+    def solve_stream(self, time_points, sink, every=1, window=2, terminate=None):
+        # Send every `every`-th state to sink(k, t, u), e.g. an NpyStreamWriter,
+        # and return the number of states sent
+        n_rows = 0
+        for k, t, u in self.iter_solve(time_points, every, window, terminate):
+            sink(k, t, u)
+            n_rows += 1
+        return n_rows
+
+    def step_loop(self, terminate, checkpoint=None):
+        if checkpoint is None:
+            for k in self.steps(terminate):
+                pass
+            return
+        checkpoint.start(self)
+        for k in self.steps(terminate):
+            checkpoint.step(self, k)
+        checkpoint.stop()
+
+    def step_loop_inplace(self, u, terminate, checkpoint=None):
+        if checkpoint is not None:
+            checkpoint.start(self)
+        for k in self.steps_inplace(u, terminate):
+            if checkpoint is not None:
+                checkpoint.step(self, k)
+        if checkpoint is not None:
+            checkpoint.stop()
+
+    def steps(self, terminate):
+        # Advance through the time points, yielding the index of every new row
+        for k in range(self.k_start, self.t.size - 1):
             self.k = k
             self.u[k+1] = self.advance()
+            yield k+1
             if terminate(self.u, self.t, self.k+1):
-                break
-        return self.u, self.t
+                return
+
+    def steps_inplace(self, u, terminate):
+        # Stepping loop that updates the rows of the preallocated array u in place
+        if not isinstance(self.t, TimeGrid):
+            self.t = np.asarray(self.t, float)
+        t = self.t
+        self.state_shape = u.shape[1:]
+        self.allocate_workspace()
+
+        advance_inplace = self.advance_inplace
+        for k in range(self.k_start, t.size - 1):
+            self.k = k
+            advance_inplace(u[k], t[k], t[k+1] - t[k], u[k+1])
+            yield k+1
+            if terminate(self.u, t, k+1):
+                return
+
+class TimeGrid:
+    # Uniform time points t0, t0 + dt, ..., T computed on demand, so long
+    # streaming runs need not hold an array of 10^8 time points
+    def __init__(self, t0, T, n):
+        if n < 2 or T <= t0:
+            raise ValueError(f'TimeGrid: need n >= 2 and T > t0, got n={n}, t0={t0}, T={T}')
+        self.t0 = float(t0)
+        self.T = float(T)
+        self.size = int(n)
+        self.dt = (self.T - self.t0) / (self.size - 1)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.size
+        if not 0 <= k < self.size:
+            raise IndexError(f'TimeGrid index {k} out of range')
+        return self.T if k == self.size - 1 else self.t0 + k * self.dt
+
+class RingBuffer:
+    # The last `window` rows of an (n, ...) solution array. Indexing with the
+    # step number works as for the full array as long as only recent rows
+    # are used, which holds for all the one-step methods.
+    def __init__(self, n, row_shape, window=2):
+        if window < 2:
+            raise ValueError('RingBuffer: window must hold at least 2 states')
+        self.data = np.zeros((window,) + tuple(row_shape))
+        self.window = window
+        self.shape = (n,) + tuple(row_shape)
+
+    def __getitem__(self, k):
+        return self.data[k % self.window]
+
+    def __setitem__(self, k, value):
+        self.data[k % self.window] = value
+
+def stream_rows(n_points, every):
+    # Number of states iter_solve yields for n_points time points
+    return (n_points - 1) // every + 1 + (1 if (n_points - 1) % every else 0)
+
+class NpyStreamWriter:
+    # Sink for solve_stream that writes states (and optionally times) into
+    # .npy files. Rows are collected in a chunk buffer and each full chunk is
+    # copied through a memory map of just that part of the file, so memory
+    # use is bounded by the chunk size and not by the length of the run.
+    def __init__(self, filename, n_rows, row_shape, t_filename=None, chunk=4096):
+        self.files = [(filename, tuple(row_shape))]
+        if t_filename is not None:
+            self.files.append((t_filename, ()))
+        self.n_rows = n_rows
+        self.chunk = chunk
+        self.offsets = []
+        for name, shape in self.files:
+            mm = np.lib.format.open_memmap(name, mode='w+', dtype=float, shape=(n_rows,) + shape)
+            self.offsets.append(mm.offset)
+            del mm
+        self.buffers = [np.zeros((chunk,) + shape) for name, shape in self.files]
+        self.n_buffered = 0
+        self.n_written = 0
+
+    def __call__(self, k, t, u):
+        if self.n_written + self.n_buffered >= self.n_rows:
+            raise ValueError(f'NpyStreamWriter: more than {self.n_rows} rows')
+        self.buffers[0][self.n_buffered] = u
+        if len(self.buffers) > 1:
+            self.buffers[1][self.n_buffered] = t
+        self.n_buffered += 1
+        if self.n_buffered == self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.n_buffered == 0:
+            return
+        for (name, shape), offset, buffer in zip(self.files, self.offsets, self.buffers):
+            row_bytes = buffer[0].nbytes
+            mm = np.memmap(name, dtype=float, mode='r+', shape=(self.n_buffered,) + shape,
+                           offset=offset + self.n_written * row_bytes)
+            mm[:] = buffer[:self.n_buffered]
+            mm.flush()
+            del mm
+        self.n_written += self.n_buffered
+        self.n_buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Checkpointer:
+    # Periodic checkpoints for ODESolver.solve in a binary .npz file: the
+    # step index k, the state vector u[k] and the solver state from
+    # get_state(), e.g. the Newton_iter history, the cached Jacobian and LU
+    # factors, or the step size and history of the adaptive solvers. Each
+    # write goes to a temporary file that replaces the old checkpoint, so a
+    # run killed while writing keeps the previous one. With history=True
+    # the solution rows are also appended to filename + '.rows', so a
+    # resumed solve() returns the full solution and not only the rows after
+    # k. Writing is kept below max_overhead times the time spent stepping:
+    # a checkpoint is only written, at least every steps apart, once the
+    # time of all writes so far plus safety times the expected time of the
+    # next one fits in that budget. The first write is expected to take
+    # twice the time of serializing the checkpoint into memory, measured
+    # before the first write and counted as overhead, the later ones as long as
+    # the previous write. So the target holds after every write as long as
+    # no write takes more than safety times the expected time. A run too
+    # short for its first write pays only for the calibration, which can
+    # exceed the target when the run lasts less than about
+    # 1 / max_overhead serializations.
+    def __init__(self, filename, every=1000, max_overhead=0.01, history=False, safety=2.0):
+        self.filename = filename
+        self.every = every
+        self.max_overhead = max_overhead
+        self.history = history
+        self.safety = safety
+        self.n_writes = 0
+        self.write_time = 0.0
+        self.step_time = 0.0
+        self.expected = None
+
+    @property
+    def overhead(self):
+        # Fraction of the stepping time spent writing checkpoints
+        return self.write_time / self.step_time if self.step_time > 0 else 0.0
+
+    def start(self, solver):
+        self.steps_since = 0
+        self.interval = self.every
+        if self.history:
+            # Keep the rows up to where a resumed run starts, drop the rest
+            self.rows_written = solver.k_start + 1 if solver.k_start > 0 else 0
+            row_bytes = np.asarray(solver.u[0], float).nbytes
+            with open(self.filename + '.rows', 'ab') as file:
+                file.truncate(self.rows_written * row_bytes)
+        self.last = time.perf_counter()
+
+    def step(self, solver, k):
+        self.steps_since += 1
+        if self.steps_since < self.interval:
+            return
+        now = time.perf_counter()
+        state = solver.get_state()
+        if state is None:
+            return  # not at a point that can be saved, try after the next step
+        stepped = now - self.last
+        if self.expected is None:
+            np.savez(io.BytesIO(), **self.arrays(solver, k, state))
+            calibration = time.perf_counter() - now
+            self.write_time += calibration
+            self.last += calibration
+            self.expected = 2 * calibration
+        time_per_step = stepped / self.steps_since
+        if self.write_time + self.safety * self.expected > self.max_overhead * (self.step_time + stepped):
+            # Not yet in the budget, wait for the steps that bring it there
+            self.interval = self.steps_since + self.steps_until_write(time_per_step, stepped)
+            return
+        now = time.perf_counter()
+        self.write(solver, k, state)
+        write_time = time.perf_counter() - now
+        self.write_time += write_time
+        self.step_time += stepped
+        self.expected = write_time
+        self.steps_since = 0
+        self.interval = max(self.every, self.steps_until_write(time_per_step, 0.0))
+        self.last = time.perf_counter()
+
+    def steps_until_write(self, time_per_step, stepped):
+        # Steps until the next write fits in the budget, stepped seconds
+        # after the last write
+        budget = (self.write_time + self.safety * self.expected) / self.max_overhead
+        missing = budget - self.step_time - stepped
+        if time_per_step <= 0:
+            return 1
+        return max(1, int(np.ceil(missing / time_per_step)))
+
+    def stop(self):
+        self.step_time += time.perf_counter() - self.last
+
+    def arrays(self, solver, k, state):
+        # Everything a checkpoint of step k holds, by name
+        arrays = {'k': k, 'n': solver.t.size, 't_k': solver.t[k], 'u_k': solver.u[k],
+                  'history': self.history}
+        arrays.update({'state_' + name: value for name, value in state.items()})
+        return arrays
+
+    def write(self, solver, k, state):
+        if self.history:
+            # Rows go first, a checkpoint never points past the saved rows
+            with open(self.filename + '.rows', 'ab') as file:
+                np.ascontiguousarray(solver.u[self.rows_written:k+1], float).tofile(file)
+            self.rows_written = k + 1
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as file:
+            np.savez(file, **self.arrays(solver, k, state))
+        os.replace(tmp, self.filename)
+        self.n_writes += 1
 
 class ForwardEuler(ODESolver):
     def advance(self):
@@ -66,6 +467,11 @@ class ForwardEuler(ODESolver):
         dt = t[k+1] - t[k]
         return u[k] + dt * f(u[k], t[k])
 
+    def advance_inplace(self, u, t, dt, out):
+        self.f(u, t, out)
+        out *= dt
+        out += u
+
 class RungeKutta4(ODESolver):
     def advance(self):
         u, f, k, t = self.u, self.f, self.k, self.t
@@ -77,58 +483,699 @@ class RungeKutta4(ODESolver):
         K4 = dt * f(u[k] + K3, t[k] + dt)
         return u[k] + (1/6.0) * (K1 + 2 * K2 + 2 * K3 + K4)
 
-class BackwardEuler(ODESolver):
-    def __init__(self, f):
+    def allocate_workspace(self):
+        self.K1, self.K2, self.K3, self.K4, self.tmp = np.zeros((5,) + self.state_shape)
+
+    def advance_inplace(self, u, t, dt, out):
+        f, K1, K2, K3, K4, tmp = self.f, self.K1, self.K2, self.K3, self.K4, self.tmp
+        dt2 = dt / 2.0
+        # Here the K's hold slopes, the dt factor is applied once at the end
+        f(u, t, K1)
+        np.multiply(K1, dt2, out=tmp)
+        tmp += u
+        f(tmp, t + dt2, K2)
+        np.multiply(K2, dt2, out=tmp)
+        tmp += u
+        f(tmp, t + dt2, K3)
+        np.multiply(K3, dt, out=tmp)
+        tmp += u
+        f(tmp, t + dt, K4)
+        np.add(K2, K3, out=tmp)
+        tmp *= 2
+        tmp += K1
+        tmp += K4
+        tmp *= dt / 6.0
+        np.add(u, tmp, out=out)
+
+class ImplicitSolver(ODESolver):
+    # Superclass for the implicit methods, which solve their nonlinear
+    # equations with a shared ModifiedNewton in self.newton
+    @property
+    def n_jac_evals(self):
+        return self.newton.n_jac_evals
+
+    @property
+    def n_lu_decomps(self):
+        return self.newton.n_lu_decomps
+
+    def get_state(self):
+        state = {'Newton_iter': np.array(self.Newton_iter, int)}
+        state.update({'newton_' + name: value for name, value in self.newton.get_state().items()})
+        return state
+
+    def set_state(self, state):
+        self.Newton_iter = [int(n) for n in state['Newton_iter']]
+        self.newton.set_state({name[len('newton_'):]: value for name, value in state.items()
+                               if name.startswith('newton_')})
+
+class BackwardEuler(ImplicitSolver):
+    # Implicit Euler for scalar and vector ODEs. Each step solves
+    # w - dt*f(w, t[k+1]) = u[k] with ModifiedNewton, using jac(u, t) for
+    # the Jacobian df/du when given and forward differences otherwise.
+    def __init__(self, f, jac=None, tol=1e-10, max_iter=30):
         super().__init__(f)
-        try:
-            u = np.array([1])
-            t = 1
-            value = f(u, t)
-        except IndexError:
-            raise ValueError('f(u,t) must return float/int')
+        self.newton = ModifiedNewton(self.f, jac, tol, max_iter)
 
     def advance(self):
         u, f, k, t = self.u, self.f, self.k, self.t
         dt = t[k+1] - t[k]
-        
+        uk = np.asarray(u[k], float)
+        shape = uk.shape
+        if uk.ndim < 2:
+            uk = uk.reshape(self.neq)  # an ensemble keeps one row per member
+
         def F(w):
-            return w - dt * f(w, t[k+1]) - u[k]
+            return w - dt * f(w.reshape(shape), t[k+1]).reshape(w.shape) - uk
 
-        dFdw = Derivative(F)
-        w_start = u[k] + dt * f(u[k], t[k])  # Forward Euler step
-        unew, n, F_value = Newton(F, w_start, dFdw, 30)
         if k == 0:
+            self.newton.reset()
             self.Newton_iter = []
+        w_start = uk + dt * f(u[k], t[k]).reshape(uk.shape)  # Forward Euler step
+        unew, n = self.newton.solve(F, w_start, uk, t[k], dt,
+                                    lambda J, c: np.eye(self.neq) - c * J, state=lambda w: w)
         self.Newton_iter.append(n)
-        if n >= 30:
-            print(f"Newton's failed to converge at t={t[k+1]} ({n} iterations)")
-        return unew
+        return unew.reshape(shape)
+
+class DormandPrince(ODESolver):
+    # Adaptive Dormand-Prince 5(4) pair with error control, FSAL and dense output.
+    # The internal steps are chosen from rtol/atol, time_points only says where
+    # the solution is reported, which is done with the 4th order interpolant.
+    C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+    A = [np.array([]),
+         np.array([1/5]),
+         np.array([3/40, 9/40]),
+         np.array([44/45, -56/15, 32/9]),
+         np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+         np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]),
+         np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])]
+    E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+    P = np.array([
+        [1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+        [0, 0, 0, 0],
+        [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+        [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+        [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+        [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+        [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+    order = 5
+
+    def __init__(self, f, rtol=1e-6, atol=1e-9, first_step=None, max_step=np.inf):
+        super().__init__(f)
+        self.rtol = rtol
+        self.atol = atol
+        self.first_step = first_step
+        self.max_step = max_step
+
+    def error_norm(self, y, y_new, error):
+        scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+        return np.sqrt(np.mean((error / scale)**2))
+
+    def get_state(self):
+        return self.adaptive_state
+
+    def set_state(self, state):
+        self.resume_state = state
+
+    def steps(self, terminate):
+        u, t, f = self.u, self.t, self.f
+        if not isinstance(t, TimeGrid) and np.any(np.diff(t) <= 0):
+            raise ValueError('DormandPrince: time_points must be increasing')
+        self.adaptive_state = None
+        t_end = t[-1]
+        y = np.array(u[self.k_start], float)
+        K = np.empty((7,) + y.shape)
+        if self.resume_state is None:
+            self.n_f_evals = self.n_accepted = self.n_rejected = 0
+            self.k = 0
+            t_now = t[0]
+            K[0] = f(y, t_now)
+            self.n_f_evals += 1
+            if self.first_step is None:
+                h = initial_step(f, y, K[0], t_now, self.rtol, self.atol, self.order - 1)
+                self.n_f_evals += 1
+            else:
+                h = self.first_step
+            next_out = 1
+        else:
+            state = self.resume_state
+            t_now, h, y, K[0] = state['t_now'][()], state['h'][()], state['y'], state['K0']
+            next_out = self.k_start + 1
+            self.n_f_evals, self.n_accepted, self.n_rejected = (int(n) for n in state['counts'])
+
+        while next_out < t.size:
+            h = min(h, self.max_step, t_end - t_now)
+            # Try steps until the error estimate is accepted
+            while True:
+                for s in range(1, 7):
+                    dy = np.tensordot(self.A[s], K[:s], axes=1)
+                    t_stage = t_now + h if s == 6 else t_now + self.C[s] * h
+                    y_stage = y + h * dy
+                    K[s] = f(y_stage, t_stage)
+                self.n_f_evals += 6
+                y_new = y_stage  # the last stage is the 5th order solution
+                error = h * np.tensordot(self.E, K, axes=1)
+                err = self.error_norm(y, y_new, error)
+                if err <= 1:
+                    break
+                self.n_rejected += 1
+                h *= max(0.2, 0.9 * err**(-1 / self.order))
+                if t_now + h == t_now:
+                    raise RuntimeError(f'DormandPrince: step size underflow at t={t_now}')
+
+            t_new = t_end if h == t_end - t_now else t_now + h
+            Q = np.tensordot(self.P.T, K, axes=1)
+            t_old, y_old, h_old = t_now, y, h
+            self.n_accepted += 1
+            factor = 10 if err == 0 else min(10, 0.9 * err**(-1 / self.order))
+            t_now, y, h = t_new, y_new, h * factor
+            K[0] = K[6]  # first same as last
+
+            # Dense output for every requested time point inside the step
+            while next_out < t.size and t[next_out] <= t_now:
+                x = (t[next_out] - t_old) / h_old
+                powers = np.cumprod(np.full(4, x))
+                u[next_out] = y_old + h_old * np.tensordot(powers, Q, axes=1)
+                self.k = next_out
+                # The step can be saved once its last output point is written
+                if next_out + 1 == t.size or t[next_out + 1] > t_now:
+                    self.adaptive_state = {
+                        't_now': t_now, 'h': h, 'y': y, 'K0': K[0],
+                        'counts': np.array([self.n_f_evals, self.n_accepted, self.n_rejected])}
+                else:
+                    self.adaptive_state = None
+                yield next_out
+                if terminate(u, t, next_out):
+                    return
+                next_out += 1
+
+class RadauIIA(ImplicitSolver):
+    # 3-stage Radau IIA collocation method of order 5 on the steps given by
+    # time_points. It is L-stable like BackwardEuler, so stiff problems can
+    # take large steps. The stage equations for Z = U - u[k] are solved with
+    # the same ModifiedNewton as BackwardEuler, with iteration matrix
+    # I - dt*kron(A, J). Where Newton does not converge over a whole step,
+    # the step is split into halved substeps.
+    s6 = np.sqrt(6)
+    C = np.array([(4 - s6) / 10, (4 + s6) / 10, 1])
+    A = np.array([[(88 - 7 * s6) / 360, (296 - 169 * s6) / 1800, (-2 + 3 * s6) / 225],
+                  [(296 + 169 * s6) / 1800, (88 + 7 * s6) / 360, (-2 - 3 * s6) / 225],
+                  [(16 - s6) / 36, (16 + s6) / 36, 1 / 9]])
+
+    def __init__(self, f, jac=None, tol=1e-10, max_iter=30):
+        super().__init__(f)
+        self.newton = ModifiedNewton(self.f, jac, tol, max_iter)
+
+    def advance(self):
+        u, k, t = self.u, self.k, self.t
+        uk = np.asarray(u[k], float)
+        shape = uk.shape
+        if uk.ndim < 2:
+            uk = uk.reshape(self.neq)
+        if k == 0:
+            self.newton.reset()
+            self.Newton_iter = []
+        # When Newton fails the interval is covered by substeps, halving the
+        # substep until it converges as BDF does with its step
+        t_now, t_end, y = t[k], t[k+1], uk
+        h = t_end - t_now
+        n_total = 0
+        while True:
+            last = h >= t_end - t_now
+            if last:
+                h = t_end - t_now
+            y_new, n, converged = self.step(y, t_now, h, shape)
+            n_total += n
+            if converged:
+                if last:
+                    break
+                t_now, y = t_now + h, y_new
+                continue
+            h *= 0.5
+            if h < 10 * abs(np.nextafter(t_now, np.inf) - t_now):
+                raise RuntimeError(f'RadauIIA: step size too small at t={t_now}')
+        self.Newton_iter.append(n_total)
+        return y_new.reshape(shape)
+
+    def step(self, y, t0, h, shape):
+        # One Radau IIA step of size h from y at t0, returns (y_new, iterations, converged)
+        f = self.f
+        stages = y.shape[:-1] + (3, self.neq)
+
+        def F(w):
+            Z = w.reshape(stages)
+            U = y[..., np.newaxis, :] + Z
+            K = np.stack([f(U[..., i, :].reshape(shape), t0 + self.C[i] * h).reshape(y.shape)
+                          for i in range(3)], axis=-2)
+            return (Z - h * np.einsum('ij,...jn->...in', self.A, K)).reshape(w.shape)
+
+        w_start = np.zeros(y.shape[:-1] + (3 * self.neq,))
+        w, n, converged = self.newton.try_solve(
+            F, w_start, y, t0, h, lambda J, c: np.eye(3 * self.neq) - c * kron_blocks(self.A, J),
+            state=lambda w: y + w.reshape(stages)[..., 2, :])
+        # Radau IIA is stiffly accurate, the last stage is the new solution
+        return y + w.reshape(stages)[..., 2, :], n, converged
+
+class BDF(ImplicitSolver):
+    # Variable order (1-5), variable step backward differentiation formulas
+    # in the quasi-constant step size form of Shampine & Reichelt (the NDF
+    # variant used by MATLAB's ode15s and scipy's BDF). The history is kept
+    # as backward differences D, which are rescaled when the step changes.
+    # As in DormandPrince the steps are chosen from rtol/atol and
+    # time_points only says where the solution is reported.
+    max_order = 5
+    newton_max_iter = 4
+    kappa = np.array([0, -0.1850, -1/9, -0.0823, -0.0415, 0])
+    gamma = np.hstack((0, np.cumsum(1 / np.arange(1, max_order + 1))))
+    alpha = (1 - kappa) * gamma
+    error_const = kappa * gamma + 1 / np.arange(1, max_order + 2)
+
+    def __init__(self, f, jac=None, rtol=1e-6, atol=1e-9, first_step=None, max_step=np.inf):
+        super().__init__(f)
+        self.rtol = rtol
+        self.atol = atol
+        self.first_step = first_step
+        self.max_step = max_step
+        self.newton = ModifiedNewton(self.f, jac)
+        self.newton_tol = max(10 * np.finfo(float).eps / rtol, min(0.03, rtol**0.5))
+
+    def get_state(self):
+        if self.adaptive_state is None:
+            return None
+        state = super().get_state()
+        state.update(self.adaptive_state)
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.resume_state = state
+
+    @staticmethod
+    def change_D(D, order, factor):
+        # Rescale the differences in place for a step size multiplied by factor
+        def compute_R(factor):
+            I = np.arange(1, order + 1)[:, np.newaxis]
+            J = np.arange(1, order + 1)
+            M = np.zeros((order + 1, order + 1))
+            M[1:, 1:] = (I - 1 - factor * J) / I
+            M[0] = 1
+            return np.cumprod(M, axis=0)
+        RU = compute_R(factor) @ compute_R(1)
+        D[:order + 1] = np.tensordot(RU.T, D[:order + 1], axes=1)
+
+    def steps(self, terminate):
+        u, t = self.u, self.t
+        if not isinstance(t, TimeGrid) and np.any(np.diff(t) <= 0):
+            raise ValueError('BDF: time_points must be increasing')
+        self.adaptive_state = None
+        shape = np.shape(u[0])
+        y = np.array(u[self.k_start], float)
+        if y.ndim < 2:
+            y = y.reshape(self.neq)
+
+        def fun(w, t):
+            self.n_f_evals += 1
+            return self.f(w.reshape(shape), t).reshape(w.shape)
 
-class Derivative:
-    def __init__(self, f, h=1E-9):
+        def build(J, c):
+            return np.eye(self.neq) - c * J
+
+        rtol, atol, N = self.rtol, self.atol, self.newton_max_iter
+        t_end = t[-1]
+        if self.resume_state is None:
+            self.newton.reset()
+            self.n_f_evals = self.n_accepted = self.n_rejected = 0
+            self.Newton_iter = []
+            self.k = 0
+            t_now = t[0]
+            f0 = fun(y, t_now)
+            if self.first_step is None:
+                h = initial_step(fun, y, f0, t_now, rtol, atol, 1)
+            else:
+                h = self.first_step
+            D = np.zeros((self.max_order + 3,) + y.shape)
+            D[0] = y
+            D[1] = f0 * h
+            order = 1
+            n_equal_steps = 0
+            next_out = 1
+        else:
+            state = self.resume_state
+            t_now, h, D = state['t_now'][()], state['h'][()], state['D'].copy()
+            order, n_equal_steps = (int(n) for n in state['order'])
+            next_out = self.k_start + 1
+            self.n_f_evals, self.n_accepted, self.n_rejected = (int(n) for n in state['counts'])
+
+        while next_out < t.size:
+            min_step = 10 * abs(np.nextafter(t_now, np.inf) - t_now)
+            if h > self.max_step:
+                self.change_D(D, order, self.max_step / h)
+                h = self.max_step
+                n_equal_steps = 0
+            elif h < min_step:
+                self.change_D(D, order, min_step / h)
+                h = min_step
+                n_equal_steps = 0
+
+            # Try steps until Newton converges and the error estimate is accepted
+            while True:
+                if h < min_step:
+                    raise RuntimeError(f'BDF: step size too small at t={t_now}')
+                t_new = t_now + h
+                if t_new > t_end:
+                    t_new = t_end
+                    self.change_D(D, order, (t_new - t_now) / h)
+                    n_equal_steps = 0
+                h = t_new - t_now
+
+                y_predict = np.sum(D[:order + 1], axis=0)
+                scale = atol + rtol * np.abs(y_predict)
+                psi = np.tensordot(self.gamma[1:order + 1], D[1:order + 1], axes=1) / self.alpha[order]
+                c = h / self.alpha[order]
+                r = y_predict - psi
+                y_new, n_iter, converged = self.newton.try_solve(
+                    lambda w: w - c * fun(w, t_new) - r, y_predict, y_predict, t_new, c, build,
+                    scale=scale, tol=self.newton_tol, max_iter=N)
+                if not converged:
+                    self.n_rejected += 1
+                    h *= 0.5
+                    self.change_D(D, order, 0.5)
+                    n_equal_steps = 0
+                    continue
+
+                d = y_new - y_predict
+                safety = 0.9 * (2 * N + 1) / (2 * N + n_iter)
+                scale = atol + rtol * np.abs(y_new)
+                error_norm = np.sqrt(np.mean((self.error_const[order] * d / scale)**2))
+                if error_norm > 1:
+                    self.n_rejected += 1
+                    factor = max(0.2, safety * error_norm**(-1 / (order + 1)))
+                    h *= factor
+                    self.change_D(D, order, factor)
+                    n_equal_steps = 0
+                    continue
+                break
+
+            self.n_accepted += 1
+            self.Newton_iter.append(n_iter)
+            n_equal_steps += 1
+            t_now = t_new
+            D[order + 2] = d - D[order + 1]
+            D[order + 1] = d
+            for i in reversed(range(order + 1)):
+                D[i] += D[i + 1]
+
+            # After order + 1 equal steps, pick the order with the largest step
+            if n_equal_steps >= order + 1:
+                if order > 1:
+                    error_m = self.error_const[order - 1] * D[order]
+                    error_m_norm = np.sqrt(np.mean((error_m / scale)**2))
+                else:
+                    error_m_norm = np.inf
+                if order < self.max_order:
+                    error_p = self.error_const[order + 1] * D[order + 2]
+                    error_p_norm = np.sqrt(np.mean((error_p / scale)**2))
+                else:
+                    error_p_norm = np.inf
+                error_norms = np.array([error_m_norm, error_norm, error_p_norm])
+                with np.errstate(divide='ignore'):
+                    factors = error_norms**(-1 / np.arange(order, order + 3))
+                order += np.argmax(factors) - 1
+                factor = min(10, safety * np.max(factors))
+                h *= factor
+                self.change_D(D, order, factor)
+                n_equal_steps = 0
+
+            # Dense output from the interpolating polynomial of the differences
+            t_shift = t_now - h * np.arange(order)
+            denom = h * (1 + np.arange(order))
+            while next_out < t.size and t[next_out] <= t_now:
+                p = np.cumprod((t[next_out] - t_shift) / denom)
+                u[next_out] = (D[0] + np.tensordot(p, D[1:order + 1], axes=1)).reshape(shape)
+                self.k = next_out
+                # The step can be saved once its last output point is written
+                if next_out + 1 == t.size or t[next_out + 1] > t_now:
+                    self.adaptive_state = {
+                        't_now': t_now, 'h': h, 'D': D, 'order': np.array([order, n_equal_steps]),
+                        'counts': np.array([self.n_f_evals, self.n_accepted, self.n_rejected])}
+                else:
+                    self.adaptive_state = None
+                yield next_out
+                if terminate(u, t, next_out):
+                    return
+                next_out += 1
+
+class Jacobian:
+    # Jacobian df/du of f(u, t) for states u of shape (neq,) or (n_ensemble, neq), analytic or
+    # by forward differences. The leading axes are independent ensemble
+    # members, so the result has shape (..., neq, neq) and the difference
+    # quotients need only neq evaluations of f, one per column.
+    def __init__(self, f, jac=None):
         self.f = f
-        self.h = float(h)
-
-    def __call__(self, x):
-        return (self.f(x+self.h) - self.f(x-self.h)) / (2*self.h)
-
-# Simple Newton's method implementation for demonstration
-def Newton(F, x0, F_derivative, tol=1e-10, max_iter=30):
-    x = x0
-    for i in range(max_iter):
-        F_value = F(x)
-        F_derivative_value = F_derivative(x)
-        if abs(F_value) < tol:
-            return x, i, F_value  # Converged
-        if F_derivative_value == 0:
-            raise RuntimeError("Newton's method failed: derivative is zero.")
-        dx = F_value / F_derivative_value
-        x = x - dx
-    raise RuntimeError("Newton's method failed to converge.")
+        self.jac = jac
+        self.n_evals = 0
+
+    def __call__(self, u, t):
+        self.n_evals += 1
+        if self.jac is not None:
+            return np.asarray(self.jac(u, t), float).reshape(u.shape + u.shape[-1:])
+        neq = u.shape[-1]
+        f0 = self.f(u, t)
+        J = np.empty(u.shape + (neq,))
+        h = np.sqrt(np.finfo(float).eps) * np.maximum(1.0, np.abs(u))
+        for j in range(neq):
+            u_h = u.copy()
+            u_h[..., j] += h[..., j]
+            J[..., j] = (self.f(u_h, t) - f0) / h[..., j, np.newaxis]
+        return J
+
+class ModifiedNewton:
+    # Modified (simplified) Newton iteration for the implicit equations of
+    # BackwardEuler and friends. The Jacobian and the factorization of the
+    # iteration matrix build(J, c) are reused across iterations and across
+    # steps. c changing only forces a new factorization, while a new
+    # Jacobian is evaluated when the iteration converges slowly (contraction
+    # rate above rate_limit or, without scale, more than max_iter // 4
+    # iterations) or fails with an old Jacobian. A failure with a fresh
+    # Jacobian falls back to full Newton when the caller says where the
+    # Jacobian of an iterate is taken.
+    def __init__(self, f, jac=None, tol=1e-10, max_iter=30, rate_limit=0.5, c_rtol=1e-8):
+        self.jacobian = Jacobian(f, jac)
+        self.tol = tol
+        self.max_iter = max_iter
+        self.rate_limit = rate_limit
+        self.c_rtol = c_rtol
+        self.trace_call = -1
+        self.reset()
+
+    def reset(self):
+        # Forget the cached Jacobian and factorization, e.g. for a new solve()
+        self.jacobian.n_evals = 0
+        self.n_lu_decomps = 0
+        self.J = None
+        self.c = None
+        self.lu = None
+        self.J_is_fresh = False
+        self.refresh = True
+
+    @property
+    def n_jac_evals(self):
+        return self.jacobian.n_evals
+
+    def get_state(self):
+        # Cached Jacobian, factorization and counters as arrays for a checkpoint
+        state = {'counts': np.array([self.jacobian.n_evals, self.n_lu_decomps]),
+                 'flags': np.array([self.J_is_fresh, self.refresh])}
+        if self.J is not None:
+            state['J'] = self.J
+        if self.lu is not None:
+            state['lu'], state['piv'] = self.lu
+            state['c'] = self.c
+        return state
+
+    def set_state(self, state):
+        self.jacobian.n_evals, self.n_lu_decomps = (int(n) for n in state['counts'])
+        self.J_is_fresh, self.refresh = (bool(flag) for flag in state['flags'])
+        self.J = state.get('J')
+        self.lu = (state['lu'], state['piv']) if 'lu' in state else None
+        self.c = state['c'][()] if 'c' in state else None
+
+    def update_jacobian(self, u, t):
+        self.J = self.jacobian(u, t)
+        self.J_is_fresh = True
+        self.lu = None
+
+    def factor(self, c, build):
+        # Rounding noise in the time steps should not trigger a refactorization
+        if self.lu is not None and abs(c - self.c) <= self.c_rtol * abs(self.c):
+            return
+        # For an ensemble M is a stack of blocks, one per member, which
+        # lu_factor factors together and counts as one decomposition
+        self.lu = lu_factor(build(self.J, c))
+        self.c = c
+        self.n_lu_decomps += 1
+
+    def linear_solve(self, b):
+        if self.lu[0].ndim == 2:
+            return lu_solve(self.lu, b.reshape(-1)).reshape(b.shape)
+        return lu_solve_blocks(self.lu, b)
+
+    def iterate(self, F, w0, scale=None, tol=None, max_iter=None):
+        # Without scale: converged when max|F| or the max-norm of the update
+        # is below tol, diverging when the update grows twice in a row (or
+        # once with an old Jacobian). With scale: the estimate of Hairer &
+        # Wanner on the scaled RMS norm of the updates, giving up early when
+        # the observed contraction rate cannot reach tol within max_iter
+        # iterations.
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else max_iter
+        w = w0.copy()
+        dw_norm_old = None
+        rate = 0.0
+        growing = False
+        trace = solver_trace.current
+        for n in range(1, max_iter + 1):
+            F_value = F(w)
+            if trace is not None:
+                trace.record(self.trace_call, np.max(np.abs(F_value)))
+            if scale is None and np.max(np.abs(F_value)) < tol:
+                return w, n - 1, rate, True
+            if not np.all(np.isfinite(F_value)):
+                break
+            dw = self.linear_solve(-F_value)
+            if scale is None:
+                w += dw
+                dw_norm = np.max(np.abs(dw))
+                if dw_norm <= tol * (1 + np.max(np.abs(w))):
+                    return w, n, rate, True
+                if dw_norm_old is not None:
+                    rate = dw_norm / dw_norm_old
+                    if rate >= 1 and (growing or not self.J_is_fresh):
+                        break  # diverging
+                    growing = rate >= 1
+            else:
+                dw_norm = np.sqrt(np.mean((dw / scale)**2))
+                if dw_norm_old is not None:
+                    rate = dw_norm / dw_norm_old
+                    if rate >= 1 or rate**(max_iter - n + 1) / (1 - rate) * dw_norm > tol:
+                        break
+                w += dw
+                if dw_norm == 0 or (dw_norm_old is not None and rate / (1 - rate) * dw_norm < tol):
+                    return w, n, rate, True
+            dw_norm_old = dw_norm
+        return w, n, rate, False
+
+    def iterate_full(self, F, w0, t, c, build, state, tol=None, max_iter=None):
+        # Full Newton: the Jacobian is evaluated at state(w) of every iterate
+        # and the iteration matrix factored again, for equations on which
+        # the simplified iteration fails even with a fresh Jacobian
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else max_iter
+        w = w0.copy()
+        trace = solver_trace.current
+        for n in range(1, max_iter + 1):
+            F_value = F(w)
+            if trace is not None:
+                trace.record(self.trace_call, np.max(np.abs(F_value)))
+            if np.max(np.abs(F_value)) < tol:
+                return w, n - 1, True
+            if not np.all(np.isfinite(F_value)):
+                break
+            self.update_jacobian(state(w), t)
+            self.factor(c, build)
+            dw = self.linear_solve(-F_value)
+            w += dw
+            if np.max(np.abs(dw)) <= tol * (1 + np.max(np.abs(w))):
+                return w, n, True
+        return w, n, False
+
+    def try_solve(self, F, w0, u, t, c, build, scale=None, tol=None, max_iter=None, state=None):
+        # Solve F(w) = 0 starting from w0, J is evaluated at (u, t) when needed.
+        # When the iteration fails with a fresh Jacobian and state(w) gives
+        # the point of an iterate w, it is repeated as a full Newton iteration.
+        # Returns (w, iterations, converged) so the caller can reduce its step.
+        trace = solver_trace.current
+        if trace is not None:
+            self.trace_call = trace.begin('ModifiedNewton', t)
+            jac_evals = self.jacobian.n_evals
+        if self.J is None or self.refresh:
+            self.update_jacobian(u, t)
+        while True:
+            self.factor(c, build)
+            w, n, rate, converged = self.iterate(F, w0, scale, tol, max_iter)
+            if converged:
+                # Slow convergence gets a new Jacobian for the next step. Without
+                # scale there is no prediction of the remaining iterations, so
+                # taking more than a quarter of max_iter counts as slow as well.
+                slow = scale is None and n > (self.max_iter if max_iter is None else max_iter) // 4
+                self.refresh = rate > self.rate_limit or slow
+                self.J_is_fresh = False
+                break
+            if self.J_is_fresh:
+                if state is not None:
+                    w, n_full, converged = self.iterate_full(F, w0, t, c, build, state, tol, max_iter)
+                    n += n_full
+                    # The last Jacobian belongs to an iterate, not to u
+                    self.refresh = True
+                    self.J_is_fresh = False
+                break
+            self.update_jacobian(u, t)
+        if trace is not None:
+            trace.end(self.trace_call, n, converged, self.jacobian.n_evals - jac_evals)
+        return w, n, converged
+
+    def solve(self, F, w0, u, t, c, build, state=None):
+        w, n, converged = self.try_solve(F, w0, u, t, c, build, state=state)
+        if not converged:
+            raise RuntimeError(f"Newton's method failed to converge at t={t} ({n} iterations)")
+        return w, n
+
+def kron_blocks(A, J):
+    # kron(A, J) for a stack of Jacobians J of shape (..., neq, neq), the
+    # iteration matrix of the implicit Runge-Kutta stages is I - h*kron(A, J)
+    s, neq = A.shape[0], J.shape[-1]
+    K = A[:, np.newaxis, :, np.newaxis] * J[..., np.newaxis, :, np.newaxis, :]
+    return K.reshape(J.shape[:-2] + (s * neq, s * neq))
+
+def lu_solve_blocks(lu_and_piv, b):
+    # Solve every block of a stack factored by lu_factor, b of shape
+    # (..., n). scipy's lu_solve loops over the blocks in Python, here
+    # each of the n pivots and substitution rows is one step for all blocks
+    lu, piv = lu_and_piv
+    n = lu.shape[-1]
+    lu, piv = lu.reshape(-1, n, n), piv.reshape(-1, n)
+    x = b.reshape(-1, n).copy()
+    rows = np.arange(x.shape[0])
+    for i in range(n):
+        p = piv[:, i]
+        x[rows, i], x[rows, p] = x[rows, p], x[rows, i]
+    for i in range(1, n):
+        x[:, i] -= np.einsum('kj,kj->k', lu[:, i, :i], x[:, :i])
+    for i in reversed(range(n)):
+        x[:, i] -= np.einsum('kj,kj->k', lu[:, i, i + 1:], x[:, i + 1:])
+        x[:, i] /= lu[:, i, i]
+    return x.reshape(b.shape)
+
+def initial_step(f, y, f0, t0, rtol, atol, order):
+    # Starting step size from Hairer, Norsett and Wanner, Solving ODEs I
+    scale = atol + rtol * np.abs(y)
+    d0 = np.sqrt(np.mean((y / scale)**2))
+    d1 = np.sqrt(np.mean((f0 / scale)**2))
+    h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    f1 = f(y + h0 * f0, t0 + h0)
+    d2 = np.sqrt(np.mean(((f1 - f0) / scale)**2)) / h0
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2))**(1 / (order + 1))
+    return min(100 * h0, h1)
 
 def f_example(u, t):
     return -u
 
+def f_example_inplace(u, t, out):
+    # Workspace-mode form of f_example, writes -u into out
+    return np.negative(u, out=out)
+
 def u_exact(t):
     return np.exp(-t)
 
@@ -0,0 +1,408 @@
+"""
+Author: 
+    Michael Shaw
+
+Background:
+    Benchmarks for the hand-written ODESolver classes in 
+ode_solver_backward_forward_euler_rk4.py. Each benchmark prints a small 
+table so the different code paths can be compared on the same machine.
+
+    workspace: steps per second of ForwardEuler and RungeKutta4 with the 
+    default solve() path against the preallocated workspace mode, 
+    for a scalar ODE and a system of 1000 decoupled equations u' = -u.
+    For scalar ODEs the out= ufunc calls cost more than the small temporaries 
+    they replace, so the workspace mode only pays off for larger systems.
+
+    ensemble: wall time of looping solve() over every member of an ensemble 
+    of initial conditions against a single solve_ensemble() call.
+
+    precision: work-precision table of the number of right-hand side 
+    evaluations against the maximum error for DormandPrince, RungeKutta4 
+    and scipy's solve_ivp (RK45), on the f_example decay problem and the 
+    underdamped OscSystem oscillator.
+
+    newton: BackwardEuler on a stiff reaction-diffusion system of 200 
+    equations, with an analytic and a finite-difference Jacobian, reporting 
+    wall time, Newton iterations, Jacobian evaluations and LU factorizations.
+
+    stiff: the Robertson chemical kinetics problem and the Van der Pol 
+    oscillator with mu = 1000, solved with BackwardEuler and RadauIIA on 
+    fixed time_points, the adaptive BDF and scipy's solve_ivp(method='BDF'). 
+    Robertson runs once on logarithmically spaced points from 1e-6 and once 
+    on uniform steps dt = 0.1 up to t = 40 (Robertson dt), where the first 
+    step from the initial condition already needs the full Newton fallback. 
+    Reports wall time, RHS and Jacobian evaluations, LU factorizations and 
+    the maximum error against a tight-tolerance Radau reference solution. 
+    On Van der Pol BackwardEuler fails in Newton at the first relaxation 
+    jump. RadauIIA gets through by halving its substeps there, but with 
+    unit output steps it places the jumps slightly off, so the few points 
+    on a jump carry an error of order 1. The variable step of BDF follows 
+    them.
+
+    stream: peak traced memory and wall time of RungeKutta4 with solve() 
+    against solve_stream() writing every 100th state to an NpyStreamWriter.
+
+    checkpoint: wall time of RungeKutta4 and BackwardEuler with and without 
+    a Checkpointer, the number of checkpoints written, the mean write time 
+    and the measured overhead against the max_overhead target.
+
+    jit: steps per second of RungeKutta4 on f_example and the OscSystem 
+    oscillator with the default solve() path, the 'numpy' backend of 
+    CompiledODESolver and, when Numba is installed, the 'numba' backend. 
+    Compilation happens in a warm-up run and is not timed.
+
+    exact: wall time of looping the scalar exact_solution over random 
+    (m, beta, k) parameter points against one exact_solution_vectorized call, 
+    with the largest difference between the two. A second table shows the 
+    displacement error of both near critical damping, beta = beta_crit(1 + delta), 
+    where the scalar formulas divide by a vanishing omega_d or sqrt(zeta^2 - 1).
+
+Usage:
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark workspace --steps 100000
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark ensemble --steps 200 --members 1000
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark precision
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark newton --steps 200
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark stiff
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark stream --steps 100000
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark checkpoint --steps 20000
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark jit --steps 100000
+    terminal/cmd: python ode_solver_benchmarks.py --benchmark exact --points 1000000
+    Spyder: runfile('ode_solver_benchmarks.py', args='--benchmark workspace')
+"""
+# Import Libraries
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from ode_solver_backward_forward_euler_rk4 import (ForwardEuler, RungeKutta4, BackwardEuler,
+                                                   DormandPrince, RadauIIA, BDF, TimeGrid,
+                                                   NpyStreamWriter, Checkpointer, stream_rows, f_example,
+                                                   f_example_inplace, u_exact)
+from ode_solver_jit import CompiledODESolver, f_example_compiled, oscillator_rhs, numba
+from oscilating_ode_solver_euler_rk4 import (OscSystem, exact_solution, exact_solution_vectorized,
+                                             classify_damping, classify_damping_array, DAMPING_CASES)
+
+def best_time(run, repeat=3):
+    # Best wall time of several calls to run(), which filters out noise
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def steps_per_second(solver, U0, time_points, repeat=3):
+    def run():
+        solver.set_initial_condition(U0)
+        solver.solve(time_points)
+    return (len(time_points) - 1) / best_time(run, repeat)
+
+def benchmark_workspace(n_steps=100000, neq_list=(1, 1000), repeat=3):
+    print(f"{'Method':<14}{'neq':>6}{'default [steps/s]':>20}{'workspace [steps/s]':>22}{'speedup':>10}")
+    for neq in neq_list:
+        U0 = 1.0 if neq == 1 else np.ones(neq)
+        time_points = np.linspace(0, 5, n_steps + 1)
+        for method_class in [ForwardEuler, RungeKutta4]:
+            default = steps_per_second(method_class(f_example), U0, time_points, repeat)
+            workspace = steps_per_second(method_class(f_example_inplace, workspace=True),
+                                         U0, time_points, repeat)
+            print(f"{method_class.__name__:<14}{neq:>6}{default:>20.4g}{workspace:>22.4g}{workspace / default:>10.2f}")
+
+def benchmark_ensemble(n_steps=200, n_members=1000, repeat=3):
+    U0s = np.linspace(0.5, 1.5, n_members)
+    time_points = np.linspace(0, 5, n_steps + 1)
+    print(f"{'Method':<14}{'members':>8}{'loop [s]':>12}{'ensemble [s]':>14}{'speedup':>10}")
+    for method_class in [ForwardEuler, RungeKutta4, BackwardEuler]:
+        method = method_class(f_example)
+
+        def loop():
+            for U0 in U0s:
+                method.set_initial_condition(U0)
+                method.solve(time_points)
+
+        def ensemble():
+            method.solve_ensemble(U0s, time_points)
+
+        loop_time = best_time(loop, repeat)
+        ensemble_time = best_time(ensemble, repeat)
+        print(f"{method_class.__name__:<14}{n_members:>8}{loop_time:>12.4g}{ensemble_time:>14.4g}{loop_time / ensemble_time:>10.1f}")
+
+class CountingRHS:
+    # Wraps a right-hand side f(u, t) and counts how often it is called
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def __call__(self, u, t):
+        self.count += 1
+        return self.f(u, t)
+
+def precision_problems():
+    # (name, f(u, t), U0, time_points, exact solution at time_points)
+    t_decay = np.linspace(0, 5, 101)
+    osc = OscSystem(1.0, 0.1, 1.0, lambda t: 0)
+    t_osc = np.linspace(0, 7 * np.pi, 201)
+    return [('f_example', f_example, 1.0, t_decay, u_exact(t_decay)),
+            ('OscSystem', lambda u, t: np.asarray(osc.system_of_equations(t, u)), [1.0, 0.0], t_osc,
+             exact_solution(t_osc, osc.m, osc.beta, osc.k, 'underdamped')[0])]
+
+def benchmark_precision(tolerances=(1e-3, 1e-5, 1e-7, 1e-9), rk4_refinements=(1, 2, 4, 8)):
+    print(f"{'Problem':<14}{'Method':<15}{'setting':>10}{'RHS evals':>11}{'max error':>11}")
+    for name, f, U0, time_points, exact in precision_problems():
+        def max_error(u):
+            u = np.asarray(u)
+            return np.max(np.abs((u if u.ndim == 1 else u[:, 0]) - exact))
+
+        for rtol in tolerances:
+            rhs = CountingRHS(f)
+            method = DormandPrince(rhs, rtol=rtol, atol=rtol * 1e-3)
+            method.set_initial_condition(U0)
+            u, t = method.solve(time_points)
+            print(f"{name:<11}{'DormandPrince':<15}{rtol:>10.0e}{rhs.count:>11}{max_error(u):>11.2e}")
+        for refine in rk4_refinements:
+            # RungeKutta4 has to step through every output point, refine subdivides them
+            rhs = CountingRHS(f)
+            method = RungeKutta4(rhs)
+            method.set_initial_condition(U0)
+            n_steps = refine * (time_points.size - 1)
+            u, t = method.solve(np.linspace(time_points[0], time_points[-1], n_steps + 1))
+            print(f"{name:<11}{'RungeKutta4':<15}{n_steps:>10}{rhs.count:>11}{max_error(u[::refine]):>11.2e}")
+        for rtol in tolerances:
+            sol = solve_ivp(lambda t, u: f(u if np.ndim(U0) else u[0], t), [time_points[0], time_points[-1]],
+                            np.atleast_1d(U0), method='RK45', t_eval=time_points, rtol=rtol, atol=rtol * 1e-3)
+            print(f"{name:<11}{'solve_ivp RK45':<15}{rtol:>10.0e}{sol.nfev:>11}{max_error(sol.y[0]):>11.2e}")
+
+class ReactionDiffusion:
+    # u' = D * (u[i-1] - 2u[i] + u[i+1]) / dx^2 - u^2 on a grid of neq points,
+    # stiff for large D / dx^2, with the analytic Jacobian
+    def __init__(self, neq=200, D=1.0):
+        dx = 1.0 / (neq + 1)
+        self.L = D / dx**2 * (np.diag(-2 * np.ones(neq)) + np.diag(np.ones(neq - 1), 1)
+                              + np.diag(np.ones(neq - 1), -1))
+        self.U0 = np.sin(np.pi * dx * np.arange(1, neq + 1))
+
+    def f(self, u, t):
+        return u @ self.L.T - u**2
+
+    def jac(self, u, t):
+        return self.L - 2 * np.diag(u)
+
+def benchmark_newton(n_steps=200, neq=200):
+    system = ReactionDiffusion(neq)
+    time_points = np.linspace(0, 1, n_steps + 1)
+    print(f"{'Jacobian':<12}{'neq':>6}{'time [s]':>10}{'Newton its':>12}{'Jacobians':>11}{'LU':>6}")
+    for name, jac in [('analytic', system.jac), ('differences', None)]:
+        method = BackwardEuler(system.f, jac=jac)
+        method.set_initial_condition(system.U0)
+        start = time.perf_counter()
+        method.solve(time_points)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12}{neq:>6}{elapsed:>10.3g}{sum(method.Newton_iter):>12}"
+              f"{method.n_jac_evals:>11}{method.n_lu_decomps:>6}")
+
+def robertson(u, t):
+    y1, y2, y3 = u[..., 0], u[..., 1], u[..., 2]
+    return np.stack([-0.04 * y1 + 1e4 * y2 * y3,
+                     0.04 * y1 - 1e4 * y2 * y3 - 3e7 * y2**2,
+                     3e7 * y2**2], axis=-1)
+
+def robertson_jac(u, t):
+    y1, y2, y3 = u
+    return np.array([[-0.04, 1e4 * y3, 1e4 * y2],
+                     [0.04, -1e4 * y3 - 6e7 * y2, -1e4 * y2],
+                     [0, 6e7 * y2, 0]])
+
+class VanDerPol:
+    def __init__(self, mu=1000.0):
+        self.mu = mu
+
+    def f(self, u, t):
+        return np.stack([u[..., 1], self.mu * (1 - u[..., 0]**2) * u[..., 1] - u[..., 0]], axis=-1)
+
+    def jac(self, u, t):
+        return np.array([[0, 1],
+                         [-2 * self.mu * u[0] * u[1] - 1, self.mu * (1 - u[0]**2)]])
+
+def stiff_problems():
+    # (name, f(u, t), jac(u, t), U0, time_points)
+    vdp = VanDerPol(1000.0)
+    return [('Robertson', robertson, robertson_jac, [1.0, 0.0, 0.0],
+             np.concatenate(([0], np.logspace(-6, 5, 400)))),
+            ('Robertson dt', robertson, robertson_jac, [1.0, 0.0, 0.0], np.linspace(0, 40, 401)),
+            ('VanDerPol', vdp.f, vdp.jac, [2.0, 0.0], np.linspace(0, 3000, 3001))]
+
+def benchmark_stiff(rtol=1e-6, atol=1e-9):
+    print(f"{'Problem':<14}{'Method':<15}{'time [s]':>10}{'RHS':>8}{'Jac':>6}{'LU':>6}{'max error':>11}")
+    for name, f, jac, U0, time_points in stiff_problems():
+        t_span = [time_points[0], time_points[-1]]
+        reference = solve_ivp(lambda t, u: f(u, t), t_span, U0, method='Radau', t_eval=time_points,
+                              jac=lambda t, u: jac(u, t), rtol=1e-10, atol=1e-12).y.T
+
+        for method_class, options in [(BackwardEuler, {}), (RadauIIA, {}),
+                                      (BDF, dict(rtol=rtol, atol=atol))]:
+            rhs = CountingRHS(f)
+            method = method_class(rhs, jac=jac, **options)
+            method.set_initial_condition(U0)
+            start = time.perf_counter()
+            try:
+                u, t = method.solve(time_points)
+                error = f"{np.max(np.abs(u - reference)):>11.2e}"
+            except RuntimeError:
+                error = f"{'failed':>11}"
+            elapsed = time.perf_counter() - start
+            print(f"{name:<14}{method_class.__name__:<15}{elapsed:>10.3g}{rhs.count:>8}"
+                  f"{method.n_jac_evals:>6}{method.n_lu_decomps:>6}{error}")
+
+        start = time.perf_counter()
+        sol = solve_ivp(lambda t, u: f(u, t), t_span, U0, method='BDF', t_eval=time_points,
+                        jac=lambda t, u: jac(u, t), rtol=rtol, atol=atol)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14}{'solve_ivp BDF':<15}{elapsed:>10.3g}{sol.nfev:>8}{sol.njev:>6}{sol.nlu:>6}"
+              f"{np.max(np.abs(sol.y.T - reference)):>11.2e}")
+
+def peak_memory(run):
+    # Wall time and peak memory traced by tracemalloc while run() executes
+    tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def benchmark_stream(n_steps=100000, neq=100, every=100):
+    U0 = np.ones(neq)
+    print(f"{'Mode':<14}{'steps':>10}{'neq':>6}{'time [s]':>10}{'peak memory [MB]':>18}")
+
+    def full():
+        method = RungeKutta4(f_example)
+        method.set_initial_condition(U0)
+        method.solve(np.linspace(0, 5, n_steps + 1))
+
+    with tempfile.TemporaryDirectory() as folder:
+        def stream():
+            method = RungeKutta4(f_example)
+            method.set_initial_condition(U0)
+            n_rows = stream_rows(n_steps + 1, every)
+            with NpyStreamWriter(os.path.join(folder, 'u.npy'), n_rows, (neq,),
+                                 os.path.join(folder, 't.npy')) as writer:
+                method.solve_stream(TimeGrid(0, 5, n_steps + 1), writer, every)
+
+        for name, run in [('solve', full), ('solve_stream', stream)]:
+            elapsed, peak = peak_memory(run)
+            print(f"{name:<14}{n_steps:>10}{neq:>6}{elapsed:>10.3g}{peak / 2**20:>18.3g}")
+
+def benchmark_checkpoint(n_steps=20000, neq=100, max_overhead=0.01):
+    U0 = np.ones(neq)
+    time_points = np.linspace(0, 5, n_steps + 1)
+    print(f"{'Method':<14}{'plain [s]':>10}{'checkpointed [s]':>18}{'writes':>8}"
+          f"{'write [ms]':>12}{'overhead':>10}{'target':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for method_class in [RungeKutta4, BackwardEuler]:
+            def run(checkpoint=None):
+                method = method_class(f_example)
+                method.set_initial_condition(U0)
+                method.solve(time_points, checkpoint=checkpoint)
+
+            plain = best_time(run, 1)
+            checkpoint = Checkpointer(os.path.join(folder, 'run.npz'), every=100, max_overhead=max_overhead)
+            checkpointed = best_time(lambda: run(checkpoint), 1)
+            mean_write = 1000 * checkpoint.write_time / max(checkpoint.n_writes, 1)
+            print(f"{method_class.__name__:<14}{plain:>10.3g}{checkpointed:>18.3g}{checkpoint.n_writes:>8}"
+                  f"{mean_write:>12.3g}{checkpoint.overhead:>10.2%}{max_overhead:>8.0%}")
+
+def benchmark_jit(n_steps=100000, repeat=3):
+    osc = OscSystem(1.0, 0.1, 1.0, lambda t: 0)
+    problems = [('f_example', f_example, f_example_compiled, 1.0),
+                ('OscSystem', lambda u, t: osc.system_of_equations(t, u), oscillator_rhs(osc), [1.0, 0.0])]
+    backends = ['numpy'] if numba is None else ['numpy', 'numba']
+    time_points = np.linspace(0, 5, n_steps + 1)
+    print(f"{'Problem':<11}{'Path':<9}{'steps/s':>12}{'speedup':>10}")
+    for name, f, f_compiled, U0 in problems:
+        default = steps_per_second(RungeKutta4(f), U0, time_points, repeat)
+        print(f"{name:<11}{'default':<9}{default:>12.4g}{1:>10.1f}")
+        for backend in backends:
+            method = CompiledODESolver(f_compiled, 'RungeKutta4', backend)
+            method.set_initial_condition(U0)
+            method.solve(time_points[:3])  # compile outside the timing
+            rate = steps_per_second(method, U0, time_points, repeat)
+            print(f"{name:<11}{backend:<9}{rate:>12.4g}{rate / default:>10.1f}")
+    if numba is None:
+        print('Numba is not installed, only the numpy backend was run')
+
+def benchmark_exact(n_points=1000000, n_times=10, seed=0):
+    rng = np.random.default_rng(seed)
+    m = rng.uniform(0.5, 2.0, n_points)
+    k = rng.uniform(0.5, 2.0, n_points)
+    beta = rng.uniform(0.0, 2.0, n_points) * 2 * np.sqrt(k * m)
+    beta[::4] = 0.0
+    t = np.linspace(0, 10, n_times)
+
+    start = time.perf_counter()
+    scalar = np.empty((n_points, n_times))
+    for i in range(n_points):
+        case = classify_damping(m[i], beta[i], k[i])
+        scalar[i] = exact_solution(t, m[i], beta[i], k[i], case)[0]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = exact_solution_vectorized(t, m[:, np.newaxis], beta[:, np.newaxis], k[:, np.newaxis])[0]
+    vectorized_time = time.perf_counter() - start
+
+    counts = np.bincount(classify_damping_array(m, beta, k), minlength=len(DAMPING_CASES))
+    print(', '.join(f"{name} {count}" for name, count in zip(DAMPING_CASES, counts)))
+    print(f"{'Path':<12}{'time (s)':>10}{'points/s':>12}{'speedup':>10}")
+    print(f"{'scalar':<12}{scalar_time:>10.3g}{n_points / scalar_time:>12.4g}{1:>10.1f}")
+    print(f"{'vectorized':<12}{vectorized_time:>10.3g}{n_points / vectorized_time:>12.4g}"
+          f"{scalar_time / vectorized_time:>10.1f}")
+    print(f"largest difference {np.max(np.abs(scalar - vectorized)):.3g}")
+
+    # Near critical damping the exact solution differs from the critically
+    # damped one by O(delta), so larger errors come from the formula itself.
+    print(f"{'delta':>10}{'scalar error':>16}{'vectorized error':>18}")
+    t = np.linspace(0, 10, 1001)
+    critical = exact_solution(t, 1.0, 2.0, 1.0, 'critically_damped')[0]
+    for delta in (-1e-4, -1e-8, -1e-12, -1e-15, 1e-15, 1e-12, 1e-8, 1e-4):
+        beta = 2.0 * (1 + delta)
+        case = 'underdamped' if delta < 0 else 'overdamped'
+        scalar_error = np.max(np.abs(exact_solution(t, 1.0, beta, 1.0, case)[0] - critical))
+        vectorized_error = np.max(np.abs(exact_solution_vectorized(t, 1.0, beta, 1.0)[0] - critical))
+        print(f"{delta:>10.0e}{scalar_error:>16.3g}{vectorized_error:>18.3g}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ODESolver classes.')
+    parser.add_argument('--benchmark', default='workspace',
+                        choices=['workspace', 'ensemble', 'precision', 'newton', 'stiff', 'stream',
+                                 'checkpoint', 'jit', 'exact'],
+                        help='Which benchmark to run (default: workspace)')
+    parser.add_argument('--steps', type=int, default=100000, help='Number of time steps per solve (default: 100000)')
+    parser.add_argument('--members', type=int, default=1000, help='Ensemble size for the ensemble benchmark (default: 1000)')
+    parser.add_argument('--points', type=int, default=1000000, help='Parameter points for the exact benchmark (default: 1000000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions, the best time is reported (default: 3)')
+    args = parser.parse_args()
+
+    if args.benchmark == 'workspace':
+        benchmark_workspace(args.steps, repeat=args.repeat)
+    elif args.benchmark == 'ensemble':
+        benchmark_ensemble(args.steps, args.members, args.repeat)
+    elif args.benchmark == 'precision':
+        benchmark_precision()
+    elif args.benchmark == 'newton':
+        benchmark_newton(args.steps)
+    elif args.benchmark == 'stiff':
+        benchmark_stiff()
+    elif args.benchmark == 'stream':
+        benchmark_stream(args.steps)
+    elif args.benchmark == 'checkpoint':
+        benchmark_checkpoint(args.steps)
+    elif args.benchmark == 'jit':
+        benchmark_jit(args.steps, args.repeat)
+    elif args.benchmark == 'exact':
+        benchmark_exact(args.points)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Author: 
+    Michael Shaw
+
+Background:
+    Compiled fast path for the ForwardEuler and RungeKutta4 methods of 
+ode_solver_backward_forward_euler_rk4.py. For small systems almost all the 
+time of ODESolver.solve goes to the Python interpreter: attribute lookups, 
+the lambda wrapper around f and np.asarray on every call. Here the whole 
+stepping loop is compiled with Numba together with the right-hand side, 
+which then has to be written in the restricted form
+
+    def f(u, t, out):
+        out[0] = ...
+
+using only scalar arithmetic, math/NumPy functions and indexing of u and 
+out, the same signature as the workspace mode of the ODESolver classes. 
+If Numba is not installed, the 'numpy' backend runs the workspace mode of 
+ForwardEuler/RungeKutta4 instead, so the same code works everywhere.
+
+Usage:
+    terminal/cmd: python ode_solver_jit.py --method RungeKutta4 --n 1000
+    Spyder: runfile('ode_solver_jit.py', args='--method RungeKutta4 --n 1000')
+"""
+# Import Libraries
+import argparse
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+from ode_solver_backward_forward_euler_rk4 import ForwardEuler, RungeKutta4, u_exact
+
+def jit_rhs(f):
+    # Compile a right-hand side f(u, t, out), without Numba f is returned as is
+    if numba is None or hasattr(f, 'py_func'):
+        return f
+    return numba.njit(f)
+
+def forward_euler_loop(f, u, t):
+    neq = u.shape[1]
+    K = np.empty(neq)
+    for k in range(t.size - 1):
+        dt = t[k+1] - t[k]
+        f(u[k], t[k], K)
+        for i in range(neq):
+            u[k+1, i] = u[k, i] + dt * K[i]
+
+def runge_kutta4_loop(f, u, t):
+    neq = u.shape[1]
+    K1 = np.empty(neq)
+    K2 = np.empty(neq)
+    K3 = np.empty(neq)
+    K4 = np.empty(neq)
+    tmp = np.empty(neq)
+    for k in range(t.size - 1):
+        dt = t[k+1] - t[k]
+        dt2 = dt / 2.0
+        f(u[k], t[k], K1)
+        for i in range(neq):
+            tmp[i] = u[k, i] + dt2 * K1[i]
+        f(tmp, t[k] + dt2, K2)
+        for i in range(neq):
+            tmp[i] = u[k, i] + dt2 * K2[i]
+        f(tmp, t[k] + dt2, K3)
+        for i in range(neq):
+            tmp[i] = u[k, i] + dt * K3[i]
+        f(tmp, t[k] + dt, K4)
+        for i in range(neq):
+            u[k+1, i] = u[k, i] + dt / 6.0 * (K1[i] + 2 * K2[i] + 2 * K3[i] + K4[i])
+
+class CompiledODESolver:
+    # ForwardEuler or RungeKutta4 with the stepping loop compiled together
+    # with f(u, t, out). backend='numba' needs Numba, backend='numpy' uses the
+    # workspace mode of the ODESolver classes, None takes Numba if available.
+    methods = {'ForwardEuler': (ForwardEuler, forward_euler_loop),
+               'RungeKutta4': (RungeKutta4, runge_kutta4_loop)}
+    compiled_loops = {}
+
+    def __init__(self, f, method='RungeKutta4', backend=None):
+        if not callable(f):
+            raise TypeError(f'f is {type(f)}, not a function')
+        if method not in self.methods:
+            raise ValueError(f"method must be one of {', '.join(self.methods)}, not {method}")
+        if backend is None:
+            backend = 'numpy' if numba is None else 'numba'
+        if backend == 'numba' and numba is None:
+            raise ImportError("backend='numba' needs the numba package")
+        if backend not in ('numba', 'numpy'):
+            raise ValueError(f"backend must be 'numba' or 'numpy', not {backend}")
+        self.method = method
+        self.backend = backend
+        method_class, loop = self.methods[method]
+        if backend == 'numba':
+            self.f = jit_rhs(f)
+            if method not in self.compiled_loops:
+                self.compiled_loops[method] = numba.njit(loop)
+            self.loop = self.compiled_loops[method]
+        else:
+            self.f = f
+            self.solver = method_class(f, workspace=True)
+
+    def set_initial_condition(self, U0):
+        if isinstance(U0, (float, int)):
+            self.neq = 1
+            U0 = float(U0)
+        else:
+            U0 = np.asarray(U0)
+            self.neq = U0.size
+        self.U0 = U0
+
+    def solve(self, time_points):
+        if isinstance(time_points, (float, int)):
+            raise TypeError('solve: time_points is not a sequence')
+        self.t = np.asarray(time_points, float)
+        if self.backend == 'numpy':
+            self.solver.set_initial_condition(self.U0)
+            self.u, self.t = self.solver.solve(self.t)
+            return self.u, self.t
+        u = np.zeros((self.t.size, self.neq))
+        u[0] = self.U0
+        self.loop(self.f, u, self.t)
+        self.u = u if self.neq > 1 else u[:, 0]
+        return self.u, self.t
+
+def f_example_compiled(u, t, out):
+    # f_example in the restricted form, u' = -u
+    for i in range(u.size):
+        out[i] = -u[i]
+
+def oscillator_rhs(osc):
+    # Restricted-form right-hand side of an OscSystem, the forcing w_ddot(t)
+    # is compiled as well and must be Numba compatible (lambda t: 0 is)
+    m, beta, k = float(osc.m), float(osc.beta), float(osc.k)
+    w_ddot = osc.w_ddot if numba is None else numba.njit(osc.w_ddot)
+
+    def f(u, t, out):
+        out[0] = u[1]
+        out[1] = w_ddot(t) - (beta / m) * u[1] - (k / m) * u[0]
+    return jit_rhs(f)
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve u\' = -u with the compiled ODE stepping loop.')
+    parser.add_argument('--method', default='RungeKutta4', choices=['ForwardEuler', 'RungeKutta4'],
+                        help='Numerical method (default: RungeKutta4)')
+    parser.add_argument('--backend', default=None, choices=['numba', 'numpy'],
+                        help='Compiled backend, Numba when installed by default')
+    parser.add_argument('--n', type=int, default=1000, help='Number of time points on [0, 5] (default: 1000)')
+    args = parser.parse_args()
+
+    method = CompiledODESolver(f_example_compiled, args.method, args.backend)
+    method.set_initial_condition(1.0)
+    u, t = method.solve(np.linspace(0, 5, args.n))
+    print(f"{args.method} ({method.backend}) max error: {np.max(np.abs(u - u_exact(t))):.2e}")
+
+if __name__ == '__main__':
+    main()
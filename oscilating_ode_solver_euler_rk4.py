@@ -31,6 +31,10 @@ The code now includes comments for better readability.
 The exact solutions for an undamped oscillator with no external force are
 u(t)=cos(t) and⁡ u′(t)=−sin(t), which are used to compare against 
 the numerical solutions. These plots have been displayed directly in the output
+exact_solution_vectorized evaluates the exact solution for whole arrays of 
+parameters and times at once, with one formula for every damping case that 
+stays accurate near critical damping, and classify_damping_array gives the 
+damping case per element.
 
 Usage:
     terminal/cmd: python oscilating_ode_solver_euler_rk4.py
@@ -75,6 +79,73 @@ def exact_solution(t, m, beta, k, damping_case):
     else:
         raise ValueError("Invalid damping case. Choose 'undamped', 'underdamped', 'critically_damped', or 'overdamped'.")
 
+DAMPING_CASES = ["undamped", "underdamped", "critically_damped", "overdamped"]
+
+def classify_damping_array(m, beta, k, rtol=1e-9):
+    # Damping case codes (indices into DAMPING_CASES) for arrays of parameters.
+    # beta within rtol of beta_crit = 2*m*omega_n counts as critically damped.
+    m, beta, k = np.broadcast_arrays(*(np.asarray(x, float) for x in (m, beta, k)))
+    beta_crit = 2 * np.sqrt(k * m)
+    codes = np.where(beta < beta_crit, 1, 3).astype(np.int8)
+    codes[np.abs(beta - beta_crit) <= rtol * beta_crit] = 2
+    codes[beta == 0] = 0
+    return codes
+
+def classify_damping(m, beta, k, rtol=1e-9):
+    # Damping case from beta and the critical damping coefficient 2*m*omega_n
+    return DAMPING_CASES[int(classify_damping_array(m, beta, k, rtol))]
+
+def exact_solution_vectorized(t, m, beta, k):
+    """
+    Exact displacement and velocity for u(0)=1, u'(0)=0 and arrays of
+    parameters and times, which broadcast against each other.
+
+    All damping cases use one formula. With a = beta/(2m), omega_n^2 = k/m
+    and s^2 = a^2 - omega_n^2,
+        u(t)  = exp(-a t) (C + a S),   u'(t) = -omega_n^2 exp(-a t) S,
+    where C = cos(omega_d t), S = sin(omega_d t)/omega_d for s^2 < 0 (omega_d^2 = -s^2)
+    and C = cosh(s t), S = sinh(s t)/s for s^2 > 0. Where z = s^2 t^2 is small,
+    near critical damping, C and S are summed from their Taylor series in z,
+    which avoids dividing by a tiny omega_d or s and reduces to the critically
+    damped solution at z = 0. Overdamped terms are evaluated as
+    exp((s - a) t) and exp(-(s + a) t), which cannot overflow.
+    """
+    t, m, beta, k = np.broadcast_arrays(*(np.asarray(x, float) for x in (t, m, beta, k)))
+    a = beta / (2 * m)
+    omega_n = np.sqrt(k / m)
+    s2 = (a - omega_n) * (a + omega_n)
+    z = s2 * t**2
+    decay_C = np.empty(t.shape)  # exp(-a t) C
+    decay_S = np.empty(t.shape)  # exp(-a t) S
+
+    series = np.abs(z) < 0.1
+    C = np.ones(np.count_nonzero(series))
+    S = np.ones_like(C)
+    zs, term_C, term_S = z[series], np.ones_like(C), np.ones_like(C)
+    for n in range(1, 8):
+        term_C = term_C * zs / ((2 * n - 1) * (2 * n))
+        term_S = term_S * zs / ((2 * n) * (2 * n + 1))
+        C += term_C
+        S += term_S
+    decay = np.exp(-a[series] * t[series])
+    decay_C[series] = decay * C
+    decay_S[series] = decay * S * t[series]
+
+    under = ~series & (s2 < 0)
+    omega_d = np.sqrt(-s2[under])
+    decay = np.exp(-a[under] * t[under])
+    decay_C[under] = decay * np.cos(omega_d * t[under])
+    decay_S[under] = decay * np.sin(omega_d * t[under]) / omega_d
+
+    over = ~series & (s2 > 0)
+    s = np.sqrt(s2[over])
+    slow = np.exp((s - a[over]) * t[over])
+    fast = np.exp(-(s + a[over]) * t[over])
+    decay_C[over] = (slow + fast) / 2
+    decay_S[over] = (slow - fast) / (2 * s)
+
+    return decay_C + a * decay_S, -omega_n**2 * decay_S
+
 class OscSystem:
     def __init__(self, m, beta, k, w_ddot):
         self.m = m
@@ -130,19 +201,8 @@ def main():
     beta = args.beta
     w_ddot = lambda t: 0
     
-    # Calculate critical damping coefficient
-    omega_n = np.sqrt(k / m)
-    beta_crit = 2 * m * omega_n
-
     # Determine damping case based on beta value
-    if beta == 0:
-        damping_case = "undamped"
-    elif beta < beta_crit:
-        damping_case = "underdamped"
-    elif beta == beta_crit:
-        damping_case = "critically_damped"
-    else:
-        damping_case = "overdamped"
+    damping_case = classify_damping(m, beta, k)
 
     # Initialize the OscSystem instance
     osc_system = OscSystem(m, beta, k, w_ddot)
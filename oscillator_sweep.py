@@ -0,0 +1,124 @@
+'''
+Author: 
+    Michael Shaw
+
+Background: 
+    Parameter sweep over the damped oscillator of 
+oscilating_ode_solver_euler_rk4.py. Instead of one (mass, beta, spring_constant) 
+triple per run with plots, every combination on a grid is simulated with 
+OscSystem and summarized by a few numbers:
+    damping_case: 0 undamped, 1 underdamped, 2 critically damped, 3 overdamped
+    max_error: maximum error of the displacement against the exact solution
+    decay_time: time at which the amplitude sqrt(u^2 + (m/k) u'^2) drops 
+                below 1/e of the initial displacement, NaN if that does not 
+                happen within the run
+
+The combinations are split into chunks that run on a process pool. Each 
+chunk is integrated with RungeKutta4.solve_ensemble, all members stepping 
+together, with a time step small enough for the fastest decay rate in the 
+chunk. Nothing is plotted; the results are written as one array per column 
+to an .npz file (np.load gives the columns by name).
+
+Usage:
+    terminal/cmd: python oscillator_sweep.py --mass 0.5 2 10 --beta 0 4 100 
+        --spring_constant 0.5 2 100 --workers 4 --output sweep.npz
+    Sypder: runfile('oscillator_sweep.py', args='--mass 0.5 2 10 --beta 0 4 100')
+'''
+
+# Import Libraries
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from ode_solver_backward_forward_euler_rk4 import RungeKutta4
+from oscilating_ode_solver_euler_rk4 import (OscSystem, DAMPING_CASES, classify_damping_array,
+                                             exact_solution_vectorized)
+
+def parameter_grid(mass, beta, spring_constant):
+    # Every combination of the given values, as three flat arrays
+    M, B, K = np.meshgrid(mass, beta, spring_constant, indexing='ij')
+    return M.ravel(), B.ravel(), K.ravel()
+
+def simulate_chunk(m, beta, k, total_time, points_per_period=200):
+    """
+    Simulate one chunk of oscillators and return their summary metrics.
+
+    :param m, beta, k: Arrays of mass, damping coefficient and spring constant.
+    :param total_time: Length of the simulation.
+    :param points_per_period: Time steps per period 2*pi of the time axis.
+    :return: damping_case codes, max_error and decay_time arrays.
+    """
+    osc = OscSystem(m, beta, k, lambda t: 0)
+    f = lambda u, t: np.stack(osc.system_of_equations(t, u.T), axis=-1)
+
+    # The fastest rate of the chunk, beta/2m + sqrt((beta/2m)^2 - k/m) when
+    # overdamped, bounds the RK4 step for accuracy and stability
+    decay = beta / (2 * m)
+    rate = np.max(np.maximum(decay + np.sqrt(np.maximum(decay**2 - k / m, 0)), np.sqrt(k / m)))
+    dt = min(2 * np.pi / points_per_period, 0.5 / rate)
+    t = np.linspace(0, total_time, int(np.ceil(total_time / dt)) + 1)
+
+    U0s = np.tile([1.0, 0.0], (m.size, 1))
+    u, t = RungeKutta4(f).solve_ensemble(U0s, t)
+    displacement = u[:, :, 0]
+
+    cases = classify_damping_array(m, beta, k)
+    exact_displacement, exact_velocity = exact_solution_vectorized(t[:, np.newaxis], m, beta, k)
+    max_error = np.max(np.abs(displacement - exact_displacement), axis=0)
+
+    # The energy amplitude sqrt(u^2 + (m/k) u'^2) does not oscillate and never
+    # grows, the decay time is the first time it drops below 1/e
+    amplitude = np.sqrt(displacement**2 + (m / k) * u[:, :, 1]**2)
+    below = amplitude < np.exp(-1)
+    decay_time = np.where(np.any(below, axis=0), t[np.argmax(below, axis=0)], np.nan)
+    return cases, max_error, decay_time
+
+def run_sweep(m, beta, k, total_time, points_per_period=200, chunk_size=2000, workers=None):
+    """Distribute the parameter combinations over a process pool and collect the metrics in order."""
+    starts = range(0, m.size, chunk_size)
+    chunks = [(m[i:i + chunk_size], beta[i:i + chunk_size], k[i:i + chunk_size]) for i in starts]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(simulate_chunk, *chunk, total_time, points_per_period) for chunk in chunks]
+        results = [future.result() for future in futures]
+    cases, max_error, decay_time = (np.concatenate(column) for column in zip(*results))
+    return {'mass': m, 'beta': beta, 'spring_constant': k, 'damping_case': cases,
+            'max_error': max_error, 'decay_time': decay_time}
+
+def save_columns(filename, columns):
+    # One array per column, plus the names of the damping case codes
+    np.savez(filename, damping_case_names=np.array(DAMPING_CASES), **columns)
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep the damped oscillator over a parameter grid.')
+    parser.add_argument('--mass', type=float, nargs=3, default=[0.5, 2.0, 10], metavar=('MIN', 'MAX', 'N'),
+                        help='Mass values as min max count (default: 0.5 2 10)')
+    parser.add_argument('--beta', type=float, nargs=3, default=[0.0, 4.0, 100], metavar=('MIN', 'MAX', 'N'),
+                        help='Damping coefficients as min max count (default: 0 4 100)')
+    parser.add_argument('--spring_constant', type=float, nargs=3, default=[0.5, 2.0, 100], metavar=('MIN', 'MAX', 'N'),
+                        help='Spring constants as min max count (default: 0.5 2 100)')
+    parser.add_argument('--periods', type=float, default=3.5, help='Number of periods to simulate (default: 3.5)')
+    parser.add_argument('--points_per_period', type=int, default=200, help='RK4 time steps per period (default: 200)')
+    parser.add_argument('--chunk_size', type=int, default=2000, help='Combinations per worker task (default: 2000)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--output', default='oscillator_sweep.npz', help='Output file (default: oscillator_sweep.npz)')
+    args = parser.parse_args()
+
+    grids = [np.linspace(low, high, int(n)) for low, high, n in (args.mass, args.beta, args.spring_constant)]
+    m, beta, k = parameter_grid(*grids)
+    total_time = 2 * np.pi * args.periods
+
+    start = time.perf_counter()
+    columns = run_sweep(m, beta, k, total_time, args.points_per_period, args.chunk_size, args.workers)
+    elapsed = time.perf_counter() - start
+    save_columns(args.output, columns)
+
+    print(f"{m.size} combinations in {elapsed:.1f} s on {args.workers or os.cpu_count()} workers, written to {args.output}")
+    for code, name in enumerate(DAMPING_CASES):
+        selected = columns['damping_case'] == code
+        if np.any(selected):
+            print(f"{name:<18}{np.sum(selected):>8} runs, largest max error {np.max(columns['max_error'][selected]):.2e}")
+
+if __name__ == '__main__':
+    main()
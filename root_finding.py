@@ -0,0 +1,276 @@
+'''
+Author:
+    Michael Shaw
+
+Background:
+    Root finding methods behind one interface, find_root(f, method, ...),
+next to the plain Newton iteration of newton.py:
+    newton: newton.Newton, which stops when |f'(x)| < 1e-14 and has no
+            fallback when the iteration wanders off or cycles
+    safeguarded_newton: Newton steps inside a bracket [a, b] with a sign
+            change, falling back to bisection whenever the Newton step would
+            leave the bracket or does not shrink |f| fast enough, so it
+            always converges
+    brent: Brent's method, inverse quadratic interpolation and secant steps
+           safeguarded by bisection, using no derivatives
+    halley: Halley's third order method from f, f' and f''
+    secant: the secant method from two starting points
+Every call returns a RootResult with the root, the iterations and the number
+of evaluations of f, f' and f''. A method has converged when |f(x)| <= ftol
+(an absolute tolerance in the units of f, so it has to be scaled with f)
+or, for all but newton, when its last step (bracket half width for brent)
+was below xtol*(1 + |x|).
+
+The main program prints a table of evaluations to tolerance on test_function
+from newton.py and some polynomials, with the derivatives taken symbolically
+by newton_expression.Expression. x^3 - 2x + 2 from x0 = 0 makes Newton cycle
+between 0 and 1 for all N=100 iterations, the bracketed methods do not.
+
+Usage:
+    from root_finding import find_root
+    result = find_root(f, 'safeguarded_newton', bracket=(1, 3), dfdx=df)
+    terminal/cmd: python root_finding.py --ftol 1e-12
+    Sypder: runfile('root_finding.py', args='--ftol 1e-12')
+'''
+
+# Import Libraries
+import argparse
+import numpy as np
+
+from newton import Newton
+from newton_expression import Expression
+
+class CountingFunction:
+    # Wraps a function and counts how often it is called
+    def __init__(self, f):
+        self.f = f
+        self.n_evals = 0
+
+    def __call__(self, x):
+        self.n_evals += 1
+        return self.f(x)
+
+class RootResult:
+    # Outcome of find_root
+    def __init__(self, method, root, f_value, iterations, converged, f_evals, df_evals=0, d2f_evals=0):
+        self.method = method
+        self.root = root
+        self.f_value = f_value
+        self.iterations = iterations
+        self.converged = converged
+        self.f_evals = f_evals
+        self.df_evals = df_evals
+        self.d2f_evals = d2f_evals
+
+    @property
+    def evals(self):
+        return self.f_evals + self.df_evals + self.d2f_evals
+
+    def __repr__(self):
+        return (f"RootResult(method={self.method!r}, root={self.root!r}, f_value={self.f_value!r}, "
+                f"iterations={self.iterations}, converged={self.converged}, f_evals={self.f_evals}, "
+                f"df_evals={self.df_evals}, d2f_evals={self.d2f_evals})")
+
+def check_bracket(f, a, b):
+    # Values of f at the ends of a bracket, which must have a sign change
+    fa, fb = f(a), f(b)
+    if fa * fb > 0:
+        raise ValueError(f"f({a:g}) and f({b:g}) have the same sign, [{a:g}, {b:g}] does not bracket a root")
+    return fa, fb
+
+def newton(f, dfdx, x0, xtol, ftol, maxiter):
+    # Newton iterates while n <= N, so N = maxiter - 1 allows maxiter iterations.
+    # Every iteration evaluates f' once, the one that is too close to zero included
+    dfdx = CountingFunction(dfdx)
+    try:
+        x, n, f_value = Newton(f, x0, dfdx, epsilon=ftol, N=maxiter - 1)
+    except ValueError:
+        return np.nan, np.nan, dfdx.n_evals - 1, False
+    return x, f_value, n, abs(f_value) <= ftol
+
+def safeguarded_newton(f, dfdx, a, b, x0, xtol, ftol, maxiter):
+    fa, fb = check_bracket(f, a, b)
+    if fa == 0 or fb == 0:
+        return (a, fa, 0, True) if fa == 0 else (b, fb, 0, True)
+    # Keep f(low) < 0 < f(high)
+    low, high = (a, b) if fa < 0 else (b, a)
+    x = x0 if x0 is not None and min(a, b) < x0 < max(a, b) else 0.5 * (a + b)
+    dx = dx_old = abs(b - a)
+    fx, dfx = f(x), dfdx(x)
+    for n in range(1, maxiter + 1):
+        if abs(fx) <= ftol:
+            return x, fx, n - 1, True
+        # Bisect when the Newton step leaves the bracket or |f| does not halve fast enough
+        if dfx == 0 or ((x - high) * dfx - fx) * ((x - low) * dfx - fx) > 0 or abs(2 * fx) > abs(dx_old * dfx):
+            dx_old, dx = dx, 0.5 * (high - low)
+            x = low + dx
+        else:
+            dx_old, dx = dx, fx / dfx
+            x = x - dx
+        fx, dfx = f(x), dfdx(x)
+        if fx < 0:
+            low = x
+        else:
+            high = x
+        if abs(dx) <= xtol * (1 + abs(x)):
+            return x, fx, n, True
+    return x, fx, maxiter, abs(fx) <= ftol
+
+def brent(f, a, b, xtol, ftol, maxiter):
+    fa, fb = check_bracket(f, a, b)
+    c, fc = a, fa
+    d = e = b - a
+    for n in range(1, maxiter + 1):
+        # b is the best estimate, the root lies between b and c
+        if fb * fc > 0:
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = xtol * (1 + abs(b))
+        m = 0.5 * (c - b)
+        if abs(fb) <= ftol or abs(m) <= tol:
+            return b, fb, n - 1, True
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            # Secant (a == c) or inverse quadratic interpolation
+            s = fb / fa
+            if a == c:
+                p, q = 2 * m * s, 1 - s
+            else:
+                q, r = fa / fc, fb / fc
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            else:
+                p = -p
+            if 2 * p < min(3 * m * q - abs(tol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else np.copysign(tol, m)
+        fb = f(b)
+    return b, fb, maxiter, abs(fb) <= ftol
+
+def halley(f, dfdx, d2fdx2, x0, xtol, ftol, maxiter):
+    x = x0
+    for n in range(maxiter + 1):
+        fx = f(x)
+        if abs(fx) <= ftol:
+            return x, fx, n, True
+        if n == maxiter:
+            break
+        d1, d2 = dfdx(x), d2fdx2(x)
+        denominator = 2 * d1**2 - fx * d2
+        if denominator == 0:
+            break
+        dx = 2 * fx * d1 / denominator
+        x = x - dx
+        if abs(dx) <= xtol * (1 + abs(x)):
+            return x, f(x), n + 1, True
+    return x, fx, n, False
+
+def secant(f, x0, x1, xtol, ftol, maxiter):
+    f0, f1 = f(x0), f(x1)
+    for n in range(1, maxiter + 1):
+        if abs(f1) <= ftol:
+            return x1, f1, n - 1, True
+        if f1 == f0:
+            return x1, f1, n - 1, False
+        dx = f1 * (x1 - x0) / (f1 - f0)
+        x0, f0 = x1, f1
+        x1 = x1 - dx
+        f1 = f(x1)
+        if abs(dx) <= xtol * (1 + abs(x1)):
+            return x1, f1, n, True
+    return x1, f1, maxiter, abs(f1) <= ftol
+
+METHODS = ['newton', 'safeguarded_newton', 'brent', 'halley', 'secant']
+
+def find_root(f, method='brent', bracket=None, x0=None, dfdx=None, d2fdx2=None,
+              xtol=1e-12, ftol=1e-12, maxiter=100):
+    """
+    Find a root of f with one of METHODS and count the function evaluations.
+
+    :param f: The function for which the root is to be found.
+    :param method: One of 'newton', 'safeguarded_newton', 'brent', 'halley' or 'secant'.
+    :param bracket: Interval (a, b) with a sign change of f, needed by
+                    safeguarded_newton and brent.
+    :param x0: Initial guess for newton and halley, optional for safeguarded_newton. 
+               The secant method starts from x0 and a point next to it, or from the 
+               ends of the bracket when there is no x0.
+    :param dfdx: The derivative of f, for newton, safeguarded_newton and halley.
+    :param d2fdx2: The second derivative of f, for halley.
+    :param xtol: Tolerance on the last step, relative to 1 + |x|.
+    :param ftol: Absolute tolerance on |f(x)|, in the units of f.
+    :param maxiter: The maximum number of iterations.
+    :return: A RootResult.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, choose one of {', '.join(METHODS)}")
+    f = CountingFunction(f)
+    df = CountingFunction(dfdx) if dfdx is not None else None
+    d2f = CountingFunction(d2fdx2) if d2fdx2 is not None else None
+    if method in ('newton', 'safeguarded_newton', 'halley') and df is None:
+        raise ValueError(f"{method} needs the derivative dfdx")
+    if method == 'halley' and d2f is None:
+        raise ValueError("halley needs the second derivative d2fdx2")
+    if method in ('safeguarded_newton', 'brent') and bracket is None:
+        raise ValueError(f"{method} needs a bracket (a, b)")
+    if method in ('newton', 'halley') and x0 is None:
+        raise ValueError(f"{method} needs an initial guess x0")
+
+    if method == 'newton':
+        x, f_value, n, converged = newton(f, df, x0, xtol, ftol, maxiter)
+    elif method == 'safeguarded_newton':
+        x, f_value, n, converged = safeguarded_newton(f, df, *bracket, x0, xtol, ftol, maxiter)
+    elif method == 'brent':
+        x, f_value, n, converged = brent(f, *bracket, xtol, ftol, maxiter)
+    elif method == 'halley':
+        x, f_value, n, converged = halley(f, df, d2f, x0, xtol, ftol, maxiter)
+    else:
+        if x0 is not None:
+            x_start, x_next = x0, x0 + 1e-4 * (1 + abs(x0))
+        elif bracket is not None:
+            x_start, x_next = bracket
+        else:
+            raise ValueError("secant needs a bracket or an initial guess x0")
+        x, f_value, n, converged = secant(f, x_start, x_next, xtol, ftol, maxiter)
+    return RootResult(method, x, f_value, n, converged, f.n_evals,
+                      df.n_evals if df is not None else 0, d2f.n_evals if d2f is not None else 0)
+
+def test_problems():
+    # (name, formula, x0, bracket, exact root)
+    return [('test_function', 'exp(-0.1*x**2)*sin(pi/2*x)', 1.9, (1.0, 3.0), 2.0),
+            ('x^2 - 2', 'x**2 - 2', 1.0, (0.0, 2.0), np.sqrt(2)),
+            ('x^3 - 2x - 5', 'x**3 - 2*x - 5', 2.0, (2.0, 3.0), 2.0945514815423265),
+            ('x^3 - 2x + 2', 'x**3 - 2*x + 2', 0.0, (-3.0, 0.0), -1.7692923542386314),
+            ('(x - 1)^3', '(x - 1)**3', 2.0, (0.0, 3.5), 1.0)]
+
+def evaluation_table(xtol=1e-12, ftol=1e-12, maxiter=100):
+    print(f"{'Problem':<16}{'Method':<20}{'f':>5}{'df':>5}{'d2f':>5}{'total':>7}{'iter':>6}"
+          f"{'error':>11}{'converged':>11}")
+    for name, formula, x0, bracket, exact in test_problems():
+        f = Expression(formula)
+        df = f.derivative()
+        d2f = df.derivative()
+        for method in METHODS:
+            result = find_root(f, method, bracket, x0, df, d2f, xtol, ftol, maxiter)
+            print(f"{name:<16}{method:<20}{result.f_evals:>5}{result.df_evals:>5}{result.d2f_evals:>5}"
+                  f"{result.evals:>7}{result.iterations:>6}{abs(result.root - exact):>11.2e}"
+                  f"{str(result.converged):>11}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare root finding methods by evaluations to tolerance.')
+    parser.add_argument('--xtol', type=float, default=1e-12, help='Tolerance on the step (default: 1e-12)')
+    parser.add_argument('--ftol', type=float, default=1e-12, help='Absolute tolerance on |f(x)| (default: 1e-12)')
+    parser.add_argument('--maxiter', type=int, default=100, help='Maximum iterations (default: 100)')
+    args = parser.parse_args()
+    evaluation_table(args.xtol, args.ftol, args.maxiter)
+
+if __name__ == '__main__':
+    main()
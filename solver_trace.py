@@ -0,0 +1,175 @@
+'''
+Author:
+    Michael Shaw
+
+Background:
+    Iteration traces for the Newton solvers: newton.Newton and the
+ModifiedNewton iteration behind BackwardEuler, RadauIIA and BDF in
+ode_solver_backward_forward_euler_rk4.py. Inside a tracing() block every
+solver call records
+    key: the initial guess x0 for Newton, the time t for ModifiedNewton
+    wall_time: wall time of the call in seconds
+    iterations, converged: as returned by the solver
+    f_evals: evaluations of f (Newton) or of the residual F (ModifiedNewton)
+    df_evals: evaluations of f' (Newton) or of the Jacobian (ModifiedNewton)
+    order: observed order of convergence q from the last three residuals,
+           log(r[k+1]/r[k]) / log(r[k]/r[k-1]), about 2 for Newton near a
+           simple root and 1 for the modified Newton iteration
+and the residual |f(x)| or max|F(w)| after every evaluation. All of it goes
+into arrays preallocated when the block starts; calls beyond the capacity
+are counted in dropped_calls and not recorded, so the overhead stays
+constant. Outside a tracing() block the solvers only check that
+solver_trace.current is None.
+
+Usage:
+    with tracing() as trace:
+        Newton(f, x0, dfdx)
+    trace.summary()
+    trace.slowest(10)
+    terminal/cmd: python solver_trace.py
+    Sypder: runfile('solver_trace.py')
+'''
+
+# Import Libraries
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# The active Trace, None when tracing is off
+current = None
+
+class Trace:
+    # Preallocated per-call records and a shared buffer of residuals
+    def __init__(self, capacity=100000, max_residuals=1000000):
+        self.names = []
+        self.solver = np.zeros(capacity, dtype=np.int16)
+        self.key = np.full(capacity, np.nan)
+        self.wall_time = np.zeros(capacity)
+        self.iterations = np.zeros(capacity, dtype=int)
+        self.f_evals = np.zeros(capacity, dtype=int)
+        self.df_evals = np.zeros(capacity, dtype=int)
+        self.converged = np.zeros(capacity, dtype=bool)
+        self.order = np.full(capacity, np.nan)
+        self.first_residual = np.zeros(capacity + 1, dtype=int)
+        self.residuals = np.zeros(max_residuals)
+        self.n_calls = 0
+        self.n_residuals = 0
+        self.dropped_calls = 0
+        self.dropped_residuals = 0
+
+    def begin(self, name, key=np.nan):
+        # Start recording a call, returns its index or -1 when the buffer is full
+        i = self.n_calls
+        if i == self.solver.size:
+            self.dropped_calls += 1
+            return -1
+        if name not in self.names:
+            self.names.append(name)
+        self.solver[i] = self.names.index(name)
+        self.key[i] = key if np.ndim(key) == 0 else np.nan
+        self.first_residual[i] = self.n_residuals
+        self.n_calls += 1
+        self.wall_time[i] = time.perf_counter()
+        return i
+
+    def record(self, i, residual):
+        if i < 0:
+            return
+        if self.n_residuals == self.residuals.size:
+            self.dropped_residuals += 1
+            return
+        self.residuals[self.n_residuals] = residual
+        self.n_residuals += 1
+
+    def end(self, i, iterations, converged, df_evals=0, f_evals=None):
+        # f_evals defaults to the number of residuals recorded for the call
+        if i < 0:
+            return
+        self.wall_time[i] = time.perf_counter() - self.wall_time[i]
+        self.first_residual[i + 1] = self.n_residuals
+        residuals = self.residuals[self.first_residual[i]:self.n_residuals]
+        self.iterations[i] = iterations
+        self.converged[i] = converged
+        self.f_evals[i] = residuals.size if f_evals is None else f_evals
+        self.df_evals[i] = df_evals
+        self.order[i] = observed_order(residuals)
+
+    def call_residuals(self, i):
+        # Residuals recorded for call i
+        return self.residuals[self.first_residual[i]:self.first_residual[i + 1]]
+
+    def calls(self, name=None):
+        """The per-call records as a dict of arrays, optionally for one solver only."""
+        n = self.n_calls
+        selected = slice(None) if name is None else self.solver[:n] == self.names.index(name)
+        return {'solver': np.array(self.names, dtype=object)[self.solver[:n]][selected],
+                'key': self.key[:n][selected], 'wall_time': self.wall_time[:n][selected],
+                'iterations': self.iterations[:n][selected], 'f_evals': self.f_evals[:n][selected],
+                'df_evals': self.df_evals[:n][selected], 'converged': self.converged[:n][selected],
+                'order': self.order[:n][selected]}
+
+    def summary(self):
+        print(f"{'Solver':<16}{'calls':>8}{'time (s)':>11}{'mean (us)':>11}{'iter':>7}{'f evals':>9}"
+              f"{'df evals':>10}{'order':>7}{'failed':>8}")
+        for name in self.names:
+            calls = self.calls(name)
+            n = calls['key'].size
+            order = calls['order'][np.isfinite(calls['order'])]
+            median_order = np.median(order) if order.size else np.nan
+            print(f"{name:<16}{n:>8}{calls['wall_time'].sum():>11.4g}{calls['wall_time'].mean() * 1e6:>11.4g}"
+                  f"{calls['iterations'].mean():>7.2f}{calls['f_evals'].sum():>9}{calls['df_evals'].sum():>10}"
+                  f"{median_order:>7.2f}{n - np.count_nonzero(calls['converged']):>8}")
+        if self.dropped_calls or self.dropped_residuals:
+            print(f"buffer full: {self.dropped_calls} calls and {self.dropped_residuals} residuals not recorded")
+
+    def slowest(self, n=10):
+        """Print and return the indices of the n calls with the largest wall time."""
+        order = np.argsort(self.wall_time[:self.n_calls])[::-1][:n]
+        print(f"{'call':>8}  {'solver':<16}{'key':>12}{'time (us)':>11}{'iter':>6}{'order':>7}{'converged':>11}")
+        for i in order:
+            print(f"{i:>8}  {self.names[self.solver[i]]:<16}{self.key[i]:>12.6g}{self.wall_time[i] * 1e6:>11.4g}"
+                  f"{self.iterations[i]:>6}{self.order[i]:>7.2f}{str(self.converged[i]):>11}")
+        return order
+
+def observed_order(residuals):
+    # log(r[k+1]/r[k]) / log(r[k]/r[k-1]) from the last three positive residuals
+    r = residuals[residuals > 0][-3:]
+    if r.size < 3 or r[1] == r[0]:
+        return np.nan
+    return np.log(r[2] / r[1]) / np.log(r[1] / r[0])
+
+@contextmanager
+def tracing(capacity=100000, max_residuals=1000000):
+    """Record the Newton solver calls made inside the block into a new Trace."""
+    global current
+    previous = current
+    current = Trace(capacity, max_residuals)
+    try:
+        yield current
+    finally:
+        current = previous
+
+def main():
+    # When run as a script this module is __main__, the solvers check the imported solver_trace
+    from solver_trace import tracing
+    from newton import Newton, test_function, derivative_test_function
+    from ode_solver_backward_forward_euler_rk4 import BackwardEuler, BDF
+
+    with tracing() as trace:
+        for x0 in np.linspace(-3, 3, 61):
+            try:
+                Newton(test_function, x0, derivative_test_function)
+            except ValueError:
+                pass
+        # A nonlinear stiff ODE, so the implicit solvers need several Newton iterations
+        def f(u, t):
+            return -10 * (u**3 - np.cos(t))
+
+        for method in (BackwardEuler(f), BDF(f)):
+            method.set_initial_condition(1.0)
+            method.solve(np.linspace(0, 5, 101))
+    trace.summary()
+    trace.slowest(5)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+AUTHOR:
+    Michael Shaw
+Background:
+    Batched version of trajectory_ode_solver_euler_rk4.py for range tables.
+Instead of one solve_ivp run per (theta, v0) pair, all projectiles are
+advanced together with a fixed-step RK4 on a (4, n) state array with rows
+x, vx, y, vy, the same ordering as trajectory_ode_system, so each row is
+contiguous and x, vx, y, vy = U unpacks it. After every
+step each lane is checked for
+    apex: vy changes sign, the time of the maximum is found on the cubic
+          Hermite interpolant of y (from y and vy at both ends of the step)
+    impact: y drops below 0, the ground crossing is found on the same
+            interpolant, which replaces the terminate_event of solve_ivp
+The steps containing an event are stored and the interpolants are solved
+for all of them at once when the chunk has landed, so the per-step cost is
+the RK4 update and two comparisons. Lanes that have landed are dropped from
+the state array, so later steps only integrate the projectiles still in
+flight. Without drag the trajectory
+is a polynomial of degree two in t, which RK4 and the cubic interpolant
+reproduce exactly, so the results agree with exact_solution to rounding.
+
+simulate_batch returns one array per column:
+    impact_time, range: time and x position of the ground crossing
+    apex_time, apex_height, apex_range: time, y and x of the highest point
+Lanes that have not landed by t_max are NaN. With a height per lane the
+ground is at y = height instead of 0 and the impact is where the projectile
+comes down through it, so a target point (x, height) is hit when range = x.
+Lanes whose apex stays below their height never cross it and are NaN.
+
+Usage:
+    terminal/cmd: python trajectory_batch.py --theta 5 85 81 --v0 5 50 46 --dt 0.01
+    Spyder: runfile('trajectory_batch.py', args='--theta 5 85 81 --v0 5 50 46')
+"""
+import argparse
+import time
+import numpy as np
+
+G = 9.81  # Acceleration due to gravity in m/s^2
+
+def gravity(t, U, out=None):
+    """
+    Vectorized trajectory_ode_system for a (4, n) array of states with rows x, vx, y, vy.
+
+    Args:
+        t (float): Current time, shared by all lanes.
+        U (numpy.ndarray): States of the projectiles, one column per lane.
+        out (numpy.ndarray): Optional array the derivatives are written into.
+
+    Returns:
+        numpy.ndarray: Derivatives of the states.
+    """
+    dU = np.empty_like(U) if out is None else out
+    dU[0] = U[1]
+    dU[1] = 0
+    dU[2] = U[3]
+    dU[3] = -G
+    return dU
+
+def launch_states(theta, v0):
+    """
+    Initial states [0, v0 cos(theta), 0, v0 sin(theta)] as the columns of a
+    (4, n) array, for arrays of angles in radians and initial velocities
+    which broadcast against each other.
+    """
+    theta, v0 = np.broadcast_arrays(np.asarray(theta, float), np.asarray(v0, float))
+    U0 = np.zeros((4, theta.size))
+    U0[1] = v0.ravel() * np.cos(theta.ravel())
+    U0[3] = v0.ravel() * np.sin(theta.ravel())
+    return U0
+
+def flight_time_bound(U0, height, dt, g=G):
+    """
+    Default t_max: 1.5 times the longest flight time without drag down to
+    min(height, 0) for each lane, (vy + sqrt(vy^2 + 2 g max(-height, 0))) / g,
+    plus one step, so lanes with the ground below the launch point are not
+    cut off before they get there.
+    """
+    vy = U0[3]
+    drop = np.maximum(-np.asarray(height, float).ravel(), 0.0)
+    flight = (vy + np.sqrt(vy**2 + 2 * g * drop)) / g
+    return 1.5 * np.max(flight, initial=0.0) + dt
+
+def rk4_step(rhs, t, U, dt, U_new, work):
+    # One classical Runge-Kutta step for all lanes into U_new, with the stage buffers in work
+    K1, K2, K3, K4, tmp = work
+    rhs(t, U, K1)
+    np.multiply(K1, dt / 2, out=tmp)
+    tmp += U
+    rhs(t + dt / 2, tmp, K2)
+    np.multiply(K2, dt / 2, out=tmp)
+    tmp += U
+    rhs(t + dt / 2, tmp, K3)
+    np.multiply(K3, dt, out=tmp)
+    tmp += U
+    rhs(t + dt, tmp, K4)
+    K2 += K3
+    K2 *= 2
+    K2 += K1
+    K2 += K4
+    np.multiply(K2, dt / 6, out=U_new)
+    U_new += U
+    return U_new
+
+def hermite(s, p0, p1, m0, m1, h):
+    # Cubic Hermite interpolant on a step of length h at s in [0, 1] and its first two derivatives in s
+    value = (2 * s**3 - 3 * s**2 + 1) * p0 + (s**3 - 2 * s**2 + s) * h * m0 \
+        + (-2 * s**3 + 3 * s**2) * p1 + (s**3 - s**2) * h * m1
+    slope = (6 * s**2 - 6 * s) * (p0 - p1) + (3 * s**2 - 4 * s + 1) * h * m0 + (3 * s**2 - 2 * s) * h * m1
+    curvature = (12 * s - 6) * (p0 - p1) + (6 * s - 4) * h * m0 + (6 * s - 2) * h * m1
+    return value, slope, curvature
+
+def hermite_root(p0, p1, m0, m1, h, s, derivative=False, deflate=False, max_iter=20):
+    # Newton's method for the zero of the interpolant (or of its slope) from the guess s, kept in [0, 1].
+    # With deflate, p0 = 0 is a known zero at s = 0 and the zero of interpolant/s is found instead.
+    for _ in range(max_iter):
+        value, slope, curvature = hermite(s, p0, p1, m0, m1, h)
+        if derivative:
+            f, df = slope, curvature
+        elif deflate:
+            f, df = value / s, (slope * s - value) / s**2
+        else:
+            f, df = value, slope
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(df != 0, f / df, 0.0)
+        s_new = np.clip(s - step, np.finfo(float).tiny if deflate else 0.0, 1.0)
+        if np.all(np.abs(s_new - s) <= 4 * np.finfo(float).eps):
+            return s_new
+        s = s_new
+    return s
+
+def simulate_batch(theta, v0, rhs=gravity, dt=0.01, t_max=None, chunk_size=16384, height=0.0):
+    """
+    Integrate all trajectories in lockstep until every projectile has landed.
+
+    Args:
+        theta (array_like): Launch angles in radians.
+        v0 (array_like): Initial velocities in m/s, broadcast against theta.
+        rhs (callable): Vectorized right-hand side rhs(t, U, out) for (4, n) states.
+        dt (float): Time step in seconds.
+        t_max (float): Largest time to integrate to, by default 1.5 times the
+            longest flight time without drag down to each lane's ground
+            (see flight_time_bound) plus one step.
+        chunk_size (int): Lanes integrated together, small enough for the
+            state and stage arrays to stay in the CPU cache.
+        height (array_like): Height of the ground for each lane in m, broadcast
+            against theta and v0.
+
+    Returns:
+        dict: impact_time, range, apex_time, apex_height and apex_range arrays.
+    """
+    theta, v0, height = np.broadcast_arrays(np.asarray(theta, float), np.asarray(v0, float),
+                                            np.asarray(height, float))
+    U0 = launch_states(theta, v0)
+    height = height.ravel()
+    n = U0.shape[1]
+    if t_max is None:
+        t_max = flight_time_bound(U0, height, dt)
+    columns = {name: np.full(n, np.nan) for name in
+               ('impact_time', 'range', 'apex_time', 'apex_height', 'apex_range')}
+
+    # Projectiles launched flat or downwards peak at t = 0, and land there on
+    # ground at height 0, never on ground above it
+    downwards = U0[3] <= 0
+    for name in ('apex_time', 'apex_height', 'apex_range'):
+        columns[name][downwards] = 0.0
+    for name in ('impact_time', 'range'):
+        columns[name][downwards & (height == 0)] = 0.0
+    lanes = np.flatnonzero(~(downwards & (height >= 0)))
+
+    # State and stage buffers are allocated once and reused by every chunk
+    buffers = np.empty((7, 4, min(chunk_size, max(lanes.size, 1))))
+    for start in range(0, lanes.size, chunk_size):
+        chunk = lanes[start:start + chunk_size]
+        simulate_chunk(rhs, U0[:, chunk], chunk, height[chunk], columns, dt, t_max, buffers)
+    return columns
+
+def simulate_chunk(rhs, U0, lanes, levels, columns, dt, t_max, buffers):
+    # Lanes that land keep being integrated, masked out of the event checks, until
+    # fewer than 3/4 of the width are flying and the arrays are compacted. The
+    # steps containing an event are collected and interpolated together at the end.
+    width = lanes.size
+    U, U_new = buffers[0, :, :width], buffers[1, :, :width]
+    U[...] = U0
+    lanes = lanes.copy()
+    levels = levels.copy()
+    flying = np.ones(width, dtype=bool)
+    n_flying = width
+    apex_steps, impact_steps = [], []
+    t = 0.0
+    while n_flying > 0 and t < t_max:
+        work = [buffer[:, :width] for buffer in buffers[2:]]
+        rk4_step(rhs, t, U, dt, U_new[:, :width], work)
+        U_new = U_new[:, :width]
+
+        # Apex: vy changes sign during the step
+        peak = flying & (U[3] > 0) & (U_new[3] <= 0)
+        if np.any(peak):
+            apex_steps.append((lanes[peak], np.full(np.count_nonzero(peak), t), U[:, peak], U_new[:, peak]))
+
+        # Impact: y drops below the ground during the step. Lanes below the
+        # ground and moving down can no longer reach it and stop without one.
+        below = U_new[2] < levels
+        landed = flying & below & (U[2] >= levels)
+        if np.any(landed):
+            impact_steps.append((lanes[landed], np.full(np.count_nonzero(landed), t), levels[landed],
+                                 U[:, landed], U_new[:, landed]))
+        stopped = flying & below & (landed | (U_new[3] <= 0))
+        if np.any(stopped):
+            flying &= ~stopped
+            n_flying = np.count_nonzero(flying)
+            if n_flying < 0.75 * width:
+                keep = np.flatnonzero(flying)
+                width = keep.size
+                U_new[:, :width] = U_new[:, keep]
+                lanes = lanes[keep]
+                levels = levels[keep]
+                flying = np.ones(width, dtype=bool)
+
+        U, U_new = U_new[:, :width], U[:, :width]
+        t += dt
+
+    if apex_steps:
+        peaked, t0, A, B = (np.concatenate(part, axis=-1) for part in zip(*apex_steps))
+        s = hermite_root(A[2], B[2], A[3], B[3], dt, A[3] / (A[3] - B[3]), derivative=True)
+        columns['apex_time'][peaked] = t0 + s * dt
+        columns['apex_height'][peaked] = hermite(s, A[2], B[2], A[3], B[3], dt)[0]
+        columns['apex_range'][peaked] = hermite(s, A[0], B[0], A[1], B[1], dt)[0]
+    if impact_steps:
+        impacts, t0, level, A, B = (np.concatenate(part, axis=-1) for part in zip(*impact_steps))
+        s = np.empty(impacts.size)
+        # Rising from the ground at s = 0, as in the first step, that zero is divided out
+        p0, p1 = A[2] - level, B[2] - level
+        first = (p0 == 0) & (A[3] > 0)
+        y0, y1, m0, m1 = p0[first], p1[first], A[3, first], B[3, first]
+        s[first] = hermite_root(y0, y1, m0, m1, dt, dt * m0 / (dt * m0 - y1), deflate=True)
+        later = ~first
+        y0, y1, m0, m1 = p0[later], p1[later], A[3, later], B[3, later]
+        s[later] = hermite_root(y0, y1, m0, m1, dt, y0 / (y0 - y1))
+        columns['impact_time'][impacts] = t0 + s * dt
+        columns['range'][impacts] = hermite(s, A[0], B[0], A[1], B[1], dt)[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Range table for a grid of launch angles and velocities.')
+    parser.add_argument('--theta', type=float, nargs=3, default=[5, 85, 81], metavar=('MIN', 'MAX', 'N'),
+                        help='Launch angles in degrees as min max count (default: 5 85 81)')
+    parser.add_argument('--v0', type=float, nargs=3, default=[5, 50, 46], metavar=('MIN', 'MAX', 'N'),
+                        help='Initial velocities in m/s as min max count (default: 5 50 46)')
+    parser.add_argument('--dt', type=float, default=0.01, help='Time step in seconds (default: 0.01)')
+    parser.add_argument('--output', default=None, help='Save the range table to this .npz file')
+    args = parser.parse_args()
+
+    theta_degrees, v0 = np.meshgrid(np.linspace(*args.theta[:2], int(args.theta[2])),
+                                    np.linspace(*args.v0[:2], int(args.v0[2])), indexing='ij')
+    start = time.perf_counter()
+    columns = simulate_batch(np.radians(theta_degrees), v0, dt=args.dt)
+    elapsed = time.perf_counter() - start
+    print(f"{theta_degrees.size} trajectories in {elapsed:.3f} s")
+    best = np.nanargmax(columns['range'])
+    print(f"longest range {columns['range'][best]:.4f} m at theta = {theta_degrees.ravel()[best]:g} deg, "
+          f"v0 = {v0.ravel()[best]:g} m/s")
+    if args.output:
+        np.savez(args.output, theta=theta_degrees.ravel(), v0=v0.ravel(), **columns)
+
+if __name__ == '__main__':
+    main()
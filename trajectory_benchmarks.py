@@ -0,0 +1,215 @@
+"""
+AUTHOR:
+    Michael Shaw
+Background:
+    Benchmarks for the batched trajectory engine of trajectory_batch.py. Each
+benchmark prints a small table so the different code paths can be compared
+on the same machine.
+
+    batch: trajectories per second of simulate_batch on random launch angles
+    and velocities against one solve_ivp run with terminate_event per
+    trajectory, as in trajectory_ode_solver_euler_rk4.py. solve_ivp is only
+    run on a sample and its rate extrapolated. Both are validated against the
+    closed form: the largest relative errors of range, apex height and impact
+    time, and the largest |exact_solution(range)|, which is zero at the true
+    impact point.
+
+    drag: the same comparison under a ForceModel of trajectory_forces.py with
+    quadratic drag, exponential air density and a 5 m/s head wind, for
+    the numpy and, when Numba is installed, numba backends of simulate. There
+    is no closed form, so the errors are the largest relative differences of
+    range, apex height and impact time to solve_ivp on the sample. The Numba
+    loop is compiled on a few trajectories before the timing starts.
+
+    targeting: launch angles that hit random ranges under the drag model with
+    trajectory_targeting.Targeting, for v0 of 20, 30, 40 and 50 m/s. The
+    ranges are those of known angles between 5 and 30 degrees, so the angle
+    errors are known. Compared are brent from root_finding.py with one
+    solve_ivp run per evaluation (the hand scan done properly, on a sample),
+    the batched secant method from the closed form for every target (cold),
+    with seeds (warm) and the same targets again (cached). The main number
+    is integrations per solved target. The last line solves targets 50 m
+    below the launch point from angles between -30 and 15 degrees, which
+    must all be found on the low branch.
+
+Usage:
+    terminal/cmd: python trajectory_benchmarks.py --benchmark batch --trajectories 1000000
+    terminal/cmd: python trajectory_benchmarks.py --benchmark drag --trajectories 100000
+    terminal/cmd: python trajectory_benchmarks.py --benchmark targeting --targets 10000
+    Spyder: runfile('trajectory_benchmarks.py', args='--benchmark batch')
+"""
+import argparse
+import time
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from trajectory_batch import simulate_batch, G
+from trajectory_forces import ForceModel, ExponentialDensity, Wind, simulate, numba
+from trajectory_targeting import Targeting
+from root_finding import find_root
+from trajectory_ode_solver_euler_rk4 import trajectory_ode_system, terminate_event, exact_solution
+
+def random_launches(n, seed=0):
+    # Launch angles in radians and velocities in m/s
+    rng = np.random.default_rng(seed)
+    return np.radians(rng.uniform(5, 85, n)), rng.uniform(5, 50, n)
+
+def apex_event(t, u):
+    # Vertical velocity, zero at the apex
+    return u[3]
+
+apex_event.direction = -1
+
+def solve_ivp_trajectories(theta, v0, rhs=trajectory_ode_system):
+    # One solve_ivp run per trajectory, stopped by terminate_event, with the apex where vy = 0
+    columns = {name: np.empty(theta.size) for name in ('impact_time', 'range', 'apex_height')}
+    for i in range(theta.size):
+        U0 = [0, v0[i] * np.cos(theta[i]), 0, v0[i] * np.sin(theta[i])]
+        T = 3 * U0[3] / G
+        sol = solve_ivp(rhs, [0, T], U0, method='RK45', events=[terminate_event, apex_event],
+                        rtol=1e-10, atol=1e-10)
+        columns['impact_time'][i] = sol.t_events[0][0]
+        columns['range'][i] = sol.y_events[0][0][0]
+        columns['apex_height'][i] = sol.y_events[1][0][2]
+    return columns
+
+def validation_errors(theta, v0, columns):
+    # Largest relative errors against the closed form and the largest |exact_solution(range)|
+    exact_range = v0**2 * np.sin(2 * theta) / G
+    exact_height = (v0 * np.sin(theta))**2 / (2 * G)
+    exact_time = 2 * v0 * np.sin(theta) / G
+    return (np.max(np.abs(columns['range'] - exact_range) / exact_range),
+            np.max(np.abs(columns['apex_height'] - exact_height) / exact_height),
+            np.max(np.abs(columns['impact_time'] - exact_time) / exact_time),
+            np.max(np.abs(exact_solution(columns['range'], theta, v0))))
+
+def benchmark_batch(n_trajectories=1000000, n_sample=200, dt=0.01):
+    theta, v0 = random_launches(n_trajectories)
+
+    start = time.perf_counter()
+    batch = simulate_batch(theta, v0, dt=dt)
+    batch_time = time.perf_counter() - start
+
+    sample = slice(0, min(n_sample, n_trajectories))
+    start = time.perf_counter()
+    reference = solve_ivp_trajectories(theta[sample], v0[sample])
+    ivp_time = time.perf_counter() - start
+    ivp_rate = theta[sample].size / ivp_time
+    batch_rate = n_trajectories / batch_time
+
+    print(f"{'Path':<18}{'trajectories':>13}{'time (s)':>10}{'traj/s':>11}{'speedup':>9}"
+          f"{'range err':>11}{'apex err':>10}{'time err':>10}{'|y(range)|':>12}")
+    for name, count, elapsed, rate, th, v, columns in (
+            ('solve_ivp (RK45)', theta[sample].size, ivp_time, ivp_rate, theta[sample], v0[sample], reference),
+            (f'batch dt={dt:g}', n_trajectories, batch_time, batch_rate, theta, v0, batch)):
+        errors = validation_errors(th, v, columns)
+        print(f"{name:<18}{count:>13}{elapsed:>10.3g}{rate:>11.4g}{rate / ivp_rate:>9.1f}"
+              f"{errors[0]:>11.2e}{errors[1]:>10.2e}{errors[2]:>10.2e}{errors[3]:>12.2e}")
+
+def relative_differences(columns, reference, lanes):
+    # Largest relative differences of range, apex height and impact time to the reference
+    return [np.max(np.abs(columns[name][lanes] - reference[name]) / np.abs(reference[name]))
+            for name in ('range', 'apex_height', 'impact_time')]
+
+def benchmark_drag(n_trajectories=100000, n_sample=200, dt=0.01):
+    theta, v0 = random_launches(n_trajectories)
+    model = ForceModel(0.35, density=ExponentialDensity(), wind=Wind(-5.0))
+    sample = slice(0, min(n_sample, n_trajectories))
+
+    start = time.perf_counter()
+    reference = solve_ivp_trajectories(theta[sample], v0[sample], model)
+    ivp_time = time.perf_counter() - start
+    ivp_rate = theta[sample].size / ivp_time
+
+    print(f"{'Path':<18}{'trajectories':>13}{'time (s)':>10}{'traj/s':>11}{'speedup':>9}"
+          f"{'range diff':>12}{'apex diff':>11}{'time diff':>11}")
+    print(f"{'solve_ivp (RK45)':<18}{theta[sample].size:>13}{ivp_time:>10.3g}{ivp_rate:>11.4g}{1.0:>9.1f}")
+    backends = ['numpy'] if numba is None else ['numpy', 'numba']
+    for backend in backends:
+        # Compile before timing
+        simulate(model, theta[:10], v0[:10], dt, backend=backend)
+        start = time.perf_counter()
+        columns = simulate(model, theta, v0, dt, backend=backend)
+        elapsed = time.perf_counter() - start
+        rate = n_trajectories / elapsed
+        differences = relative_differences(columns, reference, sample)
+        print(f"{backend + f' dt={dt:g}':<18}{n_trajectories:>13}{elapsed:>10.3g}{rate:>11.4g}"
+              f"{rate / ivp_rate:>9.1f}{differences[0]:>12.2e}{differences[1]:>11.2e}{differences[2]:>11.2e}")
+    if numba is None:
+        print("numba is not installed, the compiled backend was skipped")
+
+def benchmark_targeting(n_targets=10000, n_sample=20, dt=0.01):
+    model = ForceModel(0.35, density=ExponentialDensity(), wind=Wind(-5.0))
+    rng = np.random.default_rng(0)
+    theta = np.radians(rng.uniform(5, 30, n_targets))
+    v0 = rng.choice([20.0, 30.0, 40.0, 50.0], n_targets)
+    x = simulate(model, theta, v0, dt)['range']
+
+    print(f"{'Path':<24}{'targets':>9}{'solved':>8}{'integrations':>14}{'per target':>12}{'time (s)':>10}"
+          f"{'targets/s':>11}{'theta err':>11}")
+
+    # brent with a solve_ivp run per evaluation on a sample
+    sample = min(n_sample, n_targets)
+    start = time.perf_counter()
+    integrations, errors = 0, []
+    for i in range(sample):
+        def miss(angle):
+            return solve_ivp_trajectories(np.array([angle]), v0[i:i + 1], model)['range'][0] - x[i]
+        result = find_root(miss, 'brent', bracket=(np.radians(1), np.radians(30.5)), xtol=1e-12, ftol=1e-9 * x[i])
+        integrations += result.f_evals
+        errors.append(abs(result.root - theta[i]))
+    elapsed = time.perf_counter() - start
+    print(f"{'brent + solve_ivp':<24}{sample:>9}{sample:>8}{integrations:>14}{integrations / sample:>12.2f}"
+          f"{elapsed:>10.3g}{sample / elapsed:>11.4g}{max(errors):>11.2e}")
+
+    # Compile the Numba loop before timing
+    simulate(model, theta[:10], v0[:10], dt)
+    for name, targeting in (('batched secant, cold', Targeting(model, dt, n_seeds=0)),
+                            ('batched secant, warm', Targeting(model, dt)), ('same targets, cached', None)):
+        if targeting is None:
+            targeting = warm
+            targeting.integrations = 0
+        start = time.perf_counter()
+        result = targeting.solve(x, v0=v0)
+        elapsed = time.perf_counter() - start
+        solved = np.count_nonzero(result['converged'])
+        error = np.max(np.abs(result['theta'] - theta)[result['converged']])
+        print(f"{name:<24}{n_targets:>9}{solved:>8}{targeting.integrations:>14}"
+              f"{targeting.integrations / solved:>12.2f}{elapsed:>10.3g}{n_targets / elapsed:>11.4g}{error:>11.2e}")
+        warm = targeting
+
+    # Targets 50 m below the launch point from angles down to -30 degrees,
+    # which need the ground height in t_max, all below the angle of the
+    # largest range (21 degrees for 20 m/s) so on the low branch
+    theta = np.radians(rng.uniform(-30, 15, n_targets))
+    x = simulate(model, theta, v0, dt, height=-50.0)['range']
+    targeting = Targeting(model, dt)
+    start = time.perf_counter()
+    result = targeting.solve(x, -50.0, v0=v0)
+    elapsed = time.perf_counter() - start
+    solved = np.count_nonzero(result['converged'])
+    error = np.max(np.abs(result['theta'] - theta)[result['converged']])
+    print(f"{'50 m below, warm':<24}{n_targets:>9}{solved:>8}{targeting.integrations:>14}"
+          f"{targeting.integrations / solved:>12.2f}{elapsed:>10.3g}{n_targets / elapsed:>11.4g}{error:>11.2e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batched trajectory engine.')
+    parser.add_argument('--benchmark', default='batch', choices=['batch', 'drag', 'targeting'],
+                        help='Which benchmark to run (default: batch)')
+    parser.add_argument('--trajectories', type=int, default=1000000,
+                        help='Number of launch angle/velocity combinations (default: 1000000)')
+    parser.add_argument('--targets', type=int, default=10000, help='Number of targets for targeting (default: 10000)')
+    parser.add_argument('--sample', type=int, default=200,
+                        help='Trajectories run with solve_ivp, targets solved with brent for targeting (default: 200)')
+    parser.add_argument('--dt', type=float, default=0.01, help='Time step of the batch engine (default: 0.01)')
+    args = parser.parse_args()
+
+    if args.benchmark == 'batch':
+        benchmark_batch(args.trajectories, args.sample, args.dt)
+    elif args.benchmark == 'drag':
+        benchmark_drag(args.trajectories, args.sample, args.dt)
+    elif args.benchmark == 'targeting':
+        benchmark_targeting(args.targets, args.sample, args.dt)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+AUTHOR:
+    Michael Shaw
+Background:
+    Force models for the trajectory ODE. trajectory_ode_system only has
+gravity, which exact_solution already solves in closed form. A ForceModel
+adds
+    drag: quadratic air drag -k rho(y)/rho0 |v - w| (v - w) on the velocity
+          v relative to the wind w, with k = rho0 Cd A / (2 m) for a ball of
+          mass m, diameter d (A = pi d^2 / 4) and drag coefficient Cd
+    density: ConstantDensity, or ExponentialDensity rho0 exp(-y/H) with the
+             scale height H = 8500 m of the isothermal atmosphere
+    wind: Wind, a horizontal wind w(y) = w_ref (y/h_ref)^alpha, the power
+          law profile of the boundary layer, constant for alpha = 0
+With drag_coefficient = 0 the model is trajectory_ode_system again.
+
+Each model has three right-hand sides of the same equations:
+    model(t, u): the list form of trajectory_ode_system, for solve_ivp
+    model.rhs(t, U, out): vectorized for the (4, n) states of trajectory_batch.py
+    model.compiled(): the restricted form f(u, t, out) of ode_solver_jit.py
+simulate() runs the fixed-step RK4 with the apex and impact events of
+trajectory_batch.py on one of two backends:
+    numpy: simulate_batch with model.rhs, all trajectories in lockstep
+    numba: one loop over the trajectories compiled with Numba together with
+           the right-hand side and split over threads, so every RK4 stage
+           only reads and writes four numbers and each trajectory stops at
+           its own impact
+Without Numba only the numpy backend is available. With drag the cubic
+Hermite interpolant of the events is no longer exact but accurate to
+O(dt^4), like the RK4 step itself. The power law wind has an infinite
+gradient at y = 0 for 0 < alpha < 1, which near the ground costs RK4 (and
+solve_ivp) its order of accuracy.
+
+Usage:
+    terminal/cmd: python trajectory_forces.py --theta 15 30 45 60 --v0 40 --cd 0.35 --wind -5
+    Spyder: runfile('trajectory_forces.py', args='--theta 15 30 45 60 --v0 40 --cd 0.35')
+"""
+import argparse
+import math
+import numpy as np
+
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
+
+from ode_solver_jit import jit_rhs
+from trajectory_batch import G, flight_time_bound, hermite, launch_states, simulate_batch
+
+RHO0 = 1.225  # Air density at sea level in kg/m^3
+SCALE_HEIGHT = 8500.0  # Scale height of the atmosphere in m
+
+class ConstantDensity:
+    # Air density rho0 at every height, as the ratio rho(y)/rho0 = 1
+    def __call__(self, y):
+        return 1.0
+
+    def compiled(self):
+        def ratio(y):
+            return 1.0
+        return jit_rhs(ratio)
+
+class ExponentialDensity:
+    # rho(y)/rho0 = exp(-y/H) of the isothermal atmosphere
+    def __init__(self, scale_height=SCALE_HEIGHT):
+        self.scale_height = float(scale_height)
+
+    def __call__(self, y):
+        return np.exp(-y / self.scale_height)
+
+    def compiled(self):
+        scale_height = self.scale_height
+
+        def ratio(y):
+            return math.exp(-y / scale_height)
+        return jit_rhs(ratio)
+
+class Wind:
+    # Horizontal wind w(y) = speed * (y/reference_height)^exponent, in m/s along x
+    def __init__(self, speed=0.0, reference_height=10.0, exponent=0.0):
+        self.speed = float(speed)
+        self.reference_height = float(reference_height)
+        self.exponent = float(exponent)
+
+    def __call__(self, y):
+        if self.exponent == 0:
+            return self.speed
+        return self.speed * (np.maximum(y, 0) / self.reference_height)**self.exponent
+
+    def compiled(self):
+        speed, reference_height, exponent = self.speed, self.reference_height, self.exponent
+
+        def wind(y):
+            if exponent == 0:
+                return speed
+            return speed * (max(y, 0.0) / reference_height)**exponent
+        return jit_rhs(wind)
+
+class ForceModel:
+    """
+    Gravity, quadratic drag, air density and wind for a ball.
+
+    Args:
+        drag_coefficient (float): Drag coefficient Cd, 0 for no drag.
+        mass (float): Mass of the ball in kg.
+        diameter (float): Diameter of the ball in m.
+        density (object): ConstantDensity or ExponentialDensity.
+        wind (Wind): Horizontal wind profile.
+        g (float): Acceleration due to gravity in m/s^2.
+    """
+    def __init__(self, drag_coefficient=0.0, mass=0.145, diameter=0.074, density=None, wind=None, g=G):
+        self.drag_coefficient = drag_coefficient
+        self.mass = mass
+        self.diameter = diameter
+        self.density = ConstantDensity() if density is None else density
+        self.wind = Wind() if wind is None else wind
+        self.g = g
+        self.k = RHO0 * drag_coefficient * np.pi * diameter**2 / 4 / (2 * mass)
+        self.compiled_rhs = None
+
+    def __call__(self, t, u):
+        # The list form of trajectory_ode_system for solve_ivp
+        x, vx, y, vy = u
+        wx = vx - self.wind(y)
+        c = self.k * self.density(y) * math.hypot(wx, vy)
+        return [vx, -c * wx, vy, -self.g - c * vy]
+
+    def rhs(self, t, U, out=None):
+        """
+        Vectorized right-hand side for a (4, n) array of states with rows x, vx, y, vy.
+
+        Args:
+            t (float): Current time, shared by all lanes.
+            U (numpy.ndarray): States of the projectiles, one column per lane.
+            out (numpy.ndarray): Optional array the derivatives are written into.
+
+        Returns:
+            numpy.ndarray: Derivatives of the states.
+        """
+        dU = np.empty_like(U) if out is None else out
+        wx = U[1] - self.wind(U[2])
+        c = np.hypot(wx, U[3])
+        c *= self.density(U[2])
+        c *= self.k
+        dU[0] = U[1]
+        np.multiply(c, wx, out=dU[1])
+        np.negative(dU[1], out=dU[1])
+        dU[2] = U[3]
+        np.multiply(c, U[3], out=dU[3])
+        np.subtract(-self.g, dU[3], out=dU[3])
+        return dU
+
+    def compiled(self):
+        # Restricted form f(u, t, out), compiled with the density and wind when Numba is installed.
+        # It is built once per model, a new function would compile the loop of simulate again.
+        if self.compiled_rhs is not None:
+            return self.compiled_rhs
+        g, k = float(self.g), float(self.k)
+        density, wind = self.density.compiled(), self.wind.compiled()
+
+        def f(u, t, out):
+            wx = u[1] - wind(u[2])
+            c = k * density(u[2]) * math.sqrt(wx * wx + u[3] * u[3])
+            out[0] = u[1]
+            out[1] = -c * wx
+            out[2] = u[3]
+            out[3] = -g - c * u[3]
+        self.compiled_rhs = jit_rhs(f)
+        return self.compiled_rhs
+
+TINY = np.finfo(float).tiny
+EPS = np.finfo(float).eps
+
+def hermite_newton(p0, p1, m0, m1, h, s, derivative, deflate):
+    # Scalar version of trajectory_batch.hermite_root for the compiled loop
+    for _ in range(20):
+        value, slope, curvature = hermite_scalar(s, p0, p1, m0, m1, h)
+        if derivative:
+            f, df = slope, curvature
+        elif deflate:
+            f, df = value / s, (slope * s - value) / s**2
+        else:
+            f, df = value, slope
+        if df == 0:
+            break
+        s_new = min(max(s - f / df, TINY if deflate else 0.0), 1.0)
+        if abs(s_new - s) <= 4 * EPS:
+            return s_new
+        s = s_new
+    return s
+
+def trajectory_loop(f, U0, height, dt, t_max, out):
+    # RK4 for each trajectory on its own down to the ground at its height,
+    # out has the rows impact_time, range, apex_time, apex_height and
+    # apex_range and is NaN on entry
+    dt2 = dt / 2.0
+    for j in prange(U0.shape[1]):
+        # Stage buffers per trajectory, so the trajectories can run on parallel threads
+        u = np.empty(4)
+        u_new = np.empty(4)
+        K1 = np.empty(4)
+        K2 = np.empty(4)
+        K3 = np.empty(4)
+        K4 = np.empty(4)
+        tmp = np.empty(4)
+        for i in range(4):
+            u[i] = U0[i, j]
+        h = height[j]
+        # Launched flat or downwards, peaks at t = 0 and lands there on
+        # ground at height 0, never on ground above it
+        if u[3] <= 0:
+            for i in range(2, 5):
+                out[i, j] = 0.0
+            if h == 0:
+                out[0, j] = 0.0
+                out[1, j] = 0.0
+            if h >= 0:
+                continue
+        t = 0.0
+        while t < t_max:
+            f(u, t, K1)
+            for i in range(4):
+                tmp[i] = u[i] + dt2 * K1[i]
+            f(tmp, t + dt2, K2)
+            for i in range(4):
+                tmp[i] = u[i] + dt2 * K2[i]
+            f(tmp, t + dt2, K3)
+            for i in range(4):
+                tmp[i] = u[i] + dt * K3[i]
+            f(tmp, t + dt, K4)
+            for i in range(4):
+                u_new[i] = u[i] + dt / 6.0 * (K1[i] + 2 * K2[i] + 2 * K3[i] + K4[i])
+
+            # Apex: vy changes sign during the step
+            if u[3] > 0 and u_new[3] <= 0:
+                s = hermite_newton(u[2], u_new[2], u[3], u_new[3], dt, u[3] / (u[3] - u_new[3]), True, False)
+                out[2, j] = t + s * dt
+                out[3, j] = hermite_scalar(s, u[2], u_new[2], u[3], u_new[3], dt)[0]
+                out[4, j] = hermite_scalar(s, u[0], u_new[0], u[1], u_new[1], dt)[0]
+
+            # Impact: y drops below the ground during the step, below the
+            # ground and moving down it can no longer be reached
+            p0, p1 = u[2] - h, u_new[2] - h
+            if p1 < 0 and p0 >= 0:
+                if p0 == 0 and u[3] > 0:
+                    # Rising from the ground at s = 0, that zero is divided out
+                    s = hermite_newton(p0, p1, u[3], u_new[3], dt, dt * u[3] / (dt * u[3] - p1), False, True)
+                else:
+                    s = hermite_newton(p0, p1, u[3], u_new[3], dt, p0 / (p0 - p1), False, False)
+                out[0, j] = t + s * dt
+                out[1, j] = hermite_scalar(s, u[0], u_new[0], u[1], u_new[1], dt)[0]
+                break
+            if p1 < 0 and u_new[3] <= 0:
+                break
+
+            for i in range(4):
+                u[i] = u_new[i]
+            t += dt
+
+# Compiled with Numba when it is installed, the loop itself only on first use
+hermite_scalar = jit_rhs(hermite)
+hermite_newton = jit_rhs(hermite_newton)
+compiled_loop = None
+
+BACKENDS = ['numpy', 'numba']
+
+def simulate(model, theta, v0, dt=0.01, t_max=None, backend=None, height=0.0):
+    """
+    Fixed-step RK4 with apex and impact events for every (theta, v0) pair under a ForceModel.
+
+    Args:
+        model (ForceModel): Forces on the ball.
+        theta (array_like): Launch angles in radians.
+        v0 (array_like): Initial velocities in m/s, broadcast against theta.
+        dt (float): Time step in seconds.
+        t_max (float): Largest time to integrate to, by default 1.5 times the
+            longest flight time without drag down to each ground height
+            (flight_time_bound of trajectory_batch.py) plus one step.
+        backend (str): 'numpy' or 'numba', None takes Numba if available.
+        height (array_like): Height of the ground for each trajectory in m,
+            broadcast against theta and v0, see trajectory_batch.py.
+
+    Returns:
+        dict: impact_time, range, apex_time, apex_height and apex_range arrays.
+    """
+    global compiled_loop
+    if backend is None:
+        backend = 'numpy' if numba is None else 'numba'
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be 'numba' or 'numpy', not {backend}")
+    if backend == 'numba' and numba is None:
+        raise ImportError("backend='numba' needs the numba package")
+    theta, v0, height = np.broadcast_arrays(np.asarray(theta, float), np.asarray(v0, float),
+                                            np.asarray(height, float))
+    U0 = launch_states(theta, v0)
+    if t_max is None:
+        t_max = flight_time_bound(U0, height, dt, model.g)
+    if backend == 'numpy':
+        return simulate_batch(theta, v0, rhs=model.rhs, dt=dt, t_max=t_max, height=height)
+    if compiled_loop is None:
+        compiled_loop = numba.njit(trajectory_loop, parallel=True)
+    out = np.full((5, U0.shape[1]), np.nan)
+    compiled_loop(model.compiled(), U0, np.ascontiguousarray(height.ravel()), float(dt), float(t_max), out)
+    return dict(zip(('impact_time', 'range', 'apex_time', 'apex_height', 'apex_range'), out))
+
+def main():
+    parser = argparse.ArgumentParser(description='Range, apex and flight time of a ball with air drag and wind.')
+    parser.add_argument('--theta', type=float, nargs='+', default=[15, 30, 45, 60],
+                        help='Launch angles in degrees (default: 15 30 45 60)')
+    parser.add_argument('--v0', type=float, default=40, help='Initial velocity in m/s (default: 40)')
+    parser.add_argument('--cd', type=float, default=0.35, help='Drag coefficient (default: 0.35)')
+    parser.add_argument('--mass', type=float, default=0.145, help='Mass of the ball in kg (default: 0.145)')
+    parser.add_argument('--diameter', type=float, default=0.074, help='Diameter of the ball in m (default: 0.074)')
+    parser.add_argument('--density', default='exponential', choices=['constant', 'exponential'],
+                        help='Air density model (default: exponential)')
+    parser.add_argument('--wind', type=float, default=0.0, help='Wind speed along x at 10 m in m/s (default: 0)')
+    parser.add_argument('--wind_exponent', type=float, default=0.0,
+                        help='Exponent of the power law wind profile, 0 for constant wind (default: 0)')
+    parser.add_argument('--dt', type=float, default=0.01, help='Time step in seconds (default: 0.01)')
+    parser.add_argument('--backend', default=None, choices=BACKENDS, help='Numba when installed by default')
+    args = parser.parse_args()
+
+    density = ConstantDensity() if args.density == 'constant' else ExponentialDensity()
+    model = ForceModel(args.cd, args.mass, args.diameter, density, Wind(args.wind, exponent=args.wind_exponent))
+    theta = np.radians(args.theta)
+    drag = simulate(model, theta, args.v0, args.dt, backend=args.backend)
+    vacuum = simulate(ForceModel(), theta, args.v0, args.dt, backend=args.backend)
+    print(f"{'theta (deg)':>12}{'range (m)':>12}{'vacuum':>10}{'apex (m)':>11}{'vacuum':>10}"
+          f"{'time (s)':>11}{'vacuum':>10}")
+    for i, theta_degrees in enumerate(args.theta):
+        print(f"{theta_degrees:>12g}{drag['range'][i]:>12.3f}{vacuum['range'][i]:>10.3f}"
+              f"{drag['apex_height'][i]:>11.3f}{vacuum['apex_height'][i]:>10.3f}"
+              f"{drag['impact_time'][i]:>11.3f}{vacuum['impact_time'][i]:>10.3f}")
+
+if __name__ == '__main__':
+    main()
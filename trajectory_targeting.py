@@ -0,0 +1,277 @@
+"""
+AUTHOR:
+    Michael Shaw
+Background:
+    Inverse problem of trajectory_ode_solver_euler_rk4.py: the launch angle
+(or the initial velocity) that lands the ball at a given range, or sends it
+down through a given point (x, y), instead of scanning --theta by hand.
+Each target is solved by shooting: the miss distance
+    F(p) = range(p) - x
+of the trajectory with the unknown p (theta or v0) is driven to zero with
+the secant method, where range(p) is the x position at which the trajectory
+comes down through the height y (simulate of trajectory_forces.py with
+height=y). All targets are solved together, every secant iteration is one
+call of simulate for the targets that have not converged yet.
+
+Integrations are saved by
+    warm start: the first guess is the closed form without drag and the
+        first step uses its slope dp/dx, so no integration is spent on a
+        finite difference. Targets that share the fixed parameter and the
+        height are solved in two passes, n_seeds targets spread over x
+        first, then the rest from guesses and slopes interpolated between
+        the solved seeds, which are much closer than the closed form when
+        there is drag.
+    cache: every integration is kept by (theta, v0, height), so repeated
+        targets and repeated calls of solve do not integrate again, and the
+        solved targets stay seeds for later calls.
+Every reachable range has a low and a high angle, branch selects the one
+the closed form starts from. A trajectory that peaks below the target
+height has no miss distance, its angle is moved halfway to vertical or its
+velocity doubled, and later steps stay above it. A trajectory that does get
+above the target height but is still in flight at t_max is integrated again
+with a longer t_max instead, not steered. Targets out of reach of the model, beyond the largest
+range or out of reach on the way down, do not converge within maxiter and
+are NaN.
+
+Usage:
+    from trajectory_targeting import Targeting
+    targeting = Targeting(ForceModel(0.35))
+    result = targeting.solve(x=[50, 60, 70], v0=40)
+    terminal/cmd: python trajectory_targeting.py --x 40 60 80 --v0 40 --cd 0.35
+    Spyder: runfile('trajectory_targeting.py', args='--x 40 60 80 --v0 40')
+"""
+import argparse
+import numpy as np
+
+from trajectory_batch import G, flight_time_bound, launch_states
+from trajectory_forces import ForceModel, ExponentialDensity, Wind, simulate
+
+# Unknowns and the interval their iterates are kept in
+BOUNDS = {'theta': (-np.pi / 2 + 1e-9, np.pi / 2 - 1e-9), 'v0': (1e-9, np.inf)}
+
+def vacuum_solution(x, y, fixed, unknown='theta', branch='low', g=G):
+    """
+    Closed form without drag of the launch angle (for a fixed v0) or of the
+    initial velocity (for a fixed theta) whose parabola passes through (x, y).
+    Out of reach the angle of the largest reach is returned for theta and
+    NaN for v0.
+    """
+    x, y, fixed = (np.asarray(a, float) for a in (x, y, fixed))
+    if unknown == 'theta':
+        v2 = fixed**2
+        root = np.sqrt(np.maximum(v2**2 - g * (g * x**2 + 2 * y * v2), 0))
+        return np.arctan((v2 - root if branch == 'low' else v2 + root) / (g * x))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = 2 * np.cos(fixed)**2 * (x * np.tan(fixed) - y)
+        return np.where(denominator > 0, np.sqrt(g * x**2 / denominator), np.nan)
+
+def split_groups(indices, group):
+    # The indices split by their group number
+    order = indices[np.argsort(group[indices], kind='stable')]
+    return [members for members in np.split(order, np.flatnonzero(np.diff(group[order])) + 1) if members.size]
+
+class Targeting:
+    """
+    Batched shooting for launch parameters that hit given targets.
+
+    Args:
+        model (ForceModel): Forces on the ball, gravity only by default.
+        dt (float): Time step of the RK4 integrations in seconds.
+        backend (str): Backend of trajectory_forces.simulate.
+        n_seeds (int): Targets per group solved in the first pass.
+        reruns (int): Times a trajectory cut off by t_max is integrated again
+            with a 4 times longer t_max.
+    """
+    def __init__(self, model=None, dt=0.01, backend=None, n_seeds=32, reruns=3):
+        self.model = ForceModel() if model is None else model
+        self.dt = dt
+        self.backend = backend
+        self.n_seeds = n_seeds
+        self.reruns = reruns
+        self.cache = {}
+        self.seeds = {}
+        self.integrations = 0
+        self.cache_hits = 0
+
+    def ranges(self, theta, v0, height):
+        # x where each trajectory comes down through its height, integrating only the ones not cached,
+        # and whether it peaks below the height (NaN range without a cutoff by t_max)
+        keys = list(zip(theta.tolist(), v0.tolist(), height.tolist()))
+        missing = list(dict.fromkeys(key for key in keys if key not in self.cache))
+        if missing:
+            theta, v0, height = np.array(missing).T
+            columns = simulate(self.model, theta, v0, self.dt, backend=self.backend, height=height)
+            distance, below = columns['range'], columns['apex_height'] < height
+            # NaN ranges of trajectories that do get above their height were
+            # cut off by t_max, they run again with a longer one
+            late = np.flatnonzero(np.isnan(distance) & ~below)
+            if late.size:
+                t_max = flight_time_bound(launch_states(theta[late], v0[late]), height[late], self.dt, self.model.g)
+            for _ in range(self.reruns):
+                if late.size == 0:
+                    break
+                t_max *= 4
+                columns = simulate(self.model, theta[late], v0[late], self.dt, t_max, self.backend, height[late])
+                distance[late], below[late] = columns['range'], columns['apex_height'] < height[late]
+                late = late[np.isnan(columns['range']) & ~below[late]]
+            self.cache.update(zip(missing, zip(distance.tolist(), below.tolist())))
+        self.integrations += len(missing)
+        self.cache_hits += len(keys) - len(missing)
+        distance, below = np.array([self.cache[key] for key in keys]).reshape(-1, 2).T
+        return distance, below.astype(bool)
+
+    def miss(self, unknown, p, fixed, y, x):
+        # Miss distance F and whether the trajectory peaks below the target
+        theta, v0 = (p, fixed) if unknown == 'theta' else (fixed, p)
+        distance, below = self.ranges(theta, v0, y)
+        return distance - x, below
+
+    def shoot(self, unknown, x, y, fixed, p, slope, tol, maxiter):
+        # Secant iterations for all targets together, the first step uses the slope dp/dx of the guess
+        lower, upper = BOUNDS[unknown]
+        p = np.clip(p, lower, upper)
+        p_prev = np.full(x.size, np.nan)
+        F_prev = np.full(x.size, np.nan)
+        evaluations = np.zeros(x.size, dtype=int)
+        converged = np.zeros(x.size, dtype=bool)
+        # Largest value known to peak below the target
+        floor = np.full(x.size, lower)
+        active = np.flatnonzero(np.isfinite(p))
+        for _ in range(maxiter):
+            if active.size == 0:
+                break
+            F, below = self.miss(unknown, p[active], fixed[active], y[active], x[active])
+            evaluations[active] += 1
+            hit = np.abs(F) <= tol * np.maximum(x[active], 1)
+            converged[active[hit]] = True
+            # A trajectory that peaks below the height never comes down through
+            # it, a steeper or faster launch goes higher. One still in flight
+            # after the reruns of ranges is given up, not steered.
+            low = active[np.isnan(F) & below]
+            floor[low] = p[low]
+            p[low] = 0.5 * (p[low] + upper) if unknown == 'theta' else 2 * p[low]
+            going = ~hit & np.isfinite(F)
+            active, F = active[going], F[going]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.where(np.isnan(F_prev[active]), F * slope[active],
+                                F * (p[active] - p_prev[active]) / (F - F_prev[active]))
+            p_prev[active], F_prev[active] = p[active], F
+            p_new = np.clip(p[active] - step, lower, upper)
+            p_new = np.where(p_new > floor[active], p_new, 0.5 * (floor[active] + p[active]))
+            moved = np.isfinite(p_new) & (p_new != p[active])
+            p[active] = p_new
+            active = np.concatenate([active[moved], low])
+        p[~converged] = np.nan
+        return p, converged, evaluations
+
+    def warm_start(self, key, x):
+        # Guesses and slopes interpolated between the solved seeds of a group, None without two seeds
+        if key not in self.seeds or self.seeds[key][0].size < 2:
+            return None
+        xs, ps = self.seeds[key]
+        i = np.clip(np.searchsorted(xs, x), 1, xs.size - 1)
+        slope = (ps[i] - ps[i - 1]) / (xs[i] - xs[i - 1])
+        return ps[i - 1] + slope * (x - xs[i - 1]), slope
+
+    def add_seeds(self, key, x, p):
+        if key in self.seeds:
+            x, p = np.concatenate([self.seeds[key][0], x]), np.concatenate([self.seeds[key][1], p])
+        x, first = np.unique(x, return_index=True)
+        self.seeds[key] = (x, p[first])
+
+    def solve(self, x, y=0.0, v0=None, theta=None, branch='low', tol=1e-9, maxiter=30):
+        """
+        Launch angles for given velocities, or velocities for given angles, that hit the targets.
+
+        Args:
+            x (array_like): Horizontal distances of the targets in m, positive.
+            y (array_like): Heights of the targets in m, hit on the way down.
+            v0 (array_like): Initial velocities in m/s when solving for theta.
+            theta (array_like): Launch angles in radians when solving for v0.
+            branch (str): 'low' or 'high' angle, where the closed form starts.
+            tol (float): Tolerance on |F| relative to max(x, 1 m).
+            maxiter (int): Largest number of secant iterations per target.
+
+        Returns:
+            dict: theta, v0, converged and evaluations (integrations or cache
+            lookups) for every target.
+        """
+        if (v0 is None) == (theta is None):
+            raise ValueError("solve needs either v0 (to solve for theta) or theta (to solve for v0)")
+        if branch not in ('low', 'high'):
+            raise ValueError(f"branch must be 'low' or 'high', not {branch}")
+        unknown = 'theta' if theta is None else 'v0'
+        x, y, fixed = (a.ravel() for a in np.broadcast_arrays(np.asarray(x, float), np.asarray(y, float),
+                                                              np.asarray(v0 if theta is None else theta, float)))
+        if np.any(x <= 0):
+            raise ValueError("solve: the targets need x > 0")
+
+        # Closed form guesses, the slope from a central difference
+        guess = vacuum_solution(x, y, fixed, unknown, branch, self.model.g)
+        h = 1e-6 * x
+        slope = (vacuum_solution(x + h, y, fixed, unknown, branch, self.model.g)
+                 - vacuum_solution(x - h, y, fixed, unknown, branch, self.model.g)) / (2 * h)
+        flat = ~np.isfinite(slope) | (slope == 0)
+        slope[flat] = (-1e-3 if branch == 'high' and unknown == 'theta' else 1e-3) / np.maximum(x[flat], 1)
+
+        # Groups of targets with the same fixed parameter and height, without
+        # seeds from earlier calls a few spread over x go first
+        keys, group = np.unique(np.column_stack([fixed, y]), axis=0, return_inverse=True)
+        keys = [(unknown, branch, float(value), float(height)) for value, height in keys]
+        group = group.ravel()
+        first_pass = np.zeros(x.size, dtype=bool)
+        for members in split_groups(np.arange(x.size), group):
+            key = keys[group[members[0]]]
+            if key in self.seeds:
+                continue
+            if members.size > 2 * self.n_seeds:
+                order = members[np.argsort(x[members])]
+                first_pass[order[np.linspace(0, order.size - 1, self.n_seeds).astype(int)]] = True
+            else:
+                first_pass[members] = True
+
+        p = np.full(x.size, np.nan)
+        converged = np.zeros(x.size, dtype=bool)
+        evaluations = np.zeros(x.size, dtype=int)
+        for targets in (np.flatnonzero(first_pass), np.flatnonzero(~first_pass)):
+            if targets.size == 0:
+                continue
+            for members in split_groups(targets, group):
+                start = self.warm_start(keys[group[members[0]]], x[members])
+                if start is not None:
+                    guess[members], slope[members] = start
+            p[targets], converged[targets], evaluations[targets] = self.shoot(
+                unknown, x[targets], y[targets], fixed[targets], guess[targets], slope[targets], tol, maxiter)
+            for members in split_groups(targets[converged[targets]], group):
+                self.add_seeds(keys[group[members[0]]], x[members], p[members])
+
+        theta, v0 = (p, fixed) if unknown == 'theta' else (fixed, p)
+        return {'theta': theta, 'v0': v0, 'converged': converged, 'evaluations': evaluations}
+
+def main():
+    parser = argparse.ArgumentParser(description='Launch angle or velocity that hits given targets.')
+    parser.add_argument('--x', type=float, nargs='+', default=[20, 40, 60, 80],
+                        help='Horizontal distances of the targets in m (default: 20 40 60 80)')
+    parser.add_argument('--y', type=float, default=0.0, help='Height of the targets in m (default: 0)')
+    parser.add_argument('--v0', type=float, default=None, help='Initial velocity in m/s, solves for theta')
+    parser.add_argument('--theta', type=float, default=None, help='Launch angle in degrees, solves for v0')
+    parser.add_argument('--branch', default='low', choices=['low', 'high'], help='Low or high angle (default: low)')
+    parser.add_argument('--cd', type=float, default=0.35, help='Drag coefficient (default: 0.35)')
+    parser.add_argument('--wind', type=float, default=0.0, help='Wind speed along x in m/s (default: 0)')
+    parser.add_argument('--dt', type=float, default=0.01, help='Time step in seconds (default: 0.01)')
+    args = parser.parse_args()
+
+    if args.v0 is None and args.theta is None:
+        args.v0 = 40.0
+    model = ForceModel(args.cd, density=ExponentialDensity(), wind=Wind(args.wind))
+    targeting = Targeting(model, args.dt)
+    result = targeting.solve(args.x, args.y, args.v0, None if args.theta is None else np.radians(args.theta),
+                             args.branch)
+    print(f"{'x (m)':>8}{'y (m)':>8}{'theta (deg)':>13}{'v0 (m/s)':>10}{'evals':>7}{'converged':>11}")
+    for i, x in enumerate(args.x):
+        print(f"{x:>8g}{args.y:>8g}{np.degrees(result['theta'][i]):>13.6f}{result['v0'][i]:>10.4f}"
+              f"{result['evaluations'][i]:>7}{str(result['converged'][i]):>11}")
+    print(f"{targeting.integrations} integrations, {targeting.cache_hits} cache hits")
+
+if __name__ == '__main__':
+    main()
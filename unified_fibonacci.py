@@ -15,6 +15,8 @@ Usage:
 import argparse
 import numpy as np
 
+from fibonacci_engine import fibonacci_sequence, format_number
+
 import time
 start_time = time.time()
 def compute_fibonacci(N, data_type=np.int64):
@@ -26,13 +28,11 @@ def compute_fibonacci(N, data_type=np.int64):
     - data_type (data-type, optional): The desired data-type for the array. Default is np.int64.
 
     Returns:
-    - sequence (ndarray): Numpy array of Fibonacci sequence numbers up to the Nth number.
+    - sequence (ndarray): Numpy array of Fibonacci sequence numbers up to the Nth number,
+      of dtype object when they do not fit data_type.
     """
-    sequence = np.zeros(N + 1, dtype=data_type)
-    sequence[1] = 1  # Fibonacci sequence starts with 1, 1, ...
-    for n in range(2, N + 1):
-        sequence[n] = sequence[n - 1] + sequence[n - 2]
-    return sequence
+    # Promoted to dtype object (Python integers) when F(N) overflows data_type
+    return fibonacci_sequence(N, data_type)
 
 def main():
     # Set up argument parser for command line options
@@ -49,9 +49,9 @@ def main():
     # Compute the Fibonacci sequence
     fibonacci_sequence = compute_fibonacci(args.N, data_type)
 
-    # Print the sequence up to the Nth number
+    # Print the sequence up to the Nth number, numbers too long for str() shortened
     for n in range(args.N + 1):
-        print(f'Fibonacci number {n}: {fibonacci_sequence[n]}')
+        print(f'Fibonacci number {n}: {format_number(fibonacci_sequence[n])}')
 
 # Python best practice to check if this script is the main program
 if __name__ == '__main__':
@@ -0,0 +1,247 @@
+'''
+Author: Michael Shaw
+
+Background:
+    Generalized urn for ball_draw_simulation.py. Instead of a list with one
+    string per ball, the urn keeps one integer count per color, so dozens of
+    colors with thousands of balls each take C numbers, not a list of all
+    the balls, and draws compare integers, not strings.
+
+    A draw picks a random r in [0, remaining) and finds the color whose
+    cumulative count first exceeds r. The cumulative counts are kept in a
+    Fenwick (binary indexed) tree, in which finding the color and removing
+    the ball both take O(log C) steps, so drawing k balls costs O(k log C)
+    instead of the O(total balls) of building and shrinking a list hat.
+    Alias tables sample in O(1) but only with replacement, every draw
+    without replacement changes the weights and would rebuild the table.
+
+        Urn.draw / Urn.replace: one experiment at a time in Python
+        Urn.sample: a chunk of experiments at once with NumPy, the Fenwick
+            descent and update run for all experiments together, each
+            experiment keeping the balls it removed in its own row
+
+    A success predicate gets the (experiments, k) array of drawn colors and
+    returns one bool per experiment, at_least and all_of build the common
+    ones over several colors, and they combine with & and |. For at_least
+    the exact probability is hypergeometric (ball_draw_exact.py) with all
+    the balls of the chosen colors as one color.
+
+Usage:
+    urn = Urn([1000] * 30)
+    run_experiments_urn(urn, 5, 10**6, at_least(urn, [0, 1], 2))
+    python urn_model.py --counts 1000 1000 1000 --num_balls_drawn 5 --colors 0 1 --num_successes 2
+    Spyder:
+        runfile('urn_model.py', args='--counts 4 4 4 --num_balls_drawn 5 --colors 0 --num_successes 2')
+'''
+
+import argparse
+import random
+import numpy as np
+
+from ball_draw_exact import hypergeometric_pmf
+from ball_draw_simulation import z_score
+
+def fenwick_tree(counts):
+    """Fenwick tree of the counts, tree[i] is the sum of counts[i - (i & -i):i] (1-based)."""
+    tree = np.zeros(len(counts) + 1, dtype=np.int64)
+    tree[1:] = counts
+    for i in range(1, len(counts) + 1):
+        parent = i + (i & -i)
+        if parent <= len(counts):
+            tree[parent] += tree[i]
+    return tree
+
+class Urn:
+    """
+    Balls of C colors kept as counts, drawn without replacement in O(log C) each.
+
+    :param counts: Number of balls of every color.
+    :param names: Optional names of the colors, by default their indices.
+    """
+    def __init__(self, counts, names=None):
+        counts = np.asarray(counts, dtype=np.int64)
+        if counts.ndim != 1 or counts.size == 0 or np.any(counts < 0):
+            raise ValueError("Urn: counts must be a non-empty list of non-negative integers")
+        self.counts = counts
+        self.names = [str(i) for i in range(counts.size)] if names is None else list(names)
+        if len(self.names) != counts.size:
+            raise ValueError("Urn: there must be one name per color")
+        self.total = int(counts.sum())
+        self.remaining = self.total
+        self.top = 1 << (counts.size.bit_length() - 1)
+        # The tree padded to 2 * top with more than all the balls, so the
+        # descent never needs to check that it is still inside the tree
+        self.tree = np.full(2 * self.top, self.total + 1, dtype=np.int64)
+        self.tree[:counts.size + 1] = fenwick_tree(counts)
+        # Python list of the tree for the one-at-a-time draws
+        self.tree_list = self.tree.tolist()
+
+    def __len__(self):
+        return self.counts.size
+
+    def index(self, color):
+        # Index of a color given by name or index
+        if isinstance(color, str):
+            return self.names.index(color)
+        if not 0 <= color < self.counts.size:
+            raise ValueError(f"Urn: there is no color {color}")
+        return int(color)
+
+    def find(self, r):
+        # Color of the ball at position r of the remaining balls, descending the tree
+        tree, position, step = self.tree_list, 0, self.top
+        while step:
+            following = position + step
+            if tree[following] <= r:
+                r -= tree[following]
+                position = following
+            step >>= 1
+        return position
+
+    def add(self, color, delta):
+        # Add delta balls of a color
+        tree, i, size = self.tree_list, color + 1, self.counts.size
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+        self.remaining += delta
+
+    def draw(self, k, rng=random):
+        """Draw k balls without replacement and return their colors, the urn keeps them out until replace."""
+        if k > self.remaining:
+            raise ValueError(f"Urn: cannot draw {k} of the {self.remaining} balls left")
+        colors = []
+        for _ in range(k):
+            color = self.find(rng.randrange(self.remaining))
+            self.add(color, -1)
+            colors.append(color)
+        return colors
+
+    def replace(self, colors):
+        """Put drawn balls back into the urn."""
+        for color in colors:
+            self.add(color, 1)
+
+    def sample(self, k, num_experiments, rng):
+        """
+        Colors of k balls drawn without replacement in each of num_experiments
+        experiments from the full urn, as an (num_experiments, k) array. The
+        urn itself is not changed.
+        """
+        if k > self.total:
+            raise ValueError(f"Urn: cannot draw {k} of the {self.total} balls")
+        size, stride = self.counts.size, self.tree.size
+        # Balls each experiment has removed, subtracted from the shared tree,
+        # one row of stride entries per experiment, indexed flat
+        removed = np.zeros(num_experiments * stride, dtype=np.int64)
+        offsets = np.arange(num_experiments) * stride
+        drawn = np.empty((num_experiments, k), dtype=np.int64)
+        for d in range(k):
+            r = rng.integers(0, self.total - d, num_experiments)
+            position = np.zeros(num_experiments, dtype=np.int64)
+            step = self.top
+            while step:
+                following = position + step
+                value = self.tree[following] - removed[offsets + following]
+                go = value <= r
+                r -= value * go
+                position = np.where(go, following, position)
+                step >>= 1
+            drawn[:, d] = position
+            # Remove the ball from the nodes above it, at most log C of them
+            index = offsets + position + 1
+            i = position + 1
+            while index.size:
+                removed[index] += 1
+                low = i & -i
+                i, index = i + low, index + low
+                keep = i <= size
+                i, index = i[keep], index[keep]
+        return drawn
+
+class Predicate:
+    # A success predicate on the drawn colors, combined with & and |
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, drawn):
+        return self.function(drawn)
+
+    def __and__(self, other):
+        return Predicate(lambda drawn: self(drawn) & other(drawn))
+
+    def __or__(self, other):
+        return Predicate(lambda drawn: self(drawn) | other(drawn))
+
+def at_least(urn, colors, num_successes):
+    """Predicate: at least num_successes balls of any of the colors."""
+    indices = [urn.index(color) for color in colors]
+
+    def predicate(drawn):
+        return np.count_nonzero(np.isin(drawn, indices), axis=1) >= num_successes
+    return Predicate(predicate)
+
+def all_of(urn, requirements):
+    """Predicate: at least requirements[color] balls of every color in requirements."""
+    requirements = {urn.index(color): m for color, m in requirements.items()}
+
+    def predicate(drawn):
+        success = np.ones(drawn.shape[0], dtype=bool)
+        for color, m in requirements.items():
+            success &= np.count_nonzero(drawn == color, axis=1) >= m
+        return success
+    return Predicate(predicate)
+
+def run_experiments_urn(urn, num_balls_drawn, num_experiments, predicate, chunk_size=None, seed=None):
+    """Probability of the predicate, drawing chunks of experiments with Urn.sample."""
+    if chunk_size is None:
+        # About 2 MB of removed counts and drawn colors per chunk
+        chunk_size = max(1, 2**18 // (urn.tree.size + num_balls_drawn))
+    rng = np.random.default_rng(seed)
+    successes = 0
+    for start in range(0, num_experiments, chunk_size):
+        drawn = urn.sample(num_balls_drawn, min(chunk_size, num_experiments - start), rng)
+        successes += np.count_nonzero(predicate(drawn))
+    return successes / num_experiments
+
+def run_experiments_urn_python(urn, num_balls_drawn, num_experiments, predicate, chunk_size=2**16, seed=None):
+    """Probability of the predicate, one Urn.draw and Urn.replace per experiment."""
+    rng = random.Random(seed)
+    successes = 0
+    for start in range(0, num_experiments, chunk_size):
+        drawn = []
+        for _ in range(min(chunk_size, num_experiments - start)):
+            colors = urn.draw(num_balls_drawn, rng)
+            urn.replace(colors)
+            drawn.append(colors)
+        # The predicate is evaluated once for the chunk
+        successes += np.count_nonzero(predicate(np.array(drawn, dtype=np.int64).reshape(-1, num_balls_drawn)))
+    return successes / num_experiments
+
+def probability_at_least(urn, num_balls_drawn, colors, num_successes):
+    """Exact probability of at least num_successes balls of any of the colors."""
+    num_color = int(sum(urn.counts[urn.index(color)] for color in colors))
+    k = np.arange(max(num_successes, 0), min(num_color, num_balls_drawn) + 1)
+    return min(1.0, float(np.sum(hypergeometric_pmf(k, urn.total, num_color, num_balls_drawn))))
+
+def main():
+    parser = argparse.ArgumentParser(description='Draw balls from an urn given by the count of every color.')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000] * 30, help='Number of balls of every color.')
+    parser.add_argument('--num_balls_drawn', type=int, default=5, help='Number of balls drawn per experiment.')
+    parser.add_argument('--colors', type=int, nargs='+', default=[0], help='Colors (indices) counted as successes.')
+    parser.add_argument('--num_successes', type=int, default=2,
+                        help='Number of balls of the colors required for a successful experiment.')
+    parser.add_argument('--num_experiments', type=int, default=1000000, help='Number of experiments to run.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the random numbers.')
+    args = parser.parse_args()
+
+    urn = Urn(args.counts)
+    predicate = at_least(urn, args.colors, args.num_successes)
+    probability = run_experiments_urn(urn, args.num_balls_drawn, args.num_experiments, predicate, seed=args.seed)
+    exact = probability_at_least(urn, args.num_balls_drawn, args.colors, args.num_successes)
+    print(f"{len(urn)} colors, {urn.total} balls, {args.num_balls_drawn} drawn")
+    print(f"Probability with the urn: {probability:.6f} (z = {z_score(probability, exact, args.num_experiments):.2f})")
+    print(f"Exact probability: {exact:.6f}")
+
+if __name__ == '__main__':
+    main()